@@ -0,0 +1,208 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+"""Benchmarks of the ranking pipeline on simulated workloads.
+
+Each workload consists of N objects whose measurements are drawn by ``MeasurementsSimulator`` from normal distributions
+with means ``1 + i*spacing`` and standard deviation ``overlap*spacing``, so that ``overlap`` controls how many neighbours
+an object is equivalent to. For every workload, the wall time and the peak memory allocated (tracemalloc) of each stage
+are recorded and written as JSON. Two result files can be compared with ``--compare``.
+
+The comparer is configured for each engine of ``--engines`` by ``planner.plan()``: 'dict' (the default mode), 'sweep' (the lazy mode),
+'dense' or 'out_of_core' (with the comparison matrix in a temporary file). The dict and dense engines need memory quadratic in N,
+so workloads of 100k objects are run with the sweep engine; a workload that does not fit in ``--memory-budget`` is skipped.
+
+Usage::
+
+    python benchmarks/bench_pipeline.py --sizes 100 1000 5000 --reps 10 30 --overlap 0.5 4 -o results.json
+    python benchmarks/bench_pipeline.py --engines sweep --sizes 1000 10000 100000 -o sweep.json
+    python benchmarks/bench_pipeline.py --compare baseline.json results.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+from partial_ranker import (MeasurementsSimulator, Graph, PartialRankerDFG,
+                            PartialRankerDFGReduced, PartialRankerMin)
+from partial_ranker.planner import plan, ENGINES
+
+STAGES = ('compute_quantiles', 'compare', 'PartialRankerDFG', 'PartialRankerDFGReduced', 'PartialRankerMin',
+          'Graph', 'get_separable_arrangement')
+
+
+def simulate(n, reps, overlap, spacing=0.01, seed=0):
+    params = {'obj{}'.format(i): [1.0 + i * spacing, overlap * spacing] for i in range(n)}
+    sim = MeasurementsSimulator(params, seed=seed)
+    sim.measure(reps)
+    return sim.get_measurements()
+
+
+def measure(fn, repeat=1, setup=None):
+    """Returns the result of fn(), its best wall time over ``repeat`` runs and its peak traced memory in bytes.
+    The memory is traced in a separate run, since tracemalloc slows down the timed code. ``setup()`` is called before every run."""
+    best = float('inf')
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def bench_workload(n, reps, overlap, q_max=75, q_min=25, repeat=1, engine='dict', memory_budget=None, tmpdir=None):
+    measurements = simulate(n, reps, overlap)
+    path = os.path.join(tmpdir or tempfile.gettempdir(), 'bench_C_{}.npy'.format(n)) if engine == 'out_of_core' else None
+    # Raises MemoryError if the engine does not fit in the memory budget.
+    cm = plan(measurements, memory_budget, path=path, engines=(engine,)).make_comparer(measurements)
+    out = {}
+
+    def stage(name, fn, setup=None):
+        result, t, peak = measure(fn, repeat, setup)
+        out[name] = {'time_s': t, 'peak_bytes': peak}
+        return result
+
+    stage('compute_quantiles', lambda: cm.compute_quantiles(q_max, q_min))
+    stage('compare', cm.compare, setup=lambda: cm.compute_quantiles(q_max, q_min))
+
+    def run(cls):
+        def fn():
+            ranker = cls(cm)
+            ranker.compute_ranks()
+            return ranker
+        return fn
+
+    pr_dfg = stage('PartialRankerDFG', run(PartialRankerDFG))
+    stage('PartialRankerDFGReduced', run(PartialRankerDFGReduced))
+    pr_min = stage('PartialRankerMin', run(PartialRankerMin))
+    g = stage('Graph', lambda: Graph(pr_dfg.dependencies, pr_dfg.get_ranks()))
+    stage('get_separable_arrangement', g.get_separable_arrangement)
+
+    return {
+        'n': n, 'reps': reps, 'overlap': overlap, 'engine': engine,
+        'num_ranks': {'DFG': len(pr_dfg.get_ranks()), 'Min': len(pr_min.get_ranks())},
+        'stages': out,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare_results(baseline, current):
+    """Prints the ratio current/baseline of the time and peak memory of every stage of the common workloads."""
+    key = lambda w: (w['n'], w['reps'], w['overlap'], w.get('engine', 'dict'))
+    base = {key(w): w for w in baseline['workloads']}
+    print('{:>8} {:>6} {:>8} {:>12}  {:<26} {:>10} {:>10}'.format('n', 'reps', 'overlap', 'engine', 'stage', 'time', 'memory'))
+    for w in current['workloads']:
+        b = base.get(key(w))
+        if b is None:
+            continue
+        for name, s in w['stages'].items():
+            if name not in b['stages']:
+                continue
+            bs = b['stages'][name]
+            t = s['time_s'] / bs['time_s'] if bs['time_s'] else float('nan')
+            m = s['peak_bytes'] / bs['peak_bytes'] if bs['peak_bytes'] else float('nan')
+            print('{:>8} {:>6} {:>8} {:>12}  {:<26} {:>9.2f}x {:>9.2f}x'.format(w['n'], w['reps'], w['overlap'], w.get('engine', 'dict'), name, t, m))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 3000], help='numbers of objects N')
+    parser.add_argument('--reps', type=int, nargs='+', default=[30], help='numbers of repetitions per object')
+    parser.add_argument('--overlap', type=float, nargs='+', default=[0.5, 4.0],
+                        help='standard deviation of the measurements relative to the spacing of the means')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=['dict'],
+                        help="comparison engines to run every workload with (default: dict); 'sweep' is the lazy mode")
+    parser.add_argument('--memory-budget', type=int, default=None,
+                        help='skip the workloads whose estimated memory exceeds this many bytes (default: the available memory)')
+    parser.add_argument('--repeat', type=int, default=1, help='the best of this many runs is reported per stage')
+    parser.add_argument('-o', '--output', default=None, help='JSON result file (default: stdout)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help='compare two result files and exit')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f0, open(args.compare[1]) as f1:
+            compare_results(json.load(f0), json.load(f1))
+        return 0
+
+    workloads = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for engine in args.engines:
+            for n in args.sizes:
+                for reps in args.reps:
+                    for overlap in args.overlap:
+                        try:
+                            w = bench_workload(n, reps, overlap, repeat=args.repeat, engine=engine, memory_budget=args.memory_budget, tmpdir=tmpdir)
+                        except MemoryError as e:
+                            print('n={} reps={} overlap={} engine={}: skipped, {}'.format(n, reps, overlap, engine, str(e).splitlines()[0]), file=sys.stderr)
+                            continue
+                        total = sum(s['time_s'] for s in w['stages'].values())
+                        print('n={} reps={} overlap={} engine={}: {:.3f}s'.format(n, reps, overlap, engine, total), file=sys.stderr)
+                        workloads.append(w)
+
+    result = {'environment': environment(), 'workloads': workloads}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=1)
+    else:
+        json.dump(result, sys.stdout, indent=1)
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
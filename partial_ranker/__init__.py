@@ -1,10 +1,33 @@
 from .measurements_simulator import MeasurementsSimulator
-from .measurements_visualizer import MeasurementsVisualizer
 from .quantile_comparer import QuantileComparer
+from .relations import Relation, IntervalRelation, IQIRelation, BootstrapCIRelation, MannWhitneyRelation, KSRelation
+from .multi_metric_comparer import MultiMetricComparer
 from .graph import Graph
+from .dominance_analysis import DominanceAnalysis
 
 from .partial_ranker_dfg import PartialRankerDFG
 from .partial_ranker_dfg_r import PartialRankerDFGReduced
 from .partial_ranker_min import PartialRankerMin
 
 from .partial_ranker_wrapper import Method, PartialRanker
+from .instrumentation import Profiler
+from .sharded_ranker import ShardedRanker, SerialTransport, LocalPoolTransport
+from .sliding_window import SlidingWindowComparer
+from .rank_index import RankIndex
+from .encoding import EncodedMeasurements
+
+__all__ = [
+    'MeasurementsSimulator', 'MeasurementsVisualizer', 'QuantileComparer',
+    'Relation', 'IntervalRelation', 'IQIRelation', 'BootstrapCIRelation', 'MannWhitneyRelation', 'KSRelation',
+    'MultiMetricComparer', 'Graph', 'DominanceAnalysis',
+    'PartialRankerDFG', 'PartialRankerDFGReduced', 'PartialRankerMin', 'Method', 'PartialRanker', 'Profiler',
+    'ShardedRanker', 'SerialTransport', 'LocalPoolTransport', 'SlidingWindowComparer', 'RankIndex', 'EncodedMeasurements',
+]
+
+
+def __getattr__(name):
+    # MeasurementsVisualizer pulls in matplotlib, which dominates the import time of the package.
+    if name == 'MeasurementsVisualizer':
+        from .measurements_visualizer import MeasurementsVisualizer
+        return MeasurementsVisualizer
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
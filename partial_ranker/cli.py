@@ -0,0 +1,227 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+"""The ``partial-ranker`` command line tool.
+
+Usage examples::
+
+    partial-ranker timings.csv                               # ranks as JSON on stdout
+    partial-ranker gls_1000_100.csv --format eventlog --method Min --q-max 90 --q-min 10
+    partial-ranker runs/*.npy --jobs 8 -o results/ --output-format parquet
+    partial-ranker large.csv --memory-budget 8G --engines dense,out_of_core --matrix-path /scratch/C.npy
+
+With a single input, the result is written to stdout or to the file given with ``-o``.
+With several inputs, ``-o`` is a directory that receives one result file ``<input name>.<format>`` per input; without ``-o`` one JSON line per input is written to stdout.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+METHODS = ('DFG', 'DFGReduced', 'Min')
+
+
+def rank_measurements(measurements:dict, method:str='DFGReduced', q_max:int=75, q_min:int=25, outliers:bool=False, memory_budget:int=None, path:str=None,
+                      threads:int=None, engines:tuple=None) -> dict:
+    """Runs ``QuantileComparer`` and ``PartialRanker`` on a measurements dictionary.
+
+    Args:
+        measurements (dict[str, List[float]]): A dictionary of objects consisting of a list of measurement values.
+        method (str, optional): Name of a ``Method``. Defaults to 'DFGReduced'.
+        q_max (int, optional): Upper quantile. Defaults to 75.
+        q_min (int, optional): Lower quantile. Defaults to 25.
+        outliers (bool, optional): Remove outliers using the 1.5 IQR rule. Defaults to False.
+        memory_budget (int, optional): If given, the comparer is configured by ``planner.plan()`` within this many bytes. Defaults to None.
+        path (str, optional): The file of the comparison matrix, if the planner chooses the out-of-core engine. Defaults to None.
+        threads (int, optional): The number of threads that compute the quantiles, and the ``jobs`` of the planned engine. Defaults to None (one).
+        engines (tuple[str], optional): The engines that the planner chooses from, e.g., ``('dense', 'out_of_core')``. Defaults to None (``planner.ENGINES``).
+
+    Returns:
+        dict: A JSON serializable dictionary with the keys ``method``, ``ranks``, ``quantiles`` (``[t_low, t_up]`` per object),
+        ``separable_arrangement`` and ``edges`` (the edges of the DFG), and ``plan`` (``Plan.to_dict()``) if a **memory_budget** is given.
+    """
+    from .quantile_comparer import QuantileComparer
+    from .partial_ranker_wrapper import Method, PartialRanker
+    from .planner import plan, ENGINES
+
+    p = None
+    if memory_budget is not None:
+        p = plan(measurements, memory_budget, jobs=threads, path=path, engines=engines or ENGINES)
+        cm = p.make_comparer(measurements)
+    else:
+        cm = QuantileComparer(measurements)
+    cm.compute_quantiles(q_max, q_min, outliers=outliers, threads=threads)
+    cm.compare()
+    pr = PartialRanker(cm)
+    pr.compute_ranks(Method[method])
+    ranks = pr.get_ranks()
+    result = {
+        'method': method,
+        'ranks': {str(r): list(ranks[r]) for r in sorted(ranks)},
+        'quantiles': {obj: [float(cm.t_low[obj]), float(cm.t_up[obj])] for obj in cm.objs},
+        'separable_arrangement': pr.get_separable_arrangement(),
+        'edges': [list(e) for e in pr.get_dfg().get_edges()],
+    }
+    if p is not None:
+        result['plan'] = p.to_dict()
+    return result
+
+
+def write_result(result:dict, out, output_format:str='json') -> None:
+    """
+    Args:
+        result (dict): The output of ``rank_measurements()``.
+        out (str | file): A file path or a writable text file object.
+        output_format (str, optional): 'json' or 'parquet'. The parquet table has one row per object with the columns
+            ``obj``, ``rank``, ``t_low``, ``t_up`` and ``successors`` (the DFG edges). Defaults to 'json'.
+    """
+    if output_format == 'json':
+        if isinstance(out, str):
+            with open(out, 'w') as fh:
+                json.dump(result, fh)
+        else:
+            json.dump(result, out)
+            out.write('\n')
+    elif output_format == 'parquet':
+        from .measurements_io import check_parquet_engine
+        check_parquet_engine()
+        import pandas as pd
+        rank = {obj: int(r) for r, objs in result['ranks'].items() for obj in objs}
+        successors = {}
+        for a, b in result['edges']:
+            successors.setdefault(a, []).append(b)
+        objs = list(result['quantiles'].keys())
+        df = pd.DataFrame({
+            'obj': objs,
+            'rank': [rank[obj] for obj in objs],
+            't_low': [result['quantiles'][obj][0] for obj in objs],
+            't_up': [result['quantiles'][obj][1] for obj in objs],
+            'successors': [successors.get(obj, []) for obj in objs],
+        })
+        df.to_parquet(out if isinstance(out, str) else out.buffer, index=False)
+    else:
+        raise ValueError("Unsupported output format '{}'".format(output_format))
+
+
+def _run(path, args):
+    from .measurements_io import read_measurements
+    measurements = read_measurements(path, args.format, delimiter=args.delimiter)
+    threads = args.jobs if len(args.inputs) == 1 else None
+    result = rank_measurements(measurements, args.method, args.q_max, args.q_min, args.outliers, args.memory_budget, args.matrix_path, threads, args.engines)
+    result['input'] = path
+    return result
+
+
+def _output_path(path, out_dir, output_format):
+    name = os.path.basename(path) if path != '-' else 'stdin'
+    return os.path.join(out_dir, '{}.{}'.format(name, output_format))
+
+
+def _process(path, args):
+    result = _run(path, args)
+    if args.output and len(args.inputs) > 1:
+        write_result(result, _output_path(path, args.output, args.output_format), args.output_format)
+        return None
+    return result
+
+
+def _parse_bytes(text):
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def _parse_engines(text):
+    from .planner import ENGINES
+    engines = tuple(e.strip() for e in text.split(',') if e.strip())
+    unknown = [e for e in engines if e not in ENGINES]
+    if unknown or not engines:
+        raise argparse.ArgumentTypeError("unknown engines {}; expected some of {}".format(unknown, ', '.join(ENGINES)))
+    return engines
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='partial-ranker', description='Partial ranking of objects based on their measurements.')
+    parser.add_argument('inputs', nargs='+', help="measurement files; '-' reads from stdin")
+    parser.add_argument('--format', choices=('csv', 'npy', 'npz', 'parquet', 'eventlog'), default=None,
+                        help='input format (default: inferred from the file extension, csv otherwise)')
+    parser.add_argument('--delimiter', default=None, help="field delimiter of csv (',') and eventlog (';') input")
+    parser.add_argument('--method', choices=METHODS, default='DFGReduced', help='ranking method (default: DFGReduced)')
+    parser.add_argument('--q-max', type=int, default=75, help='upper quantile (default: 75)')
+    parser.add_argument('--q-min', type=int, default=25, help='lower quantile (default: 25)')
+    parser.add_argument('--outliers', action='store_true', help='remove outliers using the 1.5 IQR rule')
+    parser.add_argument('--memory-budget', type=_parse_bytes, default=None,
+                        help="choose the comparison engine within this memory, e.g. '512M' or '8G'; the plan is included in the JSON output")
+    parser.add_argument('--engines', type=_parse_engines, default=None,
+                        help="comma-separated engines that --memory-budget chooses from (default: all), e.g. 'dense,out_of_core'")
+    parser.add_argument('--matrix-path', default=None,
+                        help='file for the comparison matrix if the out-of-core engine is chosen; the lazy sweep is preferred unless --engines excludes it')
+    parser.add_argument('-o', '--output', default=None, help='output file, or output directory when there are several inputs')
+    parser.add_argument('--output-format', choices=('json', 'parquet'), default='json', help='output format (default: json)')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='number of input files processed in parallel, or of threads computing the quantiles of a single input (default: 1)')
+    return parser
+
+
+def main(argv=None) -> int:
+    from .measurements_io import check_parquet_engine, guess_format
+    args = build_parser().parse_args(argv)
+    multi = len(args.inputs) > 1
+    if (args.matrix_path or args.engines) and args.memory_budget is None:
+        print('partial-ranker: --matrix-path and --engines require --memory-budget', file=sys.stderr)
+        return 2
+    if args.output_format == 'parquet' and not args.output:
+        print('partial-ranker: --output-format parquet requires --output', file=sys.stderr)
+        return 2
+    if args.output_format == 'parquet' or 'parquet' in [args.format or guess_format(path) for path in args.inputs]:
+        try:
+            check_parquet_engine()
+        except ImportError as e:
+            print('partial-ranker: {}'.format(e), file=sys.stderr)
+            return 2
+    if multi and args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    if args.jobs > 1 and multi:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = [pool.submit(_process, path, args) for path in args.inputs]
+            for f in futures:
+                result = f.result()
+                if result is not None:
+                    write_result(result, sys.stdout)
+    else:
+        for path in args.inputs:
+            result = _process(path, args)
+            if result is None:
+                continue
+            if args.output:
+                write_result(result, args.output, args.output_format)
+            else:
+                write_result(result, sys.stdout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
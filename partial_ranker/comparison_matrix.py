@@ -0,0 +1,326 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+from collections.abc import Mapping
+import numpy as np
+
+
+class _Row(Mapping):
+    __slots__ = ('_matrix', '_i')
+
+    def __init__(self, matrix, i):
+        self._matrix = matrix
+        self._i = i
+
+    def __getitem__(self, obj):
+        return self._matrix.relation(self._i, self._matrix.index[obj])
+
+    def __setitem__(self, obj, value):
+        if not hasattr(self._matrix, 'array'):
+            raise TypeError("{} is read-only in lazy mode".format(type(self._matrix).__name__))
+        self._matrix.array[self._i, self._matrix.index[obj]] = value
+
+    def __iter__(self):
+        return iter(self._matrix.objs)
+
+    def __len__(self):
+        return len(self._matrix.objs)
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, dict(self))
+
+
+class LazyComparisonMatrix(Mapping):
+    """A read-only view of the comparison matrix **C** that is computed on demand from the quantile values of the objects, so that only O(N) memory is used.
+    ``C[obj_i][obj_j]`` returns the result of the better-than relation of ``QuantileComparer`` and ``C[obj_i][obj_i]`` is -1, as in the dense matrix.
+
+    Since ``obj_i`` is better than ``obj_j`` exactly when ``t_up[obj_i] < t_low[obj_j]``, the relation is an interval order,
+    which the ranking methods use to compute the ranks in O(N log N) time without visiting all pairs of objects.
+
+    Input:
+        **objs (List[str])**: The object names.
+
+        **t_low (numpy.ndarray)**: The lower quantile values of the objects, in the order of **objs**.
+
+        **t_up (numpy.ndarray)**: The upper quantile values of the objects, in the order of **objs**.
+
+    **Attributes and Methods**:
+
+    Attributes:
+        index (dict[str, int]): The position of each object in **objs**.
+    """
+    is_interval_order = True
+
+    def __init__(self, objs, t_low, t_up):
+        self.objs = list(objs)
+        self.index = {obj: i for i, obj in enumerate(self.objs)}
+        self.t_low = np.asarray(t_low, dtype=float)
+        self.t_up = np.asarray(t_up, dtype=float)
+
+    def __getitem__(self, obj):
+        return _Row(self, self.index[obj])
+
+    def __iter__(self):
+        return iter(self.objs)
+
+    def __len__(self):
+        return len(self.objs)
+
+    def relation(self, i:int, j:int) -> int:
+        """
+        Args:
+            i (int): Index of the first object.
+            j (int): Index of the second object.
+
+        Returns:
+            int: 0, 1 or 2 if the first object is better than, equivalent to or worse than the second object, and -1 if i == j.
+        """
+        if i == j:
+            return -1
+        if self.t_up[i] < self.t_low[j]:
+            return 0
+        if self.t_up[j] < self.t_low[i]:
+            return 2
+        return 1
+
+    def row_array(self, i:int) -> np.ndarray:
+        """
+        Args:
+            i (int): Index of an object.
+
+        Returns:
+            numpy.ndarray: The row ``C[objs[i]]`` as an int8 array.
+        """
+        row = np.ones(len(self.objs), dtype=np.int8)
+        row[self.t_up[i] < self.t_low] = 0
+        row[self.t_up < self.t_low[i]] = 2
+        row[i] = -1
+        return row
+
+    def relations(self, rows:np.ndarray, cols:np.ndarray) -> np.ndarray:
+        """
+        Args:
+            rows (numpy.ndarray): Indices of objects.
+            cols (numpy.ndarray): Indices of objects, of the same length as **rows**.
+
+        Returns:
+            numpy.ndarray: The relations ``relation(rows[k], cols[k])`` as an int8 array.
+        """
+        rel = np.ones(len(rows), dtype=np.int8)
+        rel[self.t_up[rows] < self.t_low[cols]] = 0
+        rel[self.t_up[cols] < self.t_low[rows]] = 2
+        rel[rows == cols] = -1
+        return rel
+
+    def better_than_indices(self, obj:str) -> np.ndarray:
+        """
+        Args:
+            obj (str): Object name.
+
+        Returns:
+            numpy.ndarray: The positions in **objs** of the objects that are better than **obj**, in increasing order.
+        """
+        return np.flatnonzero(self.t_up < self.t_low[self.index[obj]])
+
+    def better_than(self, obj:str) -> list:
+        """
+        Args:
+            obj (str): Object name.
+
+        Returns:
+            List[str]: The objects that are better than **obj**, in the order of **objs**.
+        """
+        return [self.objs[k] for k in self.better_than_indices(obj)]
+
+    def equivalent_to(self, obj:str) -> list:
+        """
+        Args:
+            obj (str): Object name.
+
+        Returns:
+            List[str]: The objects other than **obj** that are equivalent to **obj**, in the order of **objs**.
+        """
+        i = self.index[obj]
+        mask = (self.t_up >= self.t_low[i]) & (self.t_low <= self.t_up[i])
+        mask[i] = False
+        return [self.objs[k] for k in np.flatnonzero(mask)]
+
+
+class DenseComparisonMatrix(Mapping):
+    """The comparison matrix **C** stored as an (N x N) int8 array, with the same encoding and interface as ``LazyComparisonMatrix``.
+    It is used by ``QuantileComparer(measurements, jobs=...)``, whose ``compare()`` fills the array tile by tile in parallel. 
+    The array can be a NumPy array or a ``numpy.memmap``, e.g., of a file in shared memory that worker processes write to, or of a file on disk 
+    when the matrix does not fit in memory.
+
+    If a **memory_budget** is given, the rankers do not derive per-object lists from the whole matrix, but stream through it with ``row_blocks()``,
+    so that the memory used besides the array (which may be on disk) stays within the budget.
+
+    Input:
+        **objs (List[str])**: The object names.
+
+        **array (numpy.ndarray)**: An int8 array of shape (N, N), where ``array[i, j]`` is the relation between ``objs[i]`` and ``objs[j]``.
+
+        **memory_budget (int, optional)**: The memory in bytes for processing a block of rows. Defaults to None (no streaming).
+
+    **Attributes and Methods**:
+
+    Attributes:
+        index (dict[str, int]): The position of each object in **objs**.
+
+        block_rows (int): The number of rows per block of ``row_blocks()``.
+    """
+    is_interval_order = False
+
+    def __init__(self, objs, array, memory_budget=None):
+        self.objs = list(objs)
+        self.index = {obj: i for i, obj in enumerate(self.objs)}
+        self.array = array
+        self.memory_budget = memory_budget
+        # Processing a row block allocates about 32 bytes per entry, e.g., masks and the int64 indices of np.nonzero.
+        self.block_rows = max(1, memory_budget // (32 * max(1, len(self.objs)))) if memory_budget is not None else 512
+
+    def __getitem__(self, obj):
+        return _Row(self, self.index[obj])
+
+    def __iter__(self):
+        return iter(self.objs)
+
+    def __len__(self):
+        return len(self.objs)
+
+    def relation(self, i:int, j:int) -> int:
+        """
+        Args:
+            i (int): Index of the first object.
+            j (int): Index of the second object.
+
+        Returns:
+            int: 0, 1 or 2 if the first object is better than, equivalent to or worse than the second object, and -1 if i == j or the pair was not compared.
+        """
+        return int(self.array[i, j])
+
+    def relations(self, rows:np.ndarray, cols:np.ndarray) -> np.ndarray:
+        """
+        Args:
+            rows (numpy.ndarray): Indices of objects.
+            cols (numpy.ndarray): Indices of objects, of the same length as **rows**.
+
+        Returns:
+            numpy.ndarray: The relations ``relation(rows[k], cols[k])`` as an int8 array.
+        """
+        return np.asarray(self.array[rows, cols])
+
+    def row_array(self, i:int) -> np.ndarray:
+        """
+        Args:
+            i (int): Index of an object.
+
+        Returns:
+            numpy.ndarray: The row ``C[objs[i]]`` as an int8 array.
+        """
+        return np.asarray(self.array[i])
+
+    def row_block(self, start:int, stop:int) -> np.ndarray:
+        """
+        Args:
+            start (int): Index of the first row.
+            stop (int): Index after the last row.
+
+        Returns:
+            numpy.ndarray: The rows ``start`` to ``stop - 1`` as an int8 array of shape (stop - start, N).
+        """
+        return np.asarray(self.array[start:stop])
+
+    def row_blocks(self, rows:np.ndarray=None):
+        """Generator over the matrix in blocks of **block_rows** rows.
+
+        Args:
+            rows (numpy.ndarray, optional): The indices of the rows to visit, in this order. Defaults to all the rows.
+
+        Yields:
+            tuple[numpy.ndarray, numpy.ndarray]: The indices of the rows of the block and the rows as an int8 array.
+        """
+        n = len(self.objs)
+        if rows is None:
+            for i0 in range(0, n, self.block_rows):
+                yield np.arange(i0, min(i0 + self.block_rows, n)), self.row_block(i0, min(i0 + self.block_rows, n))
+            return
+        for k in range(0, len(rows), self.block_rows):
+            idx = rows[k:k + self.block_rows]
+            # Read the rows in file order, then restore the requested order.
+            order = np.argsort(idx, kind='stable')
+            block = np.empty((len(idx), n), dtype=np.int8)
+            block[order] = self.array[idx[order]]
+            yield idx, block
+
+    def better_than_indices(self, obj:str) -> np.ndarray:
+        """
+        Args:
+            obj (str): Object name.
+
+        Returns:
+            numpy.ndarray: The positions in **objs** of the objects that are better than **obj**, in increasing order.
+        """
+        return np.flatnonzero(self.row_array(self.index[obj]) == 2)
+
+    def better_than(self, obj:str) -> list:
+        """
+        Args:
+            obj (str): Object name.
+
+        Returns:
+            List[str]: The objects that are better than **obj**, in the order of **objs**.
+        """
+        return [self.objs[k] for k in self.better_than_indices(obj)]
+
+    def equivalent_to(self, obj:str) -> list:
+        """
+        Args:
+            obj (str): Object name.
+
+        Returns:
+            List[str]: The objects other than **obj** that are equivalent to **obj**, in the order of **objs**.
+        """
+        return [self.objs[k] for k in np.flatnonzero(self.row_array(self.index[obj]) == 1)]
+
+
+class LazyRelationLists(Mapping):
+    """A read-only dictionary ``{obj: [objects related to obj]}``, e.g., the dependencies or the equivalence lists, whose values are computed on access by **fn(obj)**.
+    If **indices_fn** is given, ``indices(obj)`` returns the positions in **objs** of the related objects as an array, which ``Graph`` uses to avoid building the lists.
+    """
+
+    def __init__(self, objs, fn, indices_fn=None):
+        self._objs = objs
+        self._fn = fn
+        self._indices_fn = indices_fn
+        self.objs = objs
+        if indices_fn is not None:
+            self.indices = indices_fn
+
+    def __getitem__(self, obj):
+        return self._fn(obj)
+
+    def __iter__(self):
+        return iter(self._objs)
+
+    def __len__(self):
+        return len(self._objs)
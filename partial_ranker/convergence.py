@@ -0,0 +1,153 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+"""Ranks the first k measurements of every object for a series of prefix lengths k, to see how many repetitions are needed for the ranks to stabilize.
+
+The measurements are kept as one row of sorted values per object. For each prefix, only the next measurements are sorted, and they are merged
+into the rows by a stable sort, which finds the two sorted runs of each row and merges them in linear time (NumPy uses timsort for floats).
+A prefix thus takes O(N (R + C log C)) time for N objects with R measurements so far and C new ones, instead of O(N R log R) for sorting the rows,
+and the quantiles of all the objects are read from the sorted rows at once instead of being recomputed from the measurements.
+The ranks of each prefix are computed in the lazy mode of ``QuantileComparer``, which needs no comparison matrix.
+"""
+
+import numpy as np
+from .instrumentation import instrumented
+from .partial_ranker_wrapper import Method, PartialRanker
+from .quantile_comparer import QuantileComparer
+
+_BLOCK_ROWS = 1024  # objects compared at once in pairwise_agreement
+
+
+def _percentile_sorted(S, start, count, q):
+    # numpy.percentile (linear interpolation) of the values S[i, start[i]:start[i]+count[i]] of each row, which are sorted.
+    rows = np.arange(len(S))
+    virtual = (count - 1) * (q / 100)
+    below = np.floor(virtual).astype(np.int64)
+    above = np.minimum(below + 1, count - 1)
+    gamma = virtual - below
+    a = S[rows, start + below]
+    b = S[rows, start + above]
+    diff = b - a
+    return np.where(gamma >= 0.5, b - diff * (1 - gamma), a + diff * gamma)
+
+
+def _quantiles(S, count, q_max, q_min, outliers):
+    start = np.zeros(len(S), dtype=np.int64)
+    if outliers:
+        # The values within the 1.5 IQR fences are a contiguous run of the sorted row.
+        q1 = _percentile_sorted(S, start, count, 25)
+        q2 = _percentile_sorted(S, start, count, 75)
+        iqr = q2 - q1
+        fence_low = q1 - 1.5 * iqr
+        fence_high = q2 + 1.5 * iqr
+        start = (S <= fence_low[:, None]).sum(axis=1)
+        count = (S < fence_high[:, None]).sum(axis=1) - start
+    return _percentile_sorted(S, start, count, q_max), _percentile_sorted(S, start, count, q_min)
+
+
+def pairwise_agreement(ranks_a:np.ndarray, ranks_b:np.ndarray) -> float:
+    """The fraction of the pairs of objects that are ordered the same way by two rankings (better, equal, or worse rank). It takes O(N^2) time.
+
+    Args:
+        ranks_a (numpy.ndarray): The rank of each object in one ranking.
+        ranks_b (numpy.ndarray): The rank of each object in the other ranking.
+
+    Returns:
+        float: The fraction of agreeing pairs, 1.0 for identical rankings.
+    """
+    a = np.asarray(ranks_a)
+    b = np.asarray(ranks_b)
+    n = len(a)
+    if n < 2:
+        return 1.0
+    agree = 0
+    for start in range(0, n, _BLOCK_ROWS):
+        stop = min(n, start + _BLOCK_ROWS)
+        same = np.sign(a[start:stop, None] - a[None, :]) == np.sign(b[start:stop, None] - b[None, :])
+        agree += np.triu(same, k=start + 1).sum()
+    return float(agree) / (n * (n - 1) // 2)
+
+
+@instrumented('rank_convergence')
+def rank_convergence(measurements:dict, prefixes:list=None, method:Method=Method.DFGReduced, q_max:int=75, q_min:int=25, outliers:bool=False) -> tuple:
+    """Computes the ranks for the first k measurements of every object, for each k in **prefixes**, in one pass over the measurements.
+    The ranks are those of ``QuantileComparer`` and ``PartialRanker`` on the truncated measurements.
+
+    Args:
+        measurements (dict[str, List[float]]): A dictionary of objects consisting of a list of measurement values, in the order in which they were taken.
+        prefixes (List[int], optional): The increasing prefix lengths. Objects with fewer measurements use all of them. Defaults to 10, 20, ... up to the largest number of measurements.
+        method (Method, optional): The method to compute the partial ranks. Defaults to Method.DFGReduced.
+        q_max (int, optional): Upper quantile. Defaults to 75.
+        q_min (int, optional): Lower quantile. Defaults to 25.
+        outliers (bool, optional): Remove outliers using the 1.5 IQR rule of each prefix. Defaults to False.
+
+    Returns:
+        tuple[pandas.DataFrame, pandas.DataFrame]: The ranks, with one row per object and one column per prefix length,
+        and the stability metrics, with one row per prefix length and the columns
+
+            - 'n_ranks': The number of ranks.
+            - 'changed_from_previous': The fraction of the objects whose rank differs from the previous prefix.
+            - 'changed_from_final': The fraction of the objects whose rank differs from the last prefix.
+            - 'pairwise_agreement': ``pairwise_agreement()`` with the ranks of the last prefix.
+    """
+    import pandas as pd
+
+    objs = list(measurements.keys())
+    lengths = np.array([len(measurements[x]) for x in objs], dtype=np.int64)
+    if prefixes is None:
+        prefixes = list(range(10, int(lengths.max()), 10)) + [int(lengths.max())]
+    prefixes = [int(k) for k in prefixes]
+    if any(k2 <= k1 for k1, k2 in zip(prefixes, prefixes[1:])) or prefixes[0] < 1:
+        raise ValueError("prefixes must be positive and increasing")
+
+    S = np.empty((len(objs), 0))
+    table = {}
+    k0 = 0
+    for k in prefixes:
+        # Sort the measurements k0..k and merge them into the sorted rows; NaN pads the rows of objects with fewer measurements and sorts last.
+        chunk = np.full((len(objs), k - k0), np.nan)
+        for i, x in enumerate(objs):
+            values = measurements[x][k0:k]
+            chunk[i, :len(values)] = values
+        chunk.sort(axis=1)
+        S = np.sort(np.concatenate([S, chunk], axis=1), axis=1, kind='stable')
+        t_up, t_low = _quantiles(S, np.minimum(lengths, k), q_max, q_min, outliers)
+        cm = QuantileComparer.from_quantiles(dict(zip(objs, t_low.tolist())), dict(zip(objs, t_up.tolist())), lazy=True)
+        pr = PartialRanker(cm)
+        pr.compute_ranks(method)
+        table[k] = [pr.get_rank_obj(x) for x in objs]
+        k0 = k
+
+    ranks = pd.DataFrame(table, index=objs)
+    final = ranks[prefixes[-1]].to_numpy()
+    metrics = []
+    previous = None
+    for k in prefixes:
+        r = ranks[k].to_numpy()
+        metrics.append({
+            'n_ranks': int(r.max()) + 1 if len(r) else 0,
+            'changed_from_previous': float(np.mean(r != previous)) if previous is not None else np.nan,
+            'changed_from_final': float(np.mean(r != final)),
+            'pairwise_agreement': pairwise_agreement(r, final),
+        })
+        previous = r
+    return ranks, pd.DataFrame(metrics, index=pd.Index(prefixes, name='prefix'))
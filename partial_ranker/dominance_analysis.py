@@ -0,0 +1,450 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+import bisect
+import heapq
+from typing import List
+import numpy as np
+from .graph import Graph
+from . import kernels
+from .comparison_matrix import LazyRelationLists
+from .relations import IntervalRelation
+from .instrumentation import instrumented, count
+
+class DominanceAnalysis:
+    """Derives the structures shared by all the partial ranking methodologies from the comparison matrix in a single pass.
+    The depths in the dependency graph (Methodology 1), the graph H and the separable arrangement (Methodology 2) and
+    the equivalence classes (Methodology 3) are computed lazily on first use and cached, so that the ranking classes
+    ``PartialRankerDFG``, ``PartialRankerDFGReduced`` and ``PartialRankerMin`` can share one instance of this class.
+    
+    If the comparison matrix is an interval order (e.g., the ``LazyComparisonMatrix`` of a lazy ``QuantileComparer``), the depths, the equivalence classes
+    and the separable arrangement are computed by sweeping over the sorted quantile values in O(N log N) time, 
+    and **dependencies** and **equivalence** are computed on access instead of being stored.
+
+    If the comparison matrix has a memory budget (e.g., a ``DenseComparisonMatrix`` on disk), the depths and the equivalence classes are computed
+    by streaming through the matrix in blocks of rows, and **dependencies** and **equivalence** are also computed on access.
+
+    Input:
+        comparer (partial_ranker.QuantileComparer):
+            The ``QuantileComparer`` object that contains the results of pair-wise comparisons.
+            i.e, ``comparer.compare()`` should have been called.
+
+        dependencies (dict[str,list[str]], optional):
+            Precomputed **dependencies**, e.g., loaded from a file. Must be given together with **equivalence**. Defaults to None (derived from the comparison matrix).
+
+        equivalence (dict[str,list[str]], optional):
+            Precomputed **equivalence**. Defaults to None.
+
+    **Attributes and Methods**:
+
+    Attributes:
+        objs (List[str]): List of object names.
+
+        dependencies (dict[str,list[str]]): A dictionary with objects as keys, whose value holds the list of objects that are better than the object indicated in the key.
+
+        equivalence (dict[str,list[str]]): A dictionary with objects as keys, whose value holds the list of objects that are equivalent to the object indicated in the key.
+    """
+
+    def __init__(self, comparer, dependencies=None, equivalence=None):
+        self.comparer = comparer
+        self.C = comparer.C
+        self.objs = list(self.C.keys())
+        self.interval_order = getattr(self.C, 'is_interval_order', False)
+        self.streamed = getattr(self.C, 'memory_budget', None) is not None
+
+        if dependencies is not None:
+            self.dependencies = dependencies
+            self.equivalence = equivalence
+        elif self.interval_order or self.streamed:
+            self.dependencies = LazyRelationLists(self.objs, self.C.better_than, self.C.better_than_indices)
+            self.equivalence = LazyRelationLists(self.objs, self.C.equivalent_to)
+        else:
+            self._derive_relations()
+
+        self._obj_depth = None
+        self._depth_objs = None
+        self._graph_H = None
+        self._arrangement = None
+        self._equiv_classes = None
+        self._version = getattr(comparer, 'version', 0)
+        self._index = None
+
+    @instrumented('DominanceAnalysis._derive_relations')
+    def _derive_relations(self):
+        self.dependencies = {}
+        self.equivalence = {}
+        if hasattr(self.C, 'row_blocks'):
+            # C[x][y] == 0 iff C[y][x] == 2, so the dependencies and the equivalence of y are read from row y, block by block.
+            for rows, block in self.C.row_blocks():
+                for i, row in zip(rows.tolist(), block):
+                    y = self.objs[i]
+                    self.dependencies[y] = [self.objs[k] for k in np.flatnonzero(row == 2)]
+                    self.equivalence[y] = [self.objs[k] for k in np.flatnonzero(row == 1)]
+            return
+        for y in self.objs:
+            self.dependencies[y] = []
+            self.equivalence[y] = []
+        for x in self.objs:
+            row = self.C[x]
+            for y in self.objs:
+                c = row[y]
+                if c == 0:
+                    self.dependencies[y].append(x)
+                elif c == 1:
+                    self.equivalence[y].append(x)
+
+    def is_stale(self, comparer) -> bool:
+        """
+        Args:
+            comparer (partial_ranker.QuantileComparer): A comparer object.
+
+        Returns:
+            bool: True if the analysis was not derived from the current comparison matrix of **comparer**, e.g., after ``compute_quantiles()`` was called again.
+        """
+        return comparer is not self.comparer or comparer.C is not self.C or getattr(comparer, 'version', 0) != self._version
+
+    def _obj_index(self):
+        if self._index is None:
+            self._index = getattr(self.C, 'index', None) or {obj: i for i, obj in enumerate(self.objs)}
+        return self._index
+
+    def _row(self, obj):
+        # Row of C as an int8 array in the order of objs.
+        if hasattr(self.C, 'row_array'):
+            return self.C.row_array(self._obj_index()[obj])
+        row = self.C[obj]
+        return np.fromiter((row[y] for y in self.objs), dtype=np.int8, count=len(self.objs))
+
+    def _dep_indices(self, obj):
+        if hasattr(self.dependencies, 'indices'):
+            return self.dependencies.indices(obj)
+        index = self._obj_index()
+        return np.fromiter((index[x] for x in self.dependencies[obj]), dtype=np.int64)
+
+    def _upper_ends(self):
+        # The upper end of the interval of each object if the relation is an interval order (x is better than y iff up[x] < low[y]), else None.
+        # Sorting by it is a topological order of the dependency graph.
+        if self.interval_order:
+            return np.asarray(self.C.t_up, dtype=float)
+        relation = getattr(self.comparer, 'relation', None)
+        if isinstance(relation, IntervalRelation):
+            return np.asarray(relation.up, dtype=float)
+        if relation is None and hasattr(self.comparer, 't_up'):
+            return np.fromiter((self.comparer.t_up[x] for x in self.objs), dtype=float, count=len(self.objs))
+        return None
+
+    def _relax_depths(self, depth, touched):
+        # Recomputes in place the depths of the objects in touched, whose dependencies changed, and propagates the changes to their descendants,
+        # in a topological order of the new relation. Returns the objects whose depth changed.
+        moved = set()
+        up = self._upper_ends()
+        if up is not None:
+            # The dependencies of an object have smaller upper ends, so they are settled before it is popped.
+            queue = [(up[k], k) for k in touched]
+            heapq.heapify(queue)
+            queued = set(touched)
+            while queue:
+                _, k = heapq.heappop(queue)
+                deps = self._dep_indices(self.objs[k])
+                d = int(depth[deps].max()) + 1 if len(deps) else 0
+                if d == depth[k]:
+                    continue
+                depth[k] = d
+                moved.add(k)
+                for z in np.flatnonzero(self._row(self.objs[k]) == 0).tolist():
+                    if z not in queued:
+                        heapq.heappush(queue, (up[z], z))
+                        queued.add(z)
+            return moved
+
+        # Otherwise, Kahn's algorithm over the descendants of the touched objects.
+        successors = dict.fromkeys(touched)
+        stack = list(touched)
+        while stack:
+            k = stack.pop()
+            successors[k] = np.flatnonzero(self._row(self.objs[k]) == 0).tolist()
+            for z in successors[k]:
+                if z not in successors:
+                    stack.append(z)
+                    successors[z] = None
+        n_deps = dict.fromkeys(successors, 0)
+        for k in successors:
+            for z in successors[k]:
+                n_deps[z] += 1
+        ready = [k for k, n in n_deps.items() if n == 0]
+        while ready:
+            k = ready.pop()
+            deps = self._dep_indices(self.objs[k])
+            d = int(depth[deps].max()) + 1 if len(deps) else 0
+            if d != depth[k]:
+                depth[k] = d
+                moved.add(k)
+            for z in successors[k]:
+                n_deps[z] -= 1
+                if n_deps[z] == 0:
+                    ready.append(z)
+        cycle = [k for k, n in n_deps.items() if n > 0]
+        if cycle:
+            raise ValueError("The better-than relation is not transitive: '{}' is part of or depends on a cycle".format(self.objs[min(cycle)]))
+        return moved
+
+    @instrumented('DominanceAnalysis.update')
+    def update(self, obj:str, measurements:list=None) -> dict:
+        """Updates the comparer with new measurements of one object (see ``QuantileComparer.update_object()``) and patches the cached structures,
+        in time proportional to the affected part of the dependency graph rather than to the whole graph:
+
+            - The dependency and equivalence lists are patched for the objects whose relation to **obj** changed.
+            - The depths are recomputed for **obj** and the objects whose dependencies changed, and the changes are propagated to their descendants.
+            - The separable arrangement is re-sorted only for the ranks whose nodes or edges in graph H changed.
+
+        Graph H and the equivalence classes are recomputed on next use.
+
+        Args:
+            obj (str): The key of an object in the measurements dictionary.
+            measurements (List[float], optional): The new measurements of the object. Defaults to None (the measurements dictionary was updated in place).
+
+        Returns:
+            dict[str, tuple[int, int]]: The objects whose depth changed, with the old and the new depth.
+        """
+        old_row = self._row(obj).copy()
+        self.comparer.update_object(obj, measurements)
+        self._version = getattr(self.comparer, 'version', 0)
+        new_row = self._row(obj)
+        index = self._obj_index()
+        i = index[obj]
+
+        if isinstance(self.dependencies, dict):
+            for value, lists in ((2, self.dependencies), (1, self.equivalence)):
+                lists[obj] = [self.objs[k] for k in np.flatnonzero(new_row == value)]
+            # C[y][obj] == 2 - C[obj][y]: y depends on obj iff C[obj][y] == 0, and is equivalent to obj iff C[obj][y] == 1.
+            for value, lists in ((0, self.dependencies), (1, self.equivalence)):
+                was, now = old_row == value, new_row == value
+                for k in np.flatnonzero(was & ~now):
+                    lists[self.objs[k]].remove(obj)
+                for k in np.flatnonzero(now & ~was):
+                    bisect.insort(lists[self.objs[k]], obj, key=index.__getitem__)
+
+        self._graph_H = None
+        self._equiv_classes = None
+        if self._obj_depth is None:
+            self._arrangement = None
+            return {}
+
+        depth = np.fromiter((self._obj_depth[x] for x in self.objs), dtype=np.int64, count=len(self.objs))
+        old_depth = depth.copy()
+        touched = set(np.flatnonzero((old_row == 0) != (new_row == 0)).tolist()) | {i}
+        try:
+            moved = self._relax_depths(depth, touched)
+        except ValueError:
+            self._obj_depth = None
+            self._depth_objs = None
+            self._arrangement = None
+            raise
+
+        changed = {self.objs[k]: (int(old_depth[k]), int(depth[k])) for k in sorted(moved) if depth[k] != old_depth[k]}
+        if self._arrangement is not None:
+            rank_arrangement = {}
+            for x in self._arrangement:
+                rank_arrangement.setdefault(self._obj_depth[x], []).append(x)
+        for node, (d0, d1) in changed.items():
+            self._obj_depth[node] = d1
+            self._depth_objs[d0].remove(node)
+            if not self._depth_objs[d0]:
+                del self._depth_objs[d0]
+            bisect.insort(self._depth_objs.setdefault(d1, []), node, key=index.__getitem__)
+        if changed:
+            # As computed by get_depths(), the depths are ordered by their first object.
+            self._depth_objs = {d: self._depth_objs[d] for d in sorted(self._depth_objs, key=lambda d: index[self._depth_objs[d][0]])}
+
+        if self._arrangement is not None:
+            # The position of an object in the arrangement depends on its in- and out-degree in graph H, which change only for the ranks of
+            # the objects whose relations or depths changed, and for the ranks next to them.
+            ranks = set()
+            for k in touched:
+                ranks.update((int(depth[k]) - 1, int(depth[k]), int(depth[k]) + 1))
+            for d0, d1 in changed.values():
+                ranks.update((d0 - 1, d0, d0 + 1, d1 - 1, d1, d1 + 1))
+            n_ranks = len(self._depth_objs)
+            for r in ranks:
+                if 0 <= r < n_ranks:
+                    n_in = {x: np.count_nonzero(depth[self._dep_indices(x)] == r - 1) for x in self._depth_objs[r]}
+                    n_out = {x: np.count_nonzero(depth[self._row(x) == 0] == r + 1) for x in self._depth_objs[r]}
+                    rank_arrangement[r] = sorted(self._depth_objs[r], key=lambda x: (-n_out[x], n_in[x]))
+            self._arrangement = [x for r in range(n_ranks) for x in rank_arrangement[r]]
+        return changed
+
+    def get_depths(self) -> tuple:
+        """Computes the depth of every object in the dependency graph (the ranks according to Methodology 1).
+
+        Returns:
+            tuple[dict[str,int], dict[int,list[str]]]: The depth of each object, and the list of objects at each depth.
+        """
+        if self._obj_depth is not None:
+            count('DominanceAnalysis.cache_hits')
+        else:
+            if self.interval_order:
+                depth = self._interval_depths()
+            elif self.streamed:
+                depth = self._streamed_depths()
+            else:
+                index = {obj: i for i, obj in enumerate(self.objs)}
+                depth = kernels.dag_depths(*kernels.to_csr([self.dependencies[obj] for obj in self.objs], index))
+            if (depth < 0).any():
+                node = self.objs[int(np.flatnonzero(depth < 0)[0])]
+                raise ValueError("The better-than relation is not transitive: '{}' is part of or depends on a cycle".format(node))
+            self._obj_depth = dict(zip(self.objs, depth.tolist()))
+            depth_objs = {}
+            for obj, d in self._obj_depth.items():
+                depth_objs.setdefault(d, []).append(obj)
+            self._depth_objs = depth_objs
+        return self._obj_depth, self._depth_objs
+
+    def _interval_depths(self):
+        # The objects better than y are those whose t_up is below t_low[y], i.e., a prefix of the objects sorted by t_up.
+        # These all have a smaller t_low than y, so visiting the objects by increasing t_low, their depths are known when y is visited.
+        low, up = self.C.t_low, self.C.t_up
+        by_low = np.argsort(low, kind='stable')
+        by_up = np.argsort(up, kind='stable')
+        depth = np.zeros(len(low), dtype=np.int64)
+        k = 0
+        best = -1  # maximum depth in the prefix by_up[:k]
+        for y in by_low:
+            while k < len(by_up) and up[by_up[k]] < low[y]:
+                best = max(best, depth[by_up[k]])
+                k += 1
+            depth[y] = best + 1
+        return depth
+
+    def _streamed_depths(self):
+        # For a strict partial order, the objects better than y have fewer objects better than them than y has,
+        # so visiting the rows by increasing number of dependencies, their depths are known when y is visited, and one pass suffices.
+        # Rows whose dependencies are not all resolved (if the relation is not transitive) are retried in further passes.
+        n = len(self.objs)
+        n_deps = np.zeros(n, dtype=np.int64)
+        for rows, block in self.C.row_blocks():
+            n_deps[rows] = (block == 2).sum(axis=1)
+        pending = np.argsort(n_deps, kind='stable')
+        depth = np.full(n, -1, dtype=np.int64)
+        resolved = np.zeros(n, dtype=bool)
+        while len(pending):
+            retry = []
+            for rows, block in self.C.row_blocks(pending):
+                for y, row in zip(rows.tolist(), block):
+                    deps = np.flatnonzero(row == 2)
+                    if resolved[deps].all():
+                        depth[y] = depth[deps].max() + 1 if len(deps) else 0
+                        resolved[y] = True
+                    else:
+                        retry.append(y)
+            if len(retry) == len(pending):
+                break  # the remaining rows depend on a cycle
+            pending = np.array(retry, dtype=np.int64)
+        return depth
+
+    def _streamed_components(self):
+        labels = np.arange(len(self.objs))
+        for rows, block in self.C.row_blocks():
+            r, c = np.nonzero(block == 1)
+            upper = c > rows[r]
+            labels = kernels.merge_components(labels, rows[r[upper]], c[upper])
+        return labels
+
+    def _interval_edge_counts(self):
+        # In graph H, x at depth d has an edge to y at depth d+1 iff t_up[x] < t_low[y].
+        depth = np.array([self._obj_depth[obj] for obj in self.objs])
+        low, up = self.C.t_low, self.C.t_up
+        n_in = np.zeros(len(low), dtype=np.int64)
+        n_out = np.zeros(len(low), dtype=np.int64)
+        members = [np.flatnonzero(depth == d) for d in range(len(self._depth_objs))]
+        for d in range(len(members) - 1):
+            a, b = members[d], members[d+1]
+            n_in[b] = np.searchsorted(np.sort(up[a]), low[b], side='left')
+            sorted_low = np.sort(low[b])
+            n_out[a] = len(b) - np.searchsorted(sorted_low, up[a], side='right')
+        return n_in, n_out
+
+    def get_graph_H(self) -> Graph:
+        """
+        Returns:
+            partial_ranker.Graph: The dependency graph that represents the rank relation among the objects according to Methodology 1.
+        """
+        if self._graph_H is not None:
+            count('DominanceAnalysis.cache_hits')
+        else:
+            self._graph_H = Graph(self.dependencies, self.get_depths()[1])
+        return self._graph_H
+
+    def get_separable_arrangement(self) -> List[str]:
+        """
+        Returns:
+            List[str]: Arrangement of the objects according to Methodology 2 (Step 1 to 3) in the paper, i.e., ``get_graph_H().get_separable_arrangement()``.
+        """
+        if self._arrangement is not None:
+            count('DominanceAnalysis.cache_hits')
+        elif self.interval_order and self._graph_H is None:
+            self.get_depths()
+            n_in, n_out = self._interval_edge_counts()
+            index = self.C.index
+            arrangement = []
+            for rank in range(len(self._depth_objs)):
+                arrangement += sorted(self._depth_objs[rank], key=lambda obj: (-n_out[index[obj]], n_in[index[obj]]))
+            self._arrangement = arrangement
+        else:
+            self._arrangement = self.get_graph_H().get_separable_arrangement()
+        return self._arrangement
+
+    @instrumented('DominanceAnalysis.get_equivalence_classes')
+    def get_equivalence_classes(self) -> List[set]:
+        """Groups the objects into the connected components of the equivalence relation.
+
+        Returns:
+            List[set[str]]: The equivalence classes in the order in which they are discovered when iterating over **objs**.
+        """
+        if self._equiv_classes is not None:
+            count('DominanceAnalysis.cache_hits')
+        elif self.interval_order:
+            # The classes are the connected components of the overlapping intervals [t_low, t_up], i.e., maximal runs of the objects sorted by t_low.
+            low, up = self.C.t_low, self.C.t_up
+            by_low = np.argsort(low, kind='stable')
+            classes = []
+            reach = -np.inf
+            for i in by_low:
+                if low[i] > reach:
+                    classes.append([])
+                classes[-1].append(i)
+                reach = max(reach, up[i])
+            first = {}  # order the classes by their first object in objs, as the graph traversal below does
+            for c, members in enumerate(classes):
+                first[c] = min(members)
+            self._equiv_classes = [set(self.objs[i] for i in classes[c]) for c in sorted(first, key=first.get)]
+        else:
+            if self.streamed:
+                labels = self._streamed_components()
+            else:
+                index = {obj: i for i, obj in enumerate(self.objs)}
+                labels = kernels.components(*kernels.to_csr([self.equivalence[obj] for obj in self.objs], index))
+            # The label of a class is its first object, so the classes come out in the order of objs.
+            classes = {}
+            for obj, c in zip(self.objs, labels.tolist()):
+                classes.setdefault(c, set()).add(obj)
+            self._equiv_classes = list(classes.values())
+        return self._equiv_classes
@@ -0,0 +1,263 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+"""Compressed storage of measurements, for archives of timings whose resolution is far below the precision of float64.
+
+The encodings are:
+
+    - **float32**: The values as float32 (4 bytes per value), with a relative error of at most 2^-24.
+    - **scaled**: The values as integer multiples of a **resolution**, e.g., 1e-9 for timings in seconds with nanosecond resolution.
+      The smallest multiple of each object is stored once, and the values as their distance to it, in the smallest unsigned integer type
+      that holds the distances of the object. The width thus follows the spread of the measurements of an object rather than their magnitude.
+    - **delta**: As **scaled**, but the differences between consecutive measurements of each object are stored, compressed with zlib.
+      This pays off if consecutive measurements are correlated, e.g., by a drift; for independent noise, **scaled** is smaller.
+
+The size depends on the spread of the measurements in units of the resolution. For example, for 1000 objects x 1000 timings of 1 ms to 1 s
+with a noise of 1%, whose float64 arrays take 8 bytes per value (and lists of Python floats 32 bytes), the bytes per value are:
+
+    ===========  ================  ================
+    encoding     resolution 1e-6   resolution 1e-9
+    ===========  ================  ================
+    float32      4.0               4.0
+    scaled       2.1               4.0
+    delta        2.3               3.6
+    ===========  ================  ================
+
+A coarser resolution gives a smaller size; the error bound below tells whether it is still fine enough.
+
+``encode()`` returns an ``EncodedMeasurements`` that can be passed to ``QuantileComparer`` in place of the measurements dictionary:
+the measurements of an object are decoded when they are accessed, so only one object is decoded at a time.
+The largest absolute error of a decoded value is reported as **error_bound**. Since a quantile moves by at most the largest error of the values,
+the comparisons of the decoded measurements are the comparisons of the original measurements if no two quantiles are within 2 * **error_bound**,
+which ``EncodedMeasurements.preserves_comparisons()`` checks (with outlier removal, it also checks that no value is close to a fence).
+"""
+
+import zlib
+from collections.abc import Mapping
+import numpy as np
+from .quantile_comparer import _select_percentiles
+from .serialization import _names_array
+
+ENCODINGS = ('float32', 'scaled', 'delta')
+FORMAT_VERSION = 2
+
+
+def _int_dtype(lo, hi, kind='i'):
+    for size in (1, 2, 4):
+        info = np.iinfo('{}{}'.format(kind, size))
+        if info.min <= lo and hi <= info.max:
+            return np.dtype(info.dtype)
+    return np.dtype('{}8'.format(kind))
+
+
+class EncodedMeasurements(Mapping):
+    """A read-only measurements dictionary ``{obj: numpy.ndarray}`` that stores the values encoded. It is created with ``encode()`` or ``load()``.
+
+    **Attributes and Methods**:
+
+    Attributes:
+        objs (List[str]): The object names.
+
+        encoding (str): One of ``ENCODINGS``.
+
+        resolution (float): The resolution of the scaled and delta encodings, or None.
+
+        base (numpy.ndarray): The smallest multiple of **resolution** of each object, which the scaled and delta encodings store the values relative to, or None.
+
+        error_bound (float): The largest absolute difference between a decoded and an original value.
+
+        data (numpy.ndarray): The encoded values of all the objects, or their bytes for the scaled and delta encodings.
+
+        offsets (numpy.ndarray): The start of the values (or bytes) of each object in **data**, and the end of the last object.
+
+        dtype (numpy.dtype): The type of the values, or the integer kind (signed or unsigned) of the scaled and delta encodings.
+
+        itemsizes (numpy.ndarray): The bytes per integer of each object in the scaled and delta encodings, or None if all are of **dtype**.
+    """
+
+    def __init__(self, objs, encoding, data, offsets, dtype, resolution, error_bound, base=None, itemsizes=None):
+        if encoding not in ENCODINGS:
+            raise ValueError("Unsupported encoding '{}'. Expected one of {}".format(encoding, ENCODINGS))
+        self.objs = list(objs)
+        self.encoding = encoding
+        self.data = data
+        self.offsets = offsets
+        self.dtype = np.dtype(dtype)
+        self.resolution = resolution
+        self.error_bound = error_bound
+        self.base = base
+        self.itemsizes = itemsizes
+        self._index = {obj: i for i, obj in enumerate(self.objs)}
+
+    def __getitem__(self, obj) -> np.ndarray:
+        i = self._index[obj]
+        chunk = self.data[self.offsets[i]:self.offsets[i+1]]
+        if self.encoding == 'float32':
+            return chunk.astype(np.float64)
+        dtype = self.dtype if self.itemsizes is None else np.dtype('{}{}'.format(self.dtype.kind, self.itemsizes[i]))
+        if self.encoding == 'delta':
+            chunk = np.cumsum(np.frombuffer(zlib.decompress(chunk.tobytes()), dtype=dtype), dtype=np.int64)
+        elif self.itemsizes is not None:
+            chunk = np.frombuffer(chunk.tobytes(), dtype=dtype).astype(np.int64)
+        else:
+            chunk = chunk.astype(np.int64)
+        if self.base is not None:
+            chunk += self.base[i]
+        return chunk * self.resolution
+
+    def __contains__(self, obj):
+        return obj in self._index
+
+    def __iter__(self):
+        return iter(self.objs)
+
+    def __len__(self):
+        return len(self.objs)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns:
+            int: The size of the encoded values, the offsets, the bases and the item sizes in bytes.
+        """
+        return self.data.nbytes + self.offsets.nbytes + sum(a.nbytes for a in (self.base, self.itemsizes) if a is not None)
+
+    def preserves_comparisons(self, comparer) -> bool:
+        """Checks that the IQI comparisons of a comparer of the decoded measurements are those of the original measurements, i.e., that
+        no upper quantile is within 2 * **error_bound** of a lower quantile. It takes O(N log N) time.
+
+        If the comparer removed outliers, a value close to a 1.5 IQR fence may be kept for the decoded but not for the original measurements,
+        which moves the quantiles by more than **error_bound**. Since the fences move by at most 4 * **error_bound**, it is also checked
+        that every value is more than 5 * **error_bound** from the fences of its object, which takes time proportional to the number of values.
+
+        Args:
+            comparer (partial_ranker.QuantileComparer): A comparer of these measurements, after ``compute_quantiles()``.
+
+        Returns:
+            bool: True if the comparisons, and hence the ranks, are the same as for the original measurements.
+        """
+        if not comparer.objs:
+            return True
+        low = np.concatenate(([-np.inf], np.sort([comparer.t_low[x] for x in comparer.objs]), [np.inf]))
+        up = np.array([comparer.t_up[x] for x in comparer.objs])
+        # The distance of each upper quantile to the nearest lower quantile.
+        k = np.searchsorted(low, up)
+        gap = np.minimum(low[k] - up, up - low[k - 1])
+        if not gap.min() > 2 * self.error_bound:
+            return False
+        if getattr(comparer, '_outliers', False):
+            for x in comparer.objs:
+                values = self[x]
+                q1, q2 = _select_percentiles(values.copy(), [25, 75])
+                iqr = q2 - q1
+                fences = np.array([q1 - 1.5 * iqr, q2 + 1.5 * iqr])
+                if not np.abs(values[:, None] - fences).min() > 5 * self.error_bound:
+                    return False
+        return True
+
+    def save(self, path:str) -> None:
+        """Saves the encoded measurements to an NPZ file without decoding them.
+
+        Args:
+            path (str): Path of the file. As with ``numpy.savez()``, '.npz' is appended if missing.
+        """
+        np.savez(path, version=np.array(FORMAT_VERSION), objs=_names_array(self.objs), encoding=np.array(self.encoding),
+                 data=self.data, offsets=self.offsets, dtype=np.array(self.dtype.str),
+                 resolution=np.array(np.nan if self.resolution is None else self.resolution), error_bound=np.array(self.error_bound),
+                 **{name: a for name, a in (('base', self.base), ('itemsizes', self.itemsizes)) if a is not None})
+
+
+def load(path:str) -> EncodedMeasurements:
+    """
+    Args:
+        path (str): Path of a file written by ``EncodedMeasurements.save()``.
+
+    Returns:
+        partial_ranker.encoding.EncodedMeasurements: The encoded measurements.
+    """
+    with np.load(path) as f:
+        if int(f['version']) > FORMAT_VERSION:
+            raise ValueError("{} was written by a newer version of partial_ranker".format(path))
+        resolution = float(f['resolution'])
+        return EncodedMeasurements(f['objs'].tolist(), str(f['encoding']), f['data'], f['offsets'], str(f['dtype']),
+                                   None if np.isnan(resolution) else resolution, float(f['error_bound']),
+                                   *(f[name] if name in f.files else None for name in ('base', 'itemsizes')))
+
+
+def encode(measurements:dict, encoding:str='float32', resolution:float=None, level:int=6) -> EncodedMeasurements:
+    """Encodes a measurements dictionary.
+
+    Args:
+        measurements (dict[str, List[float]]): A dictionary of objects consisting of a list of measurement values.
+        encoding (str, optional): One of ``ENCODINGS``. Defaults to 'float32'.
+        resolution (float, optional): The resolution of the values for the scaled and delta encodings, e.g., 1e-9 for nanoseconds. Required by these encodings.
+        level (int, optional): The zlib compression level of the delta encoding. Defaults to 6.
+
+    Returns:
+        partial_ranker.encoding.EncodedMeasurements: The encoded measurements.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError("Unsupported encoding '{}'. Expected one of {}".format(encoding, ENCODINGS))
+    if encoding != 'float32' and not resolution:
+        raise ValueError("The {} encoding requires a resolution".format(encoding))
+    objs = list(measurements.keys())
+    values = [np.asarray(measurements[x], dtype=np.float64) for x in objs]
+    offsets = np.zeros(len(objs) + 1, dtype=np.int64)
+    np.cumsum([len(v) for v in values], out=offsets[1:])
+    flat = np.concatenate(values) if values else np.empty(0)
+
+    if encoding == 'float32':
+        data = flat.astype(np.float32)
+        error = np.abs(data.astype(np.float64) - flat)
+        return EncodedMeasurements(objs, encoding, data, offsets, np.float32, None, float(error.max()) if len(error) else 0.0)
+
+    ints = np.rint(flat / resolution).astype(np.int64)
+    error = np.abs(ints * resolution - flat)
+    error_bound = float(error.max()) if len(error) else 0.0
+    # The values of each object relative to its smallest value.
+    starts = offsets[:-1][np.diff(offsets) > 0]
+    base = np.zeros(len(objs), dtype=np.int64)
+    if len(ints):
+        base[np.diff(offsets) > 0] = np.minimum.reduceat(ints, starts)
+    ints -= np.repeat(base, np.diff(offsets))
+    if encoding == 'scaled':
+        kind = 'u'
+    else:
+        # The first value of each object is stored as a difference to its base.
+        kind = 'i'
+        first = ints[starts]
+        ints = np.diff(ints, prepend=0)
+        ints[starts] = first
+
+    # Each object is stored in the smallest integer type that holds its values.
+    blobs, itemsizes = [], np.ones(len(objs), dtype=np.uint8)
+    for i in range(len(objs)):
+        chunk = ints[offsets[i]:offsets[i+1]]
+        dtype = _int_dtype(chunk.min(), chunk.max(), kind) if len(chunk) else np.dtype('{}1'.format(kind))
+        itemsizes[i] = dtype.itemsize
+        blobs.append(chunk.astype(dtype).tobytes())
+        if encoding == 'delta':
+            blobs[-1] = zlib.compress(blobs[-1], level)
+    byte_offsets = np.zeros(len(objs) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in blobs], out=byte_offsets[1:])
+    data = np.frombuffer(b''.join(blobs), dtype=np.uint8)
+    return EncodedMeasurements(objs, encoding, data, byte_offsets, np.dtype('{}8'.format(kind)), resolution, error_bound, base, itemsizes)
@@ -20,8 +20,61 @@
 # Contributors:
 # - Aravind Sankaran
 
-import pandas as pd
+import json
+from collections.abc import Mapping
+from contextlib import contextmanager
+from xml.sax.saxutils import quoteattr
 from typing import List
+import numpy as np
+from . import kernels
+from .instrumentation import instrumented
+
+_CHUNK_EDGES = 1 << 20  # dependencies converted at once in _find_transitive_edges
+_CHUNK_ROWS = 1024  # rows of the closure unpacked at once in get_dominance_counts
+
+
+@contextmanager
+def _open_output(f):
+    if isinstance(f, str):
+        with open(f, 'w') as fh:
+            yield fh
+    else:
+        yield f
+
+
+def _dot_id(name):
+    return '"' + str(name).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+class _Adjacency(Mapping):
+    # A read-only view of int32 CSR adjacency as a dictionary of lists of node names, e.g., Graph.in_nodes of a compact graph.
+    # The lists are created on access; keys holds the ids of the nodes with neighbors in the order of the dictionary.
+    __slots__ = ('_nodes', '_index', '_keys', '_ptr', '_idx')
+
+    def __init__(self, nodes, index, keys, ptr, idx):
+        self._nodes = nodes
+        self._index = index
+        self._keys = keys
+        self._ptr = ptr
+        self._idx = idx
+
+    def __getitem__(self, node):
+        i = self._index[node]
+        start, stop = self._ptr[i], self._ptr[i+1]
+        if start == stop:
+            raise KeyError(node)
+        return [self._nodes[k] for k in self._idx[start:stop].tolist()]
+
+    def __contains__(self, node):
+        i = self._index.get(node)
+        return i is not None and self._ptr[i] != self._ptr[i+1]
+
+    def __iter__(self):
+        for i in self._keys.tolist():
+            yield self._nodes[i]
+
+    def __len__(self):
+        return len(self._keys)
+
 
 class Graph:
     """Class to represent the dependencies of the objects as a transitively reduced directed acyclic graph.
@@ -34,6 +87,12 @@ class Graph:
         **depths (dict[int,List[str]])**: A dictionary consisting of the list of objects at each rank.
             
             - e.g.; in  ``{0: ['obj1'], 1: ['obj2', 'obj3'], ...}``, ``obj1`` is at rank 0, ``obj2`` and ``obj3`` are at rank 1, etc.
+
+        **edges (list[tuple[str, str]], optional)**: The edges of the transitively reduced graph, e.g., loaded from a file, in the order of ``get_edges()``. If given, the edges are not recomputed from the dependencies. Defaults to None.
+
+        **compact (bool, optional)**: Store the graph with integer node ids: the names are interned once, and the edges are held as int32 arrays in the CSR format
+        (the parents and the children of each node). **in_nodes** and **out_nodes** are then read-only mappings with the same contents and order,
+        whose lists are created on access. Defaults to False.
             
     **Attributes and Methods**:
     
@@ -42,21 +101,293 @@ class Graph:
         out_nodes (dict[str, list[str]]): Dictionary with nodes as keys and a list of nodes that has outgoing edges from the node indicated in the key.
     
     """
-    def __init__(self,dependencies, depths):
+    def __init__(self,dependencies, depths, edges=None, compact=False):
         self.deps = dependencies
         self.depths = depths
+        self.compact = compact
         
         self.in_nodes = {}
         self.out_nodes = {}
-        self._find_transitive_edges()
+        self._closure = None
+        if compact:
+            # Nodes are numbered in rank order, as in _find_transitive_edges().
+            self._nodes, self._index, self._rank = self._number_nodes()
+            if edges is None:
+                _, better, worse = self._find_transitive_edges()
+            else:
+                better = np.fromiter((self._index[node1] for node1, _ in edges), dtype=np.int64)
+                worse = np.fromiter((self._index[node2] for _, node2 in edges), dtype=np.int64)
+            self._set_compact_edges(better, worse)
+        elif edges is None:
+            self._set_edges(*self._find_transitive_edges())
+        else:
+            # Appending the edges in the order of get_edges() reproduces the lists and key order of _set_edges().
+            for node1, node2 in edges:
+                self.in_nodes.setdefault(node2, []).append(node1)
+                self.out_nodes.setdefault(node1, []).append(node2)
     
+    def _number_nodes(self):
+        nodes = [node for d in range(len(self.depths)) for node in self.depths[d]]
+        index = {node: i for i, node in enumerate(nodes)}
+        depth = np.repeat(np.arange(len(self.depths), dtype=np.int32), [len(self.depths[d]) for d in range(len(self.depths))])
+        return nodes, index, depth
+
+    @instrumented('Graph._find_transitive_edges')
     def _find_transitive_edges(self):
-        for d in range(len(self.depths)-1):
+        # Nodes are numbered in rank order; only edges between consecutive ranks are kept.
+        nodes, index, depth = self._number_nodes() if not self.compact else (self._nodes, self._index, self._rank)
+        better, worse = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        if hasattr(self.deps, 'indices'):
+            # The dependencies are computed on access as positions in deps.objs, e.g., from a comparison matrix on disk;
+            # they are mapped to node ids one node at a time, so that only the kept edges are held in memory.
+            node_id = np.full(len(self.deps.objs), -1, dtype=np.int64)
+            pos = {obj: k for k, obj in enumerate(self.deps.objs)}
+            node_id[[pos[node] for node in nodes]] = np.arange(len(nodes))
+            for node2, d in zip(nodes, depth.tolist()):
+                if d:
+                    ids = node_id[self.deps.indices(node2)]
+                    ids = ids[ids >= 0]
+                    better.append(ids[depth[ids] == d - 1])
+                    worse.append(np.full(len(better[-1]), index[node2], dtype=np.int64))
+        else:
+            # The dependencies are converted in chunks of about _CHUNK_EDGES entries.
+            start, deps, size = 0, [], 0
+            for node2, d in zip(nodes, depth.tolist()):
+                deps.append([node1 for node1 in self.deps[node2] if node1 in index] if d else [])
+                size += len(deps[-1])
+                if size >= _CHUNK_EDGES or start + len(deps) == len(nodes):
+                    b, w = kernels.consecutive_depth_edges(*kernels.to_csr(deps, index), depth, start)
+                    better.append(b)
+                    worse.append(w)
+                    start, deps, size = start + len(deps), [], 0
+        return nodes, np.concatenate(better), np.concatenate(worse)
+
+    def _set_edges(self, nodes, better, worse):
+        # As in a scan of the pairs of nodes in consecutive ranks: the parents and children are listed in rank order, the keys of out_nodes are
+        # in rank order and those of in_nodes in order of their first parent.
+        first_parent = np.full(len(nodes), len(nodes), dtype=np.int64)
+        np.minimum.at(first_parent, worse, better)
+        order = np.lexsort((better, worse, first_parent[worse]))
+        for node1, node2 in zip(better[order].tolist(), worse[order].tolist()):
+            self.in_nodes.setdefault(nodes[node2], []).append(nodes[node1])
+        order = np.lexsort((worse, better))
+        for node1, node2 in zip(better[order].tolist(), worse[order].tolist()):
+            self.out_nodes.setdefault(nodes[node1], []).append(nodes[node2])
+
+    def _set_compact_edges(self, better, worse):
+        # The same lists and key order as _set_edges(), as int32 CSR arrays.
+        n = len(self._nodes)
+        order = np.lexsort((better, worse))
+        self._in_ptr = np.zeros(n + 1, dtype=np.int32)
+        np.cumsum(np.bincount(worse, minlength=n), out=self._in_ptr[1:])
+        self._in_idx = better[order].astype(np.int32)
+        order = np.lexsort((worse, better))
+        self._out_ptr = np.zeros(n + 1, dtype=np.int32)
+        np.cumsum(np.bincount(better, minlength=n), out=self._out_ptr[1:])
+        self._out_idx = worse[order].astype(np.int32)
+        in_keys = np.flatnonzero(np.diff(self._in_ptr))
+        in_keys = in_keys[np.lexsort((in_keys, self._in_idx[self._in_ptr[in_keys]]))].astype(np.int32)
+        out_keys = np.flatnonzero(np.diff(self._out_ptr)).astype(np.int32)
+        self.in_nodes = _Adjacency(self._nodes, self._index, in_keys, self._in_ptr, self._in_idx)
+        self.out_nodes = _Adjacency(self._nodes, self._index, out_keys, self._out_ptr, self._out_idx)
+
+    @instrumented('Graph.build_closure')
+    def build_closure(self) -> None:
+        """Computes the transitive closure of the graph as packed bitsets (see ``kernels.reachability()``), for the reachability queries
+        ``is_reachable()``, ``get_ancestors()``, ``get_descendants()`` and ``get_dominance_counts()``. It is computed on the first query if not called before.
+        The queries follow the paths of the graph, i.e., the edges in **in_nodes**.
+        The closure takes N*N/8 bytes, e.g., 312 MB for 50000 nodes.
+        """
+        if self.compact:
+            nodes, index, parents = self._nodes, self._index, (self._in_ptr, self._in_idx)
+        else:
+            nodes, index, _ = self._number_nodes()
+            parents = kernels.to_csr([self.in_nodes.get(node, []) for node in nodes], index)
+        self._closure = (nodes, index, kernels.reachability(*parents))
+
+    def _get_closure(self):
+        if self._closure is None:
+            self.build_closure()
+        return self._closure
+
+    def is_reachable(self, node1, node2) -> bool:
+        """
+        Args:
+            node1 (str): A node.
+            node2 (str): A node.
+
+        Returns:
+            bool: True if there is a path from **node1** to **node2**, i.e., if **node1** is transitively better than **node2**.
+        """
+        _, index, closure = self._get_closure()
+        i, j = index[node1], index[node2]
+        return i != j and bool((int(closure[j, i >> 6]) >> (i & 63)) & 1)
+
+    def get_ancestors(self, node) -> List:
+        """
+        Args:
+            node (str): A node.
+
+        Returns:
+            List[str]: The nodes from which there is a path to **node**, i.e., that are transitively better than **node**, in rank order.
+        """
+        nodes, index, closure = self._get_closure()
+        j = index[node]
+        bits = kernels.unpack_bits(closure[j:j+1], len(nodes))[0]
+        bits[j] = False
+        return [nodes[i] for i in np.flatnonzero(bits).tolist()]
+
+    def get_descendants(self, node) -> List:
+        """
+        Args:
+            node (str): A node.
+
+        Returns:
+            List[str]: The nodes to which there is a path from **node**, i.e., that **node** is transitively better than, in rank order.
+        """
+        nodes, index, closure = self._get_closure()
+        i = index[node]
+        column = (closure[:, i >> 6] >> np.uint64(i & 63)) & np.uint64(1)
+        column[i] = 0
+        return [nodes[j] for j in np.flatnonzero(column).tolist()]
+
+    @instrumented('Graph.get_dominance_counts')
+    def get_dominance_counts(self) -> dict:
+        """
+        Returns:
+            dict[str, tuple[int, int]]: For each node, the number of its ancestors (the nodes that are transitively better than it)
+            and the number of its descendants (the nodes that it is transitively better than).
+        """
+        nodes, _, closure = self._get_closure()
+        n_ancestors = np.empty(len(nodes), dtype=np.int64)
+        n_descendants = np.zeros(len(nodes), dtype=np.int64)
+        for start in range(0, len(nodes), _CHUNK_ROWS):
+            bits = kernels.unpack_bits(closure[start:start+_CHUNK_ROWS], len(nodes))
+            n_ancestors[start:start+_CHUNK_ROWS] = bits.sum(axis=1) - 1
+            n_descendants += bits.sum(axis=0)
+        n_descendants -= 1
+        return {node: (a, b) for node, a, b in zip(nodes, n_ancestors.tolist(), n_descendants.tolist())}
+
+    def get_edges(self):
+        """Generator over the edges of the transitively reduced graph, in rank order.
+
+        Yields:
+            tuple[str, str]: An edge ``(node1, node2)`` where ``node1`` is better than ``node2``.
+        """
+        if self.compact:
+            nodes = self._nodes
+            for node1, node2 in zip(kernels._rows(self._out_ptr).tolist(), self._out_idx.tolist()):
+                yield nodes[node1], nodes[node2]
+            return
+        for d in range(len(self.depths)):
             for node1 in self.depths[d]:
-                for node2 in self.depths[d+1]:
-                    if node1 in self.deps[node2]:
-                        self.in_nodes[node2] = self.in_nodes.get(node2,[]) + [node1]
-                        self.out_nodes[node1] = self.out_nodes.get(node1,[]) + [node2]
+                for node2 in self.out_nodes.get(node1, []):
+                    yield node1, node2
+
+    def get_rank_edges(self) -> dict:
+        """Collapses the graph to one node per rank.
+
+        Returns:
+            dict[tuple[int,int], int]: The number of edges between the nodes of two ranks, e.g., ``{(0, 1): 3, (1, 2): 5, ...}``.
+        """
+        rank_edges = {}
+        if self.compact:
+            counts = np.bincount(self._rank, weights=np.diff(self._out_ptr), minlength=len(self.depths)).astype(np.int64)
+            return {(d, d+1): n for d, n in enumerate(counts[:len(self.depths)-1].tolist()) if n}
+        for d in range(len(self.depths)-1):
+            n = sum(len(self.out_nodes.get(node, [])) for node in self.depths[d])
+            if n:
+                rank_edges[(d, d+1)] = n
+        return rank_edges
+
+    def write_dot(self, f, collapse_ranks=False, highlight_nodes=[]) -> None:
+        """Writes the graph in the DOT language without going through graphviz. The output is written line by line, so it scales to large graphs.
+        The nodes of the same rank are placed in a ``rank=same`` group.
+
+        Args:
+            f (str | file): A file path or a writable text file object.
+            collapse_ranks (bool, optional): If True, each rank is written as a single node labelled with the number of objects, 
+                and the edges are labelled with the number of edges between the ranks. Defaults to False.
+            highlight_nodes (list, optional): The nodes in this list are highlighted as in ``visualize()``. Defaults to [].
+        """
+        highlight_nodes = set(highlight_nodes)
+        with _open_output(f) as fh:
+            fh.write('digraph {\n')
+            if collapse_ranks:
+                for d in range(len(self.depths)):
+                    fh.write('\t%s [label="rank %d (%d)" style=filled color="#f0efed"]\n' % (_dot_id(d), d, len(self.depths[d])))
+                for (d1, d2), n in self.get_rank_edges().items():
+                    fh.write('\t%s -> %s [label=%d penwidth=%.2f]\n' % (_dot_id(d1), _dot_id(d2), n, 1 + min(n, 100) / 20))
+            else:
+                for d in range(len(self.depths)):
+                    fh.write('\t{ rank=same;')
+                    for node in self.depths[d]:
+                        color = '#f2ecc7' if node in highlight_nodes else '#f0efed'
+                        fh.write(' %s [style=filled color="%s"];' % (_dot_id(node), color))
+                    fh.write(' }\n')
+                for node1, node2 in self.get_edges():
+                    attrs = ' [style=filled color=blue]' if node1 in highlight_nodes else ''
+                    fh.write('\t%s -> %s%s\n' % (_dot_id(node1), _dot_id(node2), attrs))
+            fh.write('}\n')
+
+    def write_graphml(self, f, collapse_ranks=False) -> None:
+        """Writes the graph in the GraphML format. Each node carries its rank as the ``rank`` attribute.
+
+        Args:
+            f (str | file): A file path or a writable text file object.
+            collapse_ranks (bool, optional): If True, each rank is written as a single node with a ``size`` attribute, 
+                and the edges carry the number of edges between the ranks as the ``count`` attribute. Defaults to False.
+        """
+        with _open_output(f) as fh:
+            fh.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            fh.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+            fh.write('<key id="rank" for="node" attr.name="rank" attr.type="int"/>\n')
+            if collapse_ranks:
+                fh.write('<key id="size" for="node" attr.name="size" attr.type="int"/>\n')
+                fh.write('<key id="count" for="edge" attr.name="count" attr.type="int"/>\n')
+            fh.write('<graph id="G" edgedefault="directed">\n')
+            if collapse_ranks:
+                for d in range(len(self.depths)):
+                    fh.write('<node id="%d"><data key="rank">%d</data><data key="size">%d</data></node>\n' % (d, d, len(self.depths[d])))
+                for (d1, d2), n in self.get_rank_edges().items():
+                    fh.write('<edge source="%d" target="%d"><data key="count">%d</data></edge>\n' % (d1, d2, n))
+            else:
+                for d in range(len(self.depths)):
+                    for node in self.depths[d]:
+                        fh.write('<node id=%s><data key="rank">%d</data></node>\n' % (quoteattr(str(node)), d))
+                for node1, node2 in self.get_edges():
+                    fh.write('<edge source=%s target=%s/>\n' % (quoteattr(str(node1)), quoteattr(str(node2))))
+            fh.write('</graph>\n</graphml>\n')
+
+    def write_json(self, f, collapse_ranks=False) -> None:
+        """Writes the graph as a compact JSON edge list. The nodes are listed once and the edges refer to them by index:
+        ``{"nodes": [...], "ranks": [...], "edges": [[i, j], ...]}``, where ``ranks[i]`` is the rank of ``nodes[i]``.
+
+        Args:
+            f (str | file): A file path or a writable text file object.
+            collapse_ranks (bool, optional): If True, the nodes are the ranks, ``sizes`` holds the number of objects in each rank, 
+                and the edges are written as ``[rank_i, rank_j, count]``. Defaults to False.
+        """
+        if collapse_ranks:
+            data = {
+                'sizes': [len(self.depths[d]) for d in range(len(self.depths))],
+                'edges': [[d1, d2, n] for (d1, d2), n in self.get_rank_edges().items()],
+            }
+        else:
+            index = {}
+            ranks = []
+            for d in range(len(self.depths)):
+                for node in self.depths[d]:
+                    index[node] = len(index)
+                    ranks.append(d)
+            data = {
+                'nodes': list(index.keys()),
+                'ranks': ranks,
+                'edges': [[index[node1], index[node2]] for node1, node2 in self.get_edges()],
+            }
+        with _open_output(f) as fh:
+            json.dump(data, fh, separators=(',', ':'))
+                    
             
                     
     def visualize(self,highlight_nodes=[]):
@@ -87,28 +418,19 @@ class Graph:
         return g
     
     
+    @instrumented('Graph.get_separable_arrangement')
     def get_separable_arrangement(self) -> List:
         """
         Returns:
             List[str]: Arrangement of the objects according to Methodology 2 (Step 1 to 3) in the paper. 
         """
+        if self.compact:
+            # The same order with the degrees from the CSR arrays; lexsort is stable, and the nodes are numbered in rank order.
+            n_in, n_out = np.diff(self._in_ptr), np.diff(self._out_ptr)
+            order = np.lexsort((n_in, -n_out, self._rank))
+            return [self._nodes[i] for i in order.tolist()]
         h0_ = [] # The list h0_ is same as T in the paper. 
         for rank in range(len(self.depths)):
-            nodes = []
-            num_in_nodes = []
-            num_out_nodes = []
-            for node in self.depths[rank]:
-                nodes.append(node)
-                if node in self.in_nodes:
-                    num_in_nodes.append(len(self.in_nodes[node]))
-                else:
-                    num_in_nodes.append(0)
-                
-                if node in self.out_nodes:
-                    num_out_nodes.append(len(self.out_nodes[node]))
-                else:
-                    num_out_nodes.append(0)
-            df = pd.DataFrame(list(zip(nodes, num_out_nodes, num_in_nodes)))
-            h0_ = h0_ + list(df.sort_values([1,2],ascending=[False,True])[0])
+            # Stable sort by decreasing number of outgoing edges, then increasing number of incoming edges.
+            h0_ = h0_ + sorted(self.depths[rank], key=lambda node: (-len(self.out_nodes.get(node, [])), len(self.in_nodes.get(node, []))))
         return h0_
-        
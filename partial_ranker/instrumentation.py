@@ -0,0 +1,224 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# The profilers that are currently active. The stages of the library only do work when this list is not empty.
+_profilers = []
+
+
+class _Frame:
+    __slots__ = ('name', 'start', 'mem_start', 'peak')
+
+    def __init__(self, name, start, mem_start):
+        self.name = name
+        self.start = start
+        self.mem_start = mem_start
+        self.peak = mem_start
+
+
+class Profiler:
+    """Opt-in instrumentation of the stages of the library. While a profiler is active (inside its ``with`` block),
+    every stage, e.g., ``QuantileComparer.compare`` or ``Graph.get_separable_arrangement``, records its wall time and number of calls,
+    and the library increments counters such as ``QuantileComparer.comparisons`` and ``QuantileComparer.cache_hits``.
+
+    Example:
+        >>> with Profiler(trace_memory=True) as prof:
+        ...     cm.compute_quantiles(75, 25)
+        ...     cm.compare()
+        >>> prof.to_dict()['stages']['QuantileComparer.compare']
+        {'calls': 1, 'time_s': 0.03, 'peak_bytes': 268}
+
+    Input:
+        **trace_memory (bool, optional)**: Record the peak memory allocated by each stage with ``tracemalloc``. This slows down the profiled code. Defaults to False.
+
+        **callbacks (List[Callable], optional)**: Functions that are called with the record of every finished stage,
+        a dictionary with the keys ``name``, ``start``, ``time_s`` and ``peak_bytes``. Defaults to None.
+
+    **Attributes and Methods**:
+
+    Attributes:
+        events (List[dict]): The records of all the finished stages in the order in which they finished.
+        counters (dict[str, int]): The values of the counters.
+    """
+
+    def __init__(self, trace_memory=False, callbacks=None):
+        self.trace_memory = trace_memory
+        self.callbacks = list(callbacks) if callbacks else []
+        self.events = []
+        self.counters = {}
+        self._local = threading.local()
+        # Guards the counters, which are incremented from the thread pools of the library.
+        self._lock = threading.Lock()
+        self._t0 = None
+        self._own_tracemalloc = False
+
+    def __enter__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+        self._t0 = time.perf_counter()
+        _profilers.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _profilers.remove(self)
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+            self._own_tracemalloc = False
+        return False
+
+    def add_callback(self, fn) -> None:
+        """
+        Args:
+            fn (Callable[[dict], None]): A function that is called with the record of every finished stage.
+        """
+        self.callbacks.append(fn)
+
+    @property
+    def _stack(self):
+        # Each thread nests its stages on its own stack, e.g., the workers of compute_quantiles(threads=...).
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _begin(self, name, now, mem, peak):
+        stack = self._stack
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, peak)
+        stack.append(_Frame(name, now, mem))
+
+    def _end(self, now, peak):
+        stack = self._stack
+        frame = stack.pop()
+        frame.peak = max(frame.peak, peak)
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, frame.peak)
+        event = {
+            'name': frame.name,
+            'start': frame.start - self._t0,
+            'time_s': now - frame.start,
+            'peak_bytes': frame.peak - frame.mem_start if self.trace_memory else None,
+            'tid': threading.get_ident(),
+        }
+        self.events.append(event)
+        for fn in self.callbacks:
+            fn(event)
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: ``{'stages': {name: {'calls', 'time_s', 'peak_bytes'}}, 'counters': {name: value}}``, where the time of a stage is summed and its peak memory is maximized over all its calls.
+        """
+        stages = {}
+        for e in self.events:
+            s = stages.setdefault(e['name'], {'calls': 0, 'time_s': 0.0, 'peak_bytes': None})
+            s['calls'] += 1
+            s['time_s'] += e['time_s']
+            if e['peak_bytes'] is not None:
+                s['peak_bytes'] = max(s['peak_bytes'] or 0, e['peak_bytes'])
+        with self._lock:
+            counters = dict(self.counters)
+        return {'stages': stages, 'counters': counters}
+
+    def to_chrome_trace(self, f=None) -> dict:
+        """Exports the stages in the Chrome trace event format, which can be opened with ``chrome://tracing`` or Perfetto.
+
+        Args:
+            f (str | file, optional): If given, the trace is written as JSON to this file path or file object.
+
+        Returns:
+            dict: The trace, ``{'traceEvents': [...]}``.
+        """
+        pid = os.getpid()
+        events = []
+        for e in self.events:
+            events.append({
+                'name': e['name'], 'ph': 'X', 'pid': pid, 'tid': e['tid'],
+                'ts': e['start'] * 1e6, 'dur': e['time_s'] * 1e6,
+                'args': {} if e['peak_bytes'] is None else {'peak_bytes': e['peak_bytes']},
+            })
+        end = max((e['start'] + e['time_s'] for e in self.events), default=0.0)
+        for name, value in self.counters.items():
+            events.append({'name': name, 'ph': 'C', 'pid': pid, 'ts': end * 1e6, 'args': {name: value}})
+        trace = {'traceEvents': events, 'displayTimeUnit': 'ms'}
+        if isinstance(f, str):
+            with open(f, 'w') as fh:
+                json.dump(trace, fh)
+        elif f is not None:
+            json.dump(trace, f)
+        return trace
+
+
+def _memory():
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()
+    return 0, 0
+
+
+@contextmanager
+def stage(name:str):
+    """Context manager that records the enclosed code as the stage **name** in all active profilers."""
+    if not _profilers:
+        yield
+        return
+    profilers = list(_profilers)
+    mem, peak = _memory()
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    now = time.perf_counter()
+    for p in profilers:
+        p._begin(name, now, mem, peak)
+    try:
+        yield
+    finally:
+        now = time.perf_counter()
+        peak = _memory()[1]
+        for p in profilers:
+            p._end(now, peak)
+
+
+def instrumented(name:str):
+    """Decorator that records every call of the decorated function as the stage **name**."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _profilers:
+                return fn(*args, **kwargs)
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name:str, n:int=1) -> None:
+    """Increments the counter **name** by **n** in all active profilers."""
+    for p in _profilers:
+        with p._lock:
+            p.counters[name] = p.counters.get(name, 0) + n
@@ -0,0 +1,382 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+"""Kernels for the loop-shaped parts of the rankers, over integer-indexed arrays.
+
+A relation between N objects is passed in the compressed sparse row (CSR) format: the objects related to object ``i``
+are ``indices[indptr[i]:indptr[i+1]]``. E.g., for the dependencies, these are the objects that are better than ``i``.
+
+Two backends implement the kernels with identical results: 'numba' compiles loops in nopython mode and is used when Numba is installed,
+and 'numpy' is vectorized pure NumPy. The backend can be selected with ``set_backend()`` or the environment variable ``PARTIAL_RANKER_BACKEND``.
+Numba is imported when a kernel is first called, and if it cannot be imported, the numpy backend is used with a warning.
+"""
+
+import os
+import warnings
+from importlib.util import find_spec
+import numpy as np
+
+BACKENDS = ('numba', 'numpy') if find_spec('numba') is not None else ('numpy',)
+
+
+def _initial_backend():
+    name = os.environ.get('PARTIAL_RANKER_BACKEND', BACKENDS[0])
+    if name not in ('numba', 'numpy'):
+        raise ValueError("Unknown backend '{}' in PARTIAL_RANKER_BACKEND. Expected 'numba' or 'numpy'".format(name))
+    if name not in BACKENDS:
+        warnings.warn("PARTIAL_RANKER_BACKEND={} but Numba is not installed; using the numpy backend".format(name))
+        return 'numpy'
+    return name
+
+
+_backend = _initial_backend()
+
+
+def set_backend(name:str) -> None:
+    """
+    Args:
+        name (str): 'numba' or 'numpy'.
+    """
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError("Backend '{}' is not available. Available backends: {}".format(name, BACKENDS))
+    _backend = name
+
+
+def get_backend() -> str:
+    """
+    Returns:
+        str: The name of the active backend.
+    """
+    return _backend
+
+
+def to_csr(lists:list, index:dict) -> tuple:
+    """
+    Args:
+        lists (List[List[str]]): The related objects of each object.
+        index (dict[str, int]): The integer id of each object.
+
+    Returns:
+        tuple[numpy.ndarray, numpy.ndarray]: indptr and indices.
+    """
+    indptr = np.zeros(len(lists) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(l) for l in lists])
+    indices = np.fromiter((index[x] for l in lists for x in l), dtype=np.int64, count=indptr[-1])
+    return indptr, indices
+
+
+_GATHER_BYTES = 1 << 26  # rows of bitsets gathered at once by the numpy backend of reachability()
+
+
+def _rows(indptr):
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+
+# ---- numpy backend ----
+
+def _dag_depths_numpy(indptr, indices):
+    n = len(indptr) - 1
+    rows = _rows(indptr)
+    # indices -> rows are the edges from a better object to a worse one; peel the DAG level by level.
+    order = np.argsort(indices, kind='stable')
+    succ_ptr = np.zeros(n + 1, dtype=np.int64)
+    succ_ptr[1:] = np.cumsum(np.bincount(indices, minlength=n))
+    succ = rows[order]
+    indeg = np.diff(indptr).copy()
+    depth = np.full(n, -1, dtype=np.int64)
+    frontier = np.flatnonzero(indeg == 0)
+    d = 0
+    while len(frontier):
+        depth[frontier] = d
+        starts, ends = succ_ptr[frontier], succ_ptr[frontier + 1]
+        lens = ends - starts
+        if lens.sum() == 0:
+            break
+        pos = np.repeat(ends - np.cumsum(lens), lens) + np.arange(lens.sum())
+        targets = succ[pos]
+        dec = np.bincount(targets, minlength=n)
+        indeg -= dec
+        frontier = np.flatnonzero((dec > 0) & (indeg == 0))
+        d += 1
+    return depth
+
+
+def _merge_components_numpy(labels, a, b):
+    labels = labels.copy()
+    while True:
+        # Hook every edge to the smaller label, then compress the label trees by pointer jumping.
+        m = np.minimum(labels[a], labels[b])
+        new = labels.copy()
+        np.minimum.at(new, labels[a], m)
+        np.minimum.at(new, labels[b], m)
+        while True:
+            jumped = new[new]
+            if np.array_equal(jumped, new):
+                break
+            new = jumped
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+def _reachability_numpy(indptr, indices, order, level, closure):
+    words = closure.shape[1]
+    bounds = np.searchsorted(level[order], np.arange(level.max() + 2 if len(level) else 1))
+    for d in range(1, len(bounds) - 1):
+        children = order[bounds[d]:bounds[d+1]]
+        lens = indptr[children + 1] - indptr[children]
+        # OR the rows of the parents of a group of children at once, with about _GATHER_BYTES bytes of gathered rows.
+        ends = np.cumsum(lens)
+        limit = max(1, _GATHER_BYTES // (8 * words))
+        start = 0
+        while start < len(children):
+            stop = max(int(np.searchsorted(ends, (ends[start - 1] if start else 0) + limit, side='right')), start + 1)
+            c, l = children[start:stop], lens[start:stop]
+            pos = np.repeat(indptr[c + 1] - np.cumsum(l), l) + np.arange(l.sum())
+            closure[c] |= np.bitwise_or.reduceat(closure[indices[pos]], np.cumsum(l) - l, axis=0)
+            start = stop
+
+
+# ---- numba backend ----
+
+_numba = {}
+
+
+def _numba_kernels():
+    # Compiles the numba kernels on first use, so that importing the package does not import Numba.
+    if _numba:
+        return _numba
+    import numba
+
+    @numba.njit(cache=True)
+    def _dag_depths_numba(indptr, indices):
+        n = len(indptr) - 1
+        indeg = np.empty(n, dtype=np.int64)
+        succ_cnt = np.zeros(n + 1, dtype=np.int64)
+        for i in range(n):
+            indeg[i] = indptr[i + 1] - indptr[i]
+            for k in range(indptr[i], indptr[i + 1]):
+                succ_cnt[indices[k] + 1] += 1
+        for i in range(n):
+            succ_cnt[i + 1] += succ_cnt[i]
+        succ = np.empty(len(indices), dtype=np.int64)
+        fill = succ_cnt[:-1].copy()
+        for i in range(n):
+            for k in range(indptr[i], indptr[i + 1]):
+                u = indices[k]
+                succ[fill[u]] = i
+                fill[u] += 1
+        depth = np.full(n, -1, dtype=np.int64)
+        queue = np.empty(n, dtype=np.int64)
+        head = 0
+        tail = 0
+        for i in range(n):
+            if indeg[i] == 0:
+                depth[i] = 0
+                queue[tail] = i
+                tail += 1
+        while head < tail:
+            u = queue[head]
+            head += 1
+            for k in range(succ_cnt[u], succ_cnt[u + 1]):
+                v = succ[k]
+                if depth[u] + 1 > depth[v]:
+                    depth[v] = depth[u] + 1
+                indeg[v] -= 1
+                if indeg[v] == 0:
+                    queue[tail] = v
+                    tail += 1
+        for i in range(n):
+            if indeg[i] > 0:
+                depth[i] = -1
+        return depth
+
+    @numba.njit(cache=True)
+    def _find(parent, i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    @numba.njit(cache=True)
+    def _merge_components_numba(labels, a, b):
+        parent = labels.copy()
+        for k in range(len(a)):
+            x = _find(parent, a[k])
+            y = _find(parent, b[k])
+            if x < y:
+                parent[y] = x
+            elif y < x:
+                parent[x] = y
+        for i in range(len(parent)):
+            parent[i] = _find(parent, i)
+        return parent
+
+    @numba.njit(cache=True)
+    def _reachability_numba(indptr, indices, order, closure):
+        words = closure.shape[1]
+        for i in order:
+            for k in range(indptr[i], indptr[i + 1]):
+                p = indices[k]
+                for w in range(words):
+                    closure[i, w] |= closure[p, w]
+
+    _numba.update(dag_depths=_dag_depths_numba, merge_components=_merge_components_numba, reachability=_reachability_numba)
+    return _numba
+
+
+def _use_numba():
+    global _backend
+    if _backend != 'numba':
+        return False
+    try:
+        _numba_kernels()
+    except ImportError as e:
+        warnings.warn("Numba cannot be imported ({}); using the numpy backend".format(e))
+        _backend = 'numpy'
+        return False
+    return True
+
+
+def dag_depths(indptr:np.ndarray, indices:np.ndarray) -> np.ndarray:
+    """Computes the depth of every node of a DAG, i.e., the length of the longest path to the node from a node without dependencies.
+
+    Args:
+        indptr (numpy.ndarray): CSR pointers of the dependencies.
+        indices (numpy.ndarray): CSR indices of the dependencies.
+
+    Returns:
+        numpy.ndarray: The depth of each node, and -1 for the nodes that lie on or after a cycle.
+    """
+    indptr = np.asarray(indptr, dtype=np.int64)
+    indices = np.asarray(indices, dtype=np.int64)
+    if _use_numba():
+        return _numba_kernels()['dag_depths'](indptr, indices)
+    return _dag_depths_numpy(indptr, indices)
+
+
+def components(indptr:np.ndarray, indices:np.ndarray) -> np.ndarray:
+    """Computes the connected components of an undirected graph.
+
+    Args:
+        indptr (numpy.ndarray): CSR pointers of the adjacency.
+        indices (numpy.ndarray): CSR indices of the adjacency.
+
+    Returns:
+        numpy.ndarray: For each node, the smallest node id of its component.
+    """
+    indptr = np.asarray(indptr, dtype=np.int64)
+    return merge_components(np.arange(len(indptr) - 1), _rows(indptr), indices)
+
+
+def merge_components(labels:np.ndarray, a:np.ndarray, b:np.ndarray) -> np.ndarray:
+    """Merges the components of an undirected graph with further edges, e.g., with the edges of the next block of rows of a matrix.
+
+    Args:
+        labels (numpy.ndarray): For each node, the smallest node id of its component, e.g., ``numpy.arange(N)`` for a graph without edges.
+        a (numpy.ndarray): One end of each new edge.
+        b (numpy.ndarray): The other end of each new edge.
+
+    Returns:
+        numpy.ndarray: The labels of the components of the graph with the new edges.
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    if _use_numba():
+        return _numba_kernels()['merge_components'](labels, a, b)
+    return _merge_components_numpy(labels, a, b)
+
+
+def consecutive_depth_edges(indptr:np.ndarray, indices:np.ndarray, depth:np.ndarray, start:int=0) -> tuple:
+    """Selects the dependencies between nodes of consecutive depths, i.e., the edges of the transitively reduced graph of ``Graph``.
+
+    Args:
+        indptr (numpy.ndarray): CSR pointers of the dependencies.
+        indices (numpy.ndarray): CSR indices of the dependencies.
+        depth (numpy.ndarray): The depth (rank) of each node, or -1 for the nodes that are not in the graph.
+        start (int, optional): The id of the node of the first CSR row, if the rows are a chunk of the nodes. Defaults to 0.
+
+    Returns:
+        tuple[numpy.ndarray, numpy.ndarray]: The better and worse node of each edge.
+    """
+    rows = _rows(np.asarray(indptr, dtype=np.int64)) + start
+    indices = np.asarray(indices, dtype=np.int64)
+    mask = (depth[rows] >= 1) & (depth[indices] == depth[rows] - 1)
+    return indices[mask], rows[mask]
+
+
+def rank_steps(better:np.ndarray) -> np.ndarray:
+    """The scan of ``PartialRankerDFGReduced`` over the separable arrangement T: the rank increases by one wherever T[i-1] is better than T[i].
+
+    Args:
+        better (numpy.ndarray): A boolean array of length len(T)-1 that is True where T[i-1] is better than T[i].
+
+    Returns:
+        numpy.ndarray: The rank of each element of T.
+    """
+    R = np.zeros(len(better) + 1, dtype=np.int64)
+    np.cumsum(better, out=R[1:])
+    return R
+
+
+def reachability(indptr:np.ndarray, indices:np.ndarray) -> np.ndarray:
+    """Computes the reflexive transitive closure of a DAG as packed bitsets: bit j of row i is set iff j = i or there is a path from j to i.
+    The rows are computed in topological order, each as the bitwise OR of the rows of its parents, 64 nodes per word.
+
+    Args:
+        indptr (numpy.ndarray): CSR pointers of the parents.
+        indices (numpy.ndarray): CSR indices of the parents.
+
+    Returns:
+        numpy.ndarray: An (N x ceil(N/64)) uint64 array; bit j of row i is bit j % 64 of word j // 64.
+    """
+    indptr = np.asarray(indptr, dtype=np.int64)
+    indices = np.asarray(indices, dtype=np.int64)
+    n = len(indptr) - 1
+    level = dag_depths(indptr, indices)
+    if (level < 0).any():
+        raise ValueError("The graph has a cycle")
+    order = np.argsort(level, kind='stable')
+    closure = np.zeros((n, (n + 63) // 64), dtype=np.uint64)
+    ids = np.arange(n)
+    closure[ids, ids >> 6] = np.left_shift(np.uint64(1), (ids & 63).astype(np.uint64))
+    if _use_numba():
+        _numba_kernels()['reachability'](indptr, indices, order, closure)
+    else:
+        _reachability_numpy(indptr, indices, order, level, closure)
+    return closure
+
+
+def unpack_bits(rows:np.ndarray, n:int) -> np.ndarray:
+    """
+    Args:
+        rows (numpy.ndarray): Rows of bitsets as returned by ``reachability()``.
+        n (int): The number of nodes.
+
+    Returns:
+        numpy.ndarray: The bits as a boolean array of shape (len(rows), n).
+    """
+    rows = np.ascontiguousarray(rows, dtype=np.uint64).astype('<u8', copy=False)
+    bits = np.unpackbits(rows.view(np.uint8).reshape(len(rows), -1), axis=1, bitorder='little')
+    return bits[:, :n].view(bool)
@@ -0,0 +1,184 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+"""Readers that build the measurements dictionary ``{'obj1': [1.2, 1.3, 1.4], 'obj2': [...], ...}`` from files.
+The text formats are read row by row, so that only the measurements dictionary is held in memory.
+
+Supported formats:
+
+    - **csv**: Long format with one measurement per row, ``obj,value``. A header row is skipped.
+    - **npy**: A 2D array of shape (N, reps) with one row of measurements per object. The objects are named by their row index.
+    - **parquet**: Long format with the columns ``obj`` and ``value`` (requires pyarrow or fastparquet, e.g., ``pip install partial_ranker[parquet]``).
+    - **npz**: Encoded measurements written by ``partial_ranker.encoding.EncodedMeasurements.save()``. The values are decoded per object when they are accessed.
+    - **eventlog**: The event table of ``examples/data/gls_1000_100.csv``, where each case ``<variant>_<rep>`` is one measurement of ``<variant>``
+      whose value is the time between the start of its first event and the end of its last event.
+"""
+
+import csv
+import os
+import sys
+from importlib.util import find_spec
+
+FORMATS = ('csv', 'npy', 'npz', 'parquet', 'eventlog')
+
+
+def check_parquet_engine() -> None:
+    """Raises an ImportError with installation instructions if neither pyarrow nor fastparquet, which pandas needs for parquet files, is installed."""
+    if find_spec('pyarrow') is None and find_spec('fastparquet') is None:
+        raise ImportError("Reading and writing parquet files requires pyarrow or fastparquet: pip install 'partial_ranker[parquet]'")
+
+
+def guess_format(path:str) -> str:
+    """
+    Args:
+        path (str): Path of a measurements file.
+
+    Returns:
+        str: The format inferred from the file extension. Defaults to 'csv'.
+    """
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext in ('npy', 'npz', 'parquet'):
+        return ext
+    return 'csv'
+
+
+def read_measurements(path:str, fmt:str=None, obj_col:str='obj', value_col:str='value', delimiter:str=None) -> dict:
+    """Reads a measurements dictionary from a file.
+
+    Args:
+        path (str): Path of the file. '-' reads csv or eventlog data from the standard input.
+        fmt (str, optional): One of 'csv', 'npy', 'npz', 'parquet' or 'eventlog'. Defaults to the format inferred from the file extension.
+        obj_col (str, optional): Name of the object column in parquet files. Defaults to 'obj'.
+        value_col (str, optional): Name of the value column in parquet files. Defaults to 'value'.
+        delimiter (str, optional): Field delimiter of the text formats. Defaults to ',' for csv and ';' for eventlog.
+
+    Returns:
+        dict[str, List[float]]: The measurements dictionary.
+    """
+    fmt = fmt or guess_format(path)
+    if fmt == 'npy':
+        return read_npy(path)
+    if fmt == 'npz':
+        from .encoding import load
+        return load(path)
+    if fmt == 'parquet':
+        return read_parquet(path, obj_col, value_col)
+    if fmt not in ('csv', 'eventlog'):
+        raise ValueError("Unsupported format '{}'. Expected one of {}".format(fmt, FORMATS))
+
+    fh = sys.stdin if path == '-' else open(path, newline='')
+    try:
+        if fmt == 'csv':
+            return read_csv(fh, delimiter or ',')
+        return read_event_log(fh, delimiter or ';')
+    finally:
+        if fh is not sys.stdin:
+            fh.close()
+
+
+def read_csv(fh, delimiter:str=',') -> dict:
+    """
+    Args:
+        fh (file): A text file object with rows ``obj,value``.
+        delimiter (str, optional): Field delimiter. Defaults to ','.
+
+    Returns:
+        dict[str, List[float]]: The measurements dictionary.
+    """
+    measurements = {}
+    for i, row in enumerate(csv.reader(fh, delimiter=delimiter)):
+        if not row:
+            continue
+        try:
+            x = float(row[1])
+        except ValueError:
+            if i == 0:
+                continue  # header
+            raise
+        measurements.setdefault(row[0], []).append(x)
+    return measurements
+
+
+def read_npy(path:str) -> dict:
+    """
+    Args:
+        path (str): Path of a .npy file holding an array of shape (N, reps). The file is memory-mapped.
+
+    Returns:
+        dict[str, List[float]]: The measurements dictionary with the row indices as object names.
+    """
+    import numpy as np
+    arr = np.load(path, mmap_mode='r')
+    if arr.ndim == 1:
+        arr = arr.reshape(1, -1)
+    return {str(i): arr[i].tolist() for i in range(arr.shape[0])}
+
+
+def read_parquet(path:str, obj_col:str='obj', value_col:str='value') -> dict:
+    """
+    Args:
+        path (str): Path of a parquet file in long format.
+        obj_col (str, optional): Name of the object column. Defaults to 'obj'.
+        value_col (str, optional): Name of the value column. Defaults to 'value'.
+
+    Returns:
+        dict[str, List[float]]: The measurements dictionary.
+    """
+    check_parquet_engine()
+    import pandas as pd
+    df = pd.read_parquet(path, columns=[obj_col, value_col])
+    measurements = {}
+    for obj, x in zip(df[obj_col].astype(str), df[value_col].astype(float)):
+        measurements.setdefault(obj, []).append(x)
+    return measurements
+
+
+def read_event_log(fh, delimiter:str=';', case_col:str='case:concept:name', start_col:str='timestamp:start', end_col:str='timestamp:end') -> dict:
+    """
+    Args:
+        fh (file): A text file object with a header row that contains the case, start and end columns.
+        delimiter (str, optional): Field delimiter. Defaults to ';'.
+        case_col (str, optional): Name of the case column, whose values look like ``<variant>_<rep>``. Defaults to 'case:concept:name'.
+        start_col (str, optional): Name of the column with the start timestamp of an event. Defaults to 'timestamp:start'.
+        end_col (str, optional): Name of the column with the end timestamp of an event. Defaults to 'timestamp:end'.
+
+    Returns:
+        dict[str, List[float]]: The measurements dictionary with one duration per case, keyed by variant.
+    """
+    reader = csv.reader(fh, delimiter=delimiter)
+    header = next(reader)
+    ic, i_start, i_end = header.index(case_col), header.index(start_col), header.index(end_col)
+
+    cases = {}  # case -> [start of first event, end of last event]
+    for row in reader:
+        if not row:
+            continue
+        case = row[ic]
+        if case in cases:
+            cases[case][1] = float(row[i_end])
+        else:
+            cases[case] = [float(row[i_start]), float(row[i_end])]
+
+    measurements = {}
+    for case, (start, end) in cases.items():
+        measurements.setdefault(case.rsplit('_', 1)[0], []).append(end - start)
+    return measurements
@@ -20,12 +20,102 @@
 # Contributors:
 # - Aravind Sankaran
 
+import os
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
 from matplotlib import gridspec
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.ticker import FormatStrFormatter
 import numpy as np
 from typing import List
 
+EXPORT_FORMATS = ('png', 'svg', 'pdf')
+
+
+def _save_figure(fig, path, dpi):
+    FigureCanvasAgg(fig)
+    fig.savefig(path, dpi=dpi)
+    return path
+
+
+def _draw_histograms(fig, titles, counts, edges):
+    # One subplot per object with the counts of histogram_counts(), so that the shown and the exported histograms have the same bins.
+    n = len(titles)
+    gs = gridspec.GridSpec(n, 1, figure=fig)
+    ax0 = None
+    for i in range(n):
+        ax = fig.add_subplot(gs[i], sharex=ax0)
+        ax0 = ax0 or ax
+        ax.set_title(titles[i])
+        ax.stairs(counts[i], edges, fill=True)
+        ax.xaxis.set_major_formatter(FormatStrFormatter('%.e'))
+
+
+def _render_histogram_page(path, titles, counts, edges, hspace, dpi):
+    fig = Figure(figsize=(7, 3 * len(titles)))
+    _draw_histograms(fig, titles, counts, edges)
+    fig.subplots_adjust(hspace=hspace)
+    return _save_figure(fig, path, dpi)
+
+
+def _render_boxplot_page(path, x, y, outliers, scale, tick_size, unit, dpi):
+    fig = Figure(figsize=(10, scale * len(y)))
+    ax = fig.add_subplot(111)
+    _draw_boxplot(ax, x, y, outliers, tick_size, unit)
+    return _save_figure(fig, path, dpi)
+
+
+def _draw_boxplot(ax, x, y, outliers, tick_size, unit):
+    # # Creating axes instance
+    bp = ax.boxplot(x, patch_artist=True,
+                    notch=False, vert=False, showfliers=outliers,
+                    positions=range(len(y)),zorder=0)
+
+    x_lim = ax.get_xlim()
+
+
+    colors = ['#E1E8E8'] * len(y)
+
+    for patch, color in zip(bp['boxes'], colors):
+        patch.set_facecolor(color)
+
+    # changing color and linewidth of
+    # whiskers
+    for whisker in bp['whiskers']:
+        whisker.set(color='#8B008B',
+                    linewidth=1.5,
+                    linestyle=":")
+
+    # changing color and linewidth of
+    # caps
+    for cap in bp['caps']:
+        cap.set(color='#8B008B',
+                linewidth=2)
+
+    # changing color and linewidth of
+    # medians
+    for median in bp['medians']:
+        median.set(color='red',
+                linewidth=2)
+
+    try:
+        sp = ax.plot(x, y, 'b.', alpha=0.9,zorder=10)
+        ax.set_xlim(x_lim)
+    except:
+        pass
+
+    # y-axis labels
+    ax.set_yticklabels(y)
+
+    # Removing top axes and right axes
+    # ticks
+    ax.get_xaxis().tick_bottom()
+    ax.get_yaxis().tick_left()
+    ax.xaxis.set_tick_params(labelsize=tick_size)
+    ax.yaxis.set_tick_params(labelsize=tick_size)
+    ax.set_xlabel(unit, fontsize = tick_size)
+
 class MeasurementsVisualizer:
     """
     Class for visualizing sets of measurements as box-plots or violin-plots. 
@@ -73,7 +163,7 @@ class MeasurementsVisualizer:
         return list(x[(x > fence_low) & (x < fence_high)])
 
     def show_measurement_histograms(self, obj_list:List=None, bins=10, hspace=0.5):
-        """Displays a subplot with a histogram of measurements for each object in obj_list.
+        """Displays a subplot with a histogram of measurements for each object in obj_list. All histograms share the same bins (see ``histogram_counts()``).
 
         Args:
             obj_list (List, optional): The subplots are shown only for the those objects in the list. The subplots are arranged according to the order of the objects in the list.
@@ -89,22 +179,11 @@ class MeasurementsVisualizer:
         
         if not obj_list:
             obj_list = self.obj_seq
-        obj_list.sort()
-
-        n = len(obj_list)
-        fig = plt.figure(figsize=(7, 3 * n))
-        gs = gridspec.GridSpec(n, 1, height_ratios=[1] * n)
-
-        ax = [None] * n
-        for i in range(n):
-            if i != 0:
-                ax[i] = plt.subplot(gs[i], sharex=ax[0])
-            else:
-                ax[i] = plt.subplot(gs[i])
-            ax[i].set_title(obj_list[i])
-            ax[i].hist(self.measurements[obj_list[i]], bins=bins)
-            ax[i].xaxis.set_major_formatter(FormatStrFormatter('%.e'))
+        obj_list = sorted(obj_list)
+        counts, edges = self.histogram_counts(obj_list, bins)
 
+        fig = plt.figure(figsize=(7, 3 * len(obj_list)))
+        _draw_histograms(fig, obj_list, counts, edges)
         plt.subplots_adjust(hspace=hspace)
         plt.show()
 
@@ -134,55 +213,7 @@ class MeasurementsVisualizer:
 
         fig = plt.figure(figsize=(10, scale*len(obj_list)))
         ax = fig.add_subplot(111)
-
-        # # Creating axes instance
-        bp = ax.boxplot(x, patch_artist=True,
-                        notch=False, vert=False, showfliers=outliers,
-                        positions=range(len(y)),zorder=0)
-
-        x_lim = ax.get_xlim()
-
-
-        colors = ['#E1E8E8'] * len(y)
-
-        for patch, color in zip(bp['boxes'], colors):
-            patch.set_facecolor(color)
-
-        # changing color and linewidth of
-        # whiskers
-        for whisker in bp['whiskers']:
-            whisker.set(color='#8B008B',
-                        linewidth=1.5,
-                        linestyle=":")
-
-        # changing color and linewidth of
-        # caps
-        for cap in bp['caps']:
-            cap.set(color='#8B008B',
-                    linewidth=2)
-
-        # changing color and linewidth of
-        # medians
-        for median in bp['medians']:
-            median.set(color='red',
-                    linewidth=2)
-
-        try:
-            sp = ax.plot(x, y, 'b.', alpha=0.9,zorder=10)
-            ax.set_xlim(x_lim)
-        except:
-            pass
-
-        # y-axis labels
-        ax.set_yticklabels(y)
-
-        # Removing top axes and right axes
-        # ticks
-        ax.get_xaxis().tick_bottom()
-        ax.get_yaxis().tick_left()
-        ax.xaxis.set_tick_params(labelsize=tick_size)
-        ax.yaxis.set_tick_params(labelsize=tick_size)
-        ax.set_xlabel(unit, fontsize = tick_size)
+        _draw_boxplot(ax, x, y, outliers, tick_size, unit)
 
         #plt.show()
         return fig
@@ -265,4 +296,101 @@ class MeasurementsVisualizer:
         ax.set_xlabel('time (s)')
 
         #plt.show()
-        return fig
\ No newline at end of file
+        return fig
+
+    def histogram_counts(self, obj_list:List=None, bins=10):
+        """Computes the histograms of all objects in obj_list over a shared set of bins. 
+        The bin edges are computed once from the measurements of all objects, and the counts of all objects are obtained with a single vectorized pass.
+
+        Args:
+            obj_list (List, optional): The histograms are computed only for the objects in the list. Defaults to all objects.
+            bins (int, optional): Number of bins. Defaults to 10.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The counts of shape (len(obj_list), bins) and the bin edges of shape (bins+1,).
+        """
+        if not obj_list:
+            obj_list = self.obj_seq
+        vals = [np.asarray(self.measurements[obj], dtype=float) for obj in obj_list]
+        lengths = np.array([len(v) for v in vals])
+        flat = np.concatenate(vals) if vals else np.empty(0)
+        edges = np.histogram_bin_edges(flat, bins=bins)
+        nbins = len(edges) - 1
+
+        # Bin index of every measurement; the right-most edge is inclusive as in np.histogram.
+        idx = np.clip(np.searchsorted(edges, flat, side='right') - 1, 0, nbins - 1)
+        owner = np.repeat(np.arange(len(vals)), lengths)
+        counts = np.bincount(owner * nbins + idx, minlength=len(vals) * nbins)
+        return counts.reshape(len(vals), nbins), edges
+
+    def export_measurement_histograms(self, out_dir:str, obj_list:List=None, bins=10, per_page=10, fmt='png', hspace=0.5, dpi=100, processes=None) -> List[str]:
+        """Non-interactive counterpart of ``show_measurement_histograms()``. The histograms are split into pages of at most **per_page** subplots and 
+        every page is written to a separate file in **out_dir**. The figures are rendered with the Agg canvas, so no display is required.
+        All histograms share the same bins (see ``histogram_counts()``).
+
+        Args:
+            out_dir (str): The directory to which the pages are written. It is created if it does not exist.
+            obj_list (List, optional): The histograms are exported only for the objects in the list, in sorted order. Defaults to all objects.
+            bins (int, optional): Number of bins. Defaults to 10.
+            per_page (int, optional): Maximum number of subplots per page. Defaults to 10.
+            fmt (str, optional): One of 'png', 'svg' or 'pdf'. Defaults to 'png'.
+            hspace (float, optional): matplotlib paramater to control the space between the subplots. Defaults to 0.5.
+            dpi (int, optional): Resolution of raster output. Defaults to 100.
+            processes (int, optional): If set, the pages are rendered in a process pool with this many workers. Defaults to None (serial).
+
+        Returns:
+            List[str]: The paths of the written files in page order.
+        """
+        if not obj_list:
+            obj_list = self.obj_seq
+        obj_list = sorted(obj_list)
+        counts, edges = self.histogram_counts(obj_list, bins)
+
+        jobs = []
+        for p, i in enumerate(range(0, len(obj_list), per_page)):
+            path = self._page_path(out_dir, 'histograms', p, fmt)
+            jobs.append((path, obj_list[i:i+per_page], counts[i:i+per_page], edges, hspace, dpi))
+        return self._render_pages(_render_histogram_page, jobs, processes)
+
+    def export_measurements_boxplots(self, out_dir:str, obj_list:List=None, per_page=50, fmt='png', outliers=False, scale=1.5, tick_size=12, unit='time (s)', dpi=100, processes=None) -> List[str]:
+        """Non-interactive counterpart of ``show_measurements_boxplots()``. The boxplots are split into pages of at most **per_page** objects and 
+        every page is written to a separate file in **out_dir**. The figures are rendered with the Agg canvas, so no display is required.
+
+        Args:
+            out_dir (str): The directory to which the pages are written. It is created if it does not exist.
+            obj_list (List, optional): The boxplots are exported only for the objects in the list, in the order of the list. Defaults to all objects.
+            per_page (int, optional): Maximum number of boxplots per page. Defaults to 50.
+            fmt (str, optional): One of 'png', 'svg' or 'pdf'. Defaults to 'png'.
+            outliers (bool, optional): Include outliers to calculate the box range. Defaults to False.
+            scale (float, optional): matplotlib param to control the size of the plot. Defaults to 1.5.
+            tick_size (int, optional): matplotlib param to control the size of the axis labels. Defaults to 12.
+            unit (str, optional): The unit of the measurement values. Defaults to 'time (s)'.
+            dpi (int, optional): Resolution of raster output. Defaults to 100.
+            processes (int, optional): If set, the pages are rendered in a process pool with this many workers. Defaults to None (serial).
+
+        Returns:
+            List[str]: The paths of the written files in page order.
+        """
+        if not obj_list:
+            obj_list = self.obj_seq
+
+        jobs = []
+        for p, i in enumerate(range(0, len(obj_list), per_page)):
+            y = list(obj_list[i:i+per_page])
+            x = [self.measurements[obj] for obj in y]
+            path = self._page_path(out_dir, 'boxplots', p, fmt)
+            jobs.append((path, x, y, outliers, scale, tick_size, unit, dpi))
+        return self._render_pages(_render_boxplot_page, jobs, processes)
+
+    def _page_path(self, out_dir, name, page, fmt):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError("Unsupported format '{}'. Expected one of {}".format(fmt, EXPORT_FORMATS))
+        os.makedirs(out_dir, exist_ok=True)
+        return os.path.join(out_dir, '{}_{:04d}.{}'.format(name, page, fmt))
+
+    def _render_pages(self, render, jobs, processes):
+        if not processes or len(jobs) < 2:
+            return [render(*job) for job in jobs]
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(render, *job) for job in jobs]
+            return [f.result() for f in futures]
@@ -0,0 +1,170 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+import numpy as np
+from typing import List
+from .instrumentation import instrumented, count
+
+class MultiMetricComparer:
+    """
+    Given a dictionary of objects consisting of measurements of k metrics, e.g., ``{'obj1': array of shape (reps, k), ...}`` for time, energy and memory,
+    this class compares the objects by Pareto dominance over the per-metric quantile intervals.
+    It can be used in place of ``QuantileComparer`` with ``PartialRankerDFG``, ``PartialRankerDFGReduced``, ``PartialRankerMin`` and ``PartialRanker``.
+
+    ``obj_i`` is better than ``obj_j`` if, for every metric, neither quantile of ``obj_i`` is larger than the corresponding quantile of ``obj_j``
+    (``obj_i`` is nowhere worse), and for at least one metric the upper quantile of ``obj_i`` is less than the lower quantile of ``obj_j``
+    (``obj_i`` is clearly better). This relation is a strict partial order, and with k = 1 it reduces to the relation of ``QuantileComparer``.
+
+    Input:
+        **measurements (dict[str, numpy.ndarray])**: A dictionary of objects consisting of an array of shape (reps, k) of measurement values. Lower values are better in every metric.
+
+        **metrics (List[str], optional)**: The names of the k metrics. Defaults to ``['m0', 'm1', ...]``.
+
+        **block_size (int, optional)**: The number of objects compared at once. Defaults to 512.
+
+    **Attributes and Methods**:
+
+    Attributes:
+        C (dict[str, dict[str, int]]): The comparison matrix, with the same encoding as in ``QuantileComparer``.
+
+        objs (list[str]): A list of object keys in the measurements dictionary.
+
+        q_up (numpy.ndarray): The upper quantile values of shape (N, k), in the order of **objs**.
+
+        q_low (numpy.ndarray): The lower quantile values of shape (N, k), in the order of **objs**.
+
+        t_up (dict[str, float]): A scalar summary of the upper quantiles of each object: the sum over the metrics of the upper quantile divided by the median lower quantile of the metric.
+
+        t_low (dict[str, float]): The same summary of the lower quantiles. It orders the equivalence classes in ``PartialRankerMin``.
+    """
+    def __init__(self, measurements:dict, metrics:List[str]=None, block_size=512):
+        self.measurements = {obj: np.asarray(x, dtype=float) for obj, x in measurements.items()}
+        self.objs = list(measurements.keys())
+        k = self.measurements[self.objs[0]].reshape(len(self.measurements[self.objs[0]]), -1).shape[1] if self.objs else 0
+        self.metrics = list(metrics) if metrics else ['m{}'.format(m) for m in range(k)]
+        self.block_size = block_size
+        self.C = {}
+        self.q_up = None
+        self.q_low = None
+        self.t_up = {}
+        self.t_low = {}
+
+    @instrumented('MultiMetricComparer.compute_quantiles')
+    def compute_quantiles(self, q_max:int, q_min:int, outliers=False) -> None:
+        """For a given quantile range, the upper and lower quantile values of every metric are computed.
+        If all the objects have the same number of measurements, the quantiles of all the objects are computed in a single batched call.
+
+        Args:
+            q_max (int): Upper quantile. E.g., 75 for 75th percentile.
+            q_min (int): Lower quantile. E.g., 25 for 25th percentile.
+            outliers (bool, optional): Remove outliers of each metric using the 1.5 IQR rule. Defaults to False.
+        """
+        k = len(self.metrics)
+        arrays = [self.measurements[x].reshape(-1, k) for x in self.objs]
+        if not outliers and len(set(a.shape[0] for a in arrays)) == 1:
+            q = np.percentile(np.stack(arrays), [q_min, q_max], axis=1)
+            self.q_low, self.q_up = q[0], q[1]
+        else:
+            self.q_low = np.empty((len(arrays), k))
+            self.q_up = np.empty((len(arrays), k))
+            for i, a in enumerate(arrays):
+                for m in range(k):
+                    vals = self._remove_outliers(a[:, m]) if outliers else a[:, m]
+                    self.q_low[i, m], self.q_up[i, m] = np.percentile(vals, [q_min, q_max])
+
+        scale = np.median(self.q_low, axis=0) if len(self.objs) else np.ones(k)
+        scale[scale == 0] = 1
+        self.t_low = dict(zip(self.objs, (self.q_low / scale).sum(axis=1).tolist()))
+        self.t_up = dict(zip(self.objs, (self.q_up / scale).sum(axis=1).tolist()))
+        self.C = {x: dict.fromkeys(self.objs, -1) for x in self.objs}
+
+    def _remove_outliers(self, x):
+        q1, q2 = np.percentile(x, [25, 75])
+        iqr = q2 - q1
+        return x[(x > q1 - 1.5 * iqr) & (x < q2 + 1.5 * iqr)]
+
+    def dominates(self, rows, cols) -> np.ndarray:
+        """
+        Args:
+            rows (array-like): Indices of objects.
+            cols (array-like): Indices of objects.
+
+        Returns:
+            numpy.ndarray: A boolean array of shape (len(rows), len(cols)) that is True where the object of the row is better than the object of the column.
+        """
+        lo_r, up_r = self.q_low[rows][:, None, :], self.q_up[rows][:, None, :]
+        lo_c, up_c = self.q_low[cols][None, :, :], self.q_up[cols][None, :, :]
+        nowhere_worse = ((lo_r <= lo_c) & (up_r <= up_c)).all(axis=2)
+        somewhere_better = (up_r < lo_c).any(axis=2)
+        return nowhere_worse & somewhere_better
+
+    @instrumented('MultiMetricComparer.compare')
+    def compare(self) -> None:
+        """Performs the comparison of all objects block by block and stores the results in **C**.
+        """
+        n = len(self.objs)
+        b = self.block_size
+        for i0 in range(0, n, b):
+            rows = np.arange(i0, min(i0 + b, n))
+            for j0 in range(i0, n, b):
+                cols = np.arange(j0, min(j0 + b, n))
+                block = np.ones((len(rows), len(cols)), dtype=np.int8)
+                block[self.dominates(rows, cols)] = 0
+                block[self.dominates(cols, rows).T] = 2
+                count('MultiMetricComparer.comparisons', len(rows) * len(cols))
+                block = block.tolist()
+                for r, i in enumerate(rows.tolist()):
+                    x = self.objs[i]
+                    for c, j in enumerate(cols.tolist()):
+                        if j > i:
+                            y = self.objs[j]
+                            self.C[x][y] = block[r][c]
+                            self.C[y][x] = 2 - block[r][c]
+
+    @instrumented('MultiMetricComparer.get_layers')
+    def get_layers(self) -> dict[int, list[str]]:
+        """Computes the dominance layers without the comparison matrix: layer 0 is the skyline (the objects that no other object is better than),
+        layer 1 is the skyline of the remaining objects, and so on. These are the ranks of ``PartialRankerDFG``.
+
+        The objects are presorted by the sum of their lower quantiles, which is a linear extension of the relation,
+        so that the objects better than an object always precede it. The layers are then assigned in this order,
+        comparing each block of objects against the preceding ones at once (sort-filter skyline).
+
+        Returns:
+            dict[int,List[str]]: A dictionary consisting of the list of objects at each layer, ordered as in **objs**.
+        """
+        n = len(self.objs)
+        order = np.argsort(self.q_low.sum(axis=1), kind='stable')
+        layer = np.full(n, -1, dtype=np.int64)
+        b = self.block_size
+        for s in range(0, n, b):
+            block = order[s:s + b]
+            prev = order[:s + len(block)]
+            D = self.dominates(prev, block)  # (s + len(block), len(block))
+            for c, y in enumerate(block):
+                dom = prev[:s + c][D[:s + c, c]]
+                layer[y] = layer[dom].max() + 1 if len(dom) else 0
+
+        layers = {}
+        for i, obj in enumerate(self.objs):
+            layers.setdefault(int(layer[i]), []).append(obj)
+        return {d: layers[d] for d in sorted(layers)}
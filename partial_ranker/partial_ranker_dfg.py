@@ -20,8 +20,9 @@
 # Contributors:
 # - Aravind Sankaran
 
-import pandas as pd
 from .graph import Graph
+from .instrumentation import instrumented
+from .dominance_analysis import DominanceAnalysis
 
 class PartialRankerDFG:
     """DFG based partial ranking methodology (Methodology 1 in the paper).
@@ -32,6 +33,9 @@ class PartialRankerDFG:
         comparer (partial_ranker.QuantileComparer):
             The ``QuantileComparer`` object that contains the results of pair-wise comparisons.
             i.e, ``comparer.compare()`` should have been called.
+            
+        analysis (partial_ranker.DominanceAnalysis, optional):
+            A ``DominanceAnalysis`` of the same comparer that is shared with other ranking objects. If not provided, a new one is created.
         
     **Attributes and Methods**:
     
@@ -40,13 +44,14 @@ class PartialRankerDFG:
         
             - e.g.; in the dict ``{'obj1': ['obj2', 'obj3], 'obj2': ['obj4'], ...}``, ``obj2`` and ``obj3`` are better than ``obj1``, ``obj4`` is better than ``obj2``, etc.
     """
-    def __init__(self,comparer):
-        self.objs = list(comparer.C.keys())
+    def __init__(self,comparer,analysis=None):
+        self.analysis = analysis if analysis is not None else DominanceAnalysis(comparer)
+        self.objs = self.analysis.objs
         self._obj_rank = {}
         self._rank_objs = {}
-        cm = pd.DataFrame(comparer.C)
-        self.dependencies = dict(cm.apply(lambda row: row[row == 0].index.tolist(), axis=1))
+        self.dependencies = self.analysis.dependencies
     
+    @instrumented('PartialRankerDFG.compute_ranks')
     def compute_ranks(self) -> None:
         """Computes the partial ranks of the objects according to Methodology 1. 
         The internal variables that stores the rank of the objects are updated.
@@ -54,22 +59,30 @@ class PartialRankerDFG:
         Returns:
             None
         """
-        self._obj_rank = {}
-        self._rank_objs = {}
-        for obj in self.objs:
-            d = self._get_depth(obj)
-            self._rank_objs[d] = self._rank_objs.get(d,[]) + [obj]
-    
-    def _get_depth(self,obj):
-        if obj in self._obj_rank:
-            return self._obj_rank[obj]
-        else:
-            v = self.dependencies[obj]
-            if not v:
-                self._obj_rank[obj] = 0
-            else:
-                self._obj_rank[obj] = max([self._get_depth(i) for i in v]) + 1
-            return self._obj_rank[obj]
+        obj_depth, depth_objs = self.analysis.get_depths()
+        self._obj_rank = dict(obj_depth)
+        self._rank_objs = {d: list(objs) for d, objs in depth_objs.items()}
+
+    @instrumented('PartialRankerDFG.update')
+    def update(self, obj:str, measurements:list=None) -> dict:
+        """Updates the ranks after one object was remeasured, without recomputing the ranks of the objects that are not affected (see ``DominanceAnalysis.update()``).
+        ``compute_ranks()`` should have been called.
+
+        Args:
+            obj (str): Object name.
+            measurements (List[float], optional): The new measurements of the object. Defaults to None (the measurements dictionary was updated in place).
+
+        Returns:
+            dict[str, tuple[int, int]]: The objects whose rank changed, with the old and the new rank.
+        """
+        changed = self.analysis.update(obj, measurements)
+        obj_depth, depth_objs = self.analysis.get_depths()
+        ranks = set()
+        for x, (d0, d1) in changed.items():
+            self._obj_rank[x] = d1
+            ranks.update((d0, d1))
+        self._rank_objs = {d: list(objs) if d in ranks else self._rank_objs[d] for d, objs in depth_objs.items()}
+        return changed
         
     def get_ranks(self) -> dict[int,list[str]]:
         """
@@ -89,12 +102,15 @@ class PartialRankerDFG:
         """
         return self._obj_rank[obj]
     
-    def get_dfg(self):
+    def get_dfg(self, compact=False):
         """
+        Args:
+            compact (bool, optional): Store the graph with integer node ids (see ``Graph``). Defaults to False.
+
         Returns:
             partial_ranker.Graph: A Graph object that represents the rank relation among the objects according to Methodology 1.
         """
-        g = Graph(self.dependencies, self.get_ranks()) 
+        g = Graph(self.dependencies, self.get_ranks(), compact=compact)
         return g
     
         
@@ -20,9 +20,12 @@
 # Contributors:
 # - Aravind Sankaran
 
-import pandas as pd
 from .partial_ranker_dfg import PartialRankerDFG
+from .dominance_analysis import DominanceAnalysis
 from .graph import Graph
+from .instrumentation import instrumented
+from . import kernels
+import numpy as np
 
 class PartialRankerDFGReduced:
     """DFG based partial ranking methodology (Methodology 2 in the paper). 
@@ -33,6 +36,9 @@ class PartialRankerDFGReduced:
         comparer (partial_ranker.QuantileComparer):
             The ``QuantileComparer`` object that contains the results of pair-wise comparisons.
             i.e, ``comparer.compare()`` should have been called.
+            
+        analysis (partial_ranker.DominanceAnalysis, optional):
+            A ``DominanceAnalysis`` of the same comparer that is shared with other ranking objects. If not provided, a new one is created.
         
     **Attributes and Methods**:
     
@@ -42,15 +48,16 @@ class PartialRankerDFGReduced:
         graph_H (partial_ranker.Graph): The dependency graph that represents the rank relation among the objects according to Methodology 1.
     """
 
-    def __init__(self,comparer):
+    def __init__(self,comparer,analysis=None):
         self.objs = comparer.objs
         self.comparer = comparer
-        self.pr_dfg = PartialRankerDFG(comparer)
-        self.graph_H = None
+        self.analysis = analysis if analysis is not None else DominanceAnalysis(comparer)
+        self.pr_dfg = PartialRankerDFG(comparer, self.analysis)
         
         self._obj_rank = {}
         self._rank_objs = {}
         
+    @instrumented('PartialRankerDFGReduced.compute_ranks')
     def compute_ranks(self) -> None:
         """Computes the partial ranks of the objects according to Methodology 2.
         The internal variables that stores the rank of the objects are updated.
@@ -59,23 +66,44 @@ class PartialRankerDFGReduced:
         self._rank_objs = {}
         
         self.pr_dfg.compute_ranks()
-        self.graph_H = Graph(self.pr_dfg.dependencies, self.pr_dfg.get_ranks())
-        
-        T = self.graph_H.get_separable_arrangement()
-        R = [0]*len(T)
-        self._update_rank_data(T[0],R[0])
-        for i in range(1,len(T)):
-            if self.comparer.C[T[i-1]][T[i]] == 0:
-                R[i] = R[i-1] + 1
-            else:
-                R[i] = R[i-1]
-            
-            self._update_rank_data(T[i],R[i])  
-            
+        self._scan()
+
+    @instrumented('PartialRankerDFGReduced.update')
+    def update(self, obj:str, measurements:list=None) -> None:
+        """Updates the ranks after one object was remeasured. The ranks of Methodology 1 and the separable arrangement are patched
+        for the affected objects (see ``DominanceAnalysis.update()``), and the arrangement is scanned again in O(N) time.
+        ``compute_ranks()`` should have been called.
+
+        Args:
+            obj (str): Object name.
+            measurements (List[float], optional): The new measurements of the object. Defaults to None (the measurements dictionary was updated in place).
+        """
+        self.pr_dfg.update(obj, measurements)
+        self._obj_rank = {}
+        self._rank_objs = {}
+        self._scan()
+
+    def _scan(self):
+        T = self.analysis.get_separable_arrangement()
+        C = self.comparer.C
+        if hasattr(C, 'relations'):
+            pos = np.fromiter((C.index[obj] for obj in T), dtype=np.int64, count=len(T))
+            better = C.relations(pos[:-1], pos[1:]) == 0
+        else:
+            better = np.fromiter((C[T[i-1]][T[i]] == 0 for i in range(1,len(T))), dtype=bool, count=max(len(T)-1, 0))
+        R = kernels.rank_steps(better).tolist()
+        for obj, rank in zip(T, R):
+            self._update_rank_data(obj, rank)
             
+    @property
+    def graph_H(self):
+        if not self._rank_objs:
+            return None
+        return self.analysis.get_graph_H()
+
     def _update_rank_data(self,obj,rank):
         self._obj_rank[obj] = rank
-        self._rank_objs[rank] = self._rank_objs.get(rank,[]) + [obj] 
+        self._rank_objs.setdefault(rank,[]).append(obj)
         
     def get_ranks(self) -> dict[int,list[str]]:
         """
@@ -95,10 +123,13 @@ class PartialRankerDFGReduced:
         """
         return self._obj_rank[obj]
     
-    def get_dfg(self):
+    def get_dfg(self, compact=False):
         """
+        Args:
+            compact (bool, optional): Store the graph with integer node ids (see ``Graph``). Defaults to False.
+
         Returns:
             partial_ranker.Graph: A Graph object that represents the rank relation among the objects according to Methodology 2.
         """
-        g = Graph(self.pr_dfg.dependencies, self.get_ranks()) 
+        g = Graph(self.pr_dfg.dependencies, self.get_ranks(), compact=compact)
         return g
@@ -20,8 +20,9 @@
 # Contributors:
 # - Aravind Sankaran
 
-import pandas as pd
 from .graph import Graph
+from .instrumentation import instrumented
+from .dominance_analysis import DominanceAnalysis
 
 class PartialRankerMin:
     """Partial ranking methodology (Methodology 3 in the paper). 
@@ -34,6 +35,9 @@ class PartialRankerMin:
         comparer (partial_ranker.QuantileComparer):
             The ``QuantileComparer`` object that contains the results of pair-wise comparisons.
             i.e, ``comparer.compare()`` should have been called.
+            
+        analysis (partial_ranker.DominanceAnalysis, optional):
+            A ``DominanceAnalysis`` of the same comparer that is shared with other ranking objects. If not provided, a new one is created.
         
     **Attributes and Methods**:
     
@@ -46,32 +50,29 @@ class PartialRankerMin:
 
     """
 
-    def __init__(self,comparer):
+    def __init__(self,comparer,analysis=None):
         self.comparer = comparer
         self.objs = self.comparer.objs
         
-        cm = pd.DataFrame(self.comparer.C)  
-        self.equivalence = dict(cm.apply(lambda row: row[row == 1].index.tolist(), axis=1))
+        self.analysis = analysis if analysis is not None else DominanceAnalysis(comparer)
+        self.equivalence = self.analysis.equivalence
         
-        self._visited = set()
         self._obj_rank = {}
         self._rank_objs = {}
         
+    @instrumented('PartialRankerMin.compute_ranks')
     def compute_ranks(self) -> None:
         """Computes the partial ranks of the objects according to Methodology 3.
         The internal variables that stores the rank of the objects are updated.
         """
         U = []
         Q = []
-        self._visited = set()
         self._obj_rank = {}
         self._rank_objs = {}
                 
-        for node in self.objs:
-            if node not in self._visited:                    
-                V = self._equiv_set(node,set())
-                U.append(V)
-                Q.append(self.comparer.t_low[list(V)[0]])
+        for V in self.analysis.get_equivalence_classes():
+            U.append(set(V))
+            Q.append(self.comparer.t_low[list(V)[0]])
 
         sorted_zipped = sorted(zip(U,Q), key=lambda x: x[1])
         U = [x[0] for x in sorted_zipped]
@@ -82,17 +83,6 @@ class PartialRankerMin:
                 self._obj_rank[obj] = i
         
     
-    def _equiv_set(self,node,V):
-        if node in self._visited:
-            return V
-        self._visited.add(node)
-        V.add(node)
-        for v in self.equivalence[node]:
-            if v not in V:
-                V.add(v)
-                V = self._equiv_set(v,V)
-        return V
-    
     def get_ranks(self) -> dict[int,list[str]]:
         """
         Returns:
@@ -111,12 +101,13 @@ class PartialRankerMin:
         """
         return self._obj_rank[obj]
         
-    def get_dfg(self):
+    def get_dfg(self, compact=False):
         """
+        Args:
+            compact (bool, optional): Store the graph with integer node ids (see ``Graph``). Defaults to False.
+
         Returns:
             partial_ranker.Graph: A Graph object that represents the rank relation among the objects according to Methodology 3.
         """
-        cm = pd.DataFrame(self.comparer.C)
-        dependencies = dict(cm.apply(lambda row: row[row == 0].index.tolist(), axis=1))
-        g = Graph(dependencies, self.get_ranks()) 
+        g = Graph(self.analysis.dependencies, self.get_ranks(), compact=compact)
         return g   
@@ -25,6 +25,8 @@ from typing import List
 from .partial_ranker_dfg import PartialRankerDFG
 from .partial_ranker_dfg_r import PartialRankerDFGReduced
 from .partial_ranker_min import PartialRankerMin
+from .dominance_analysis import DominanceAnalysis
+from .instrumentation import instrumented
 
 class Method(Enum):
     """An Enum class to specify the method to compute the partial ranks.
@@ -52,12 +54,25 @@ class PartialRanker:
     
     Attributes:
         ranker: The instance of the partial ranking methodology class used to compute the partial ranks.
+        analysis (partial_ranker.DominanceAnalysis): The analysis of the comparison matrix that is shared by all the methods, 
+            so that computing the ranks with several methods derives the dependencies only once.
         
     """
     def __init__(self, comparer, method: Method=Method.DFGReduced):
         self.comparer = comparer
         self.method = method
         self.ranker = None
+        self.analysis = None
+        self._dfg = None
+        
+    def get_analysis(self) -> DominanceAnalysis:
+        """
+        Returns:
+            partial_ranker.DominanceAnalysis: The shared analysis of the comparison matrix. It is recreated if the comparison matrix of the comparer has been recomputed.
+        """
+        if self.analysis is None or self.analysis.is_stale(self.comparer):
+            self.analysis = DominanceAnalysis(self.comparer)
+        return self.analysis
         
     def compute_ranks(self, method: Method=Method.DFGReduced) -> None:
         """Computes the partial ranks of objects. 
@@ -67,30 +82,61 @@ class PartialRanker:
             method (Method, optional): The method to compute the partial ranks. Defaults to Method.DFGReduced.
         """
         self.method = method
+        self._dfg = None
+        analysis = self.get_analysis()
         
         if self.method == Method.DFG:
-            self.ranker = PartialRankerDFG(self.comparer)
+            self.ranker = PartialRankerDFG(self.comparer, analysis)
             self.ranker.compute_ranks()
         elif self.method == Method.DFGReduced:
-            self.ranker = PartialRankerDFGReduced(self.comparer)
+            self.ranker = PartialRankerDFGReduced(self.comparer, analysis)
             self.ranker.compute_ranks()
         elif self.method == Method.Min:
-            self.ranker = PartialRankerMin(self.comparer)
+            self.ranker = PartialRankerMin(self.comparer, analysis)
             self.ranker.compute_ranks()
-            
+
+    @instrumented('PartialRanker.update')
+    def update(self, obj:str, measurements:list=None) -> None:
+        """Updates the ranks after one object was remeasured, e.g., in an autotuning loop, reusing the ranks of the objects that are not affected.
+        ``compute_ranks()`` should have been called. For Method.Min, the equivalence classes are recomputed.
+
+        Args:
+            obj (str): Object name.
+            measurements (List[float], optional): The new measurements of the object. Defaults to None (the measurements dictionary was updated in place).
+        """
+        if self.ranker is None:
+            raise ValueError("The ranks have not been computed: call compute_ranks() first")
+        self._dfg = None
+        if self.method == Method.Min:
+            self.analysis.update(obj, measurements)
+            self.ranker.compute_ranks()
+        else:
+            self.ranker.update(obj, measurements)
+
+    @instrumented('PartialRanker.rank_subset')
+    def rank_subset(self, mask, method: Method=None):
+        """Ranks a subset of the objects, e.g., only the variants that call a given kernel, from the quantiles and comparisons of the comparer (see ``QuantileComparer.subset()``).
+
+        Args:
+            mask (numpy.ndarray): A boolean mask over the objects of the comparer, or the positions of the objects.
+            method (Method, optional): The method to compute the partial ranks. Defaults to the method of this ranker.
+
+        Returns:
+            partial_ranker.PartialRanker: A ranker of the subset, whose ranks have been computed.
+        """
+        method = method if method is not None else self.method
+        pr = PartialRanker(self.comparer.subset(mask), method)
+        pr.compute_ranks(method)
+        return pr
+
+    @instrumented('PartialRanker.get_separable_arrangement')
     def get_separable_arrangement(self) -> List[str]:
         """
         Returns:
             List[str]: Arrangement of the objects according to ``PartialRankerDFG.get_dfg().get_separable_arrangement()``. 
         """
-        if self.method == Method.Min:
-            pr = PartialRankerDFG(self.comparer)
-            pr.compute_ranks()
-            return pr.get_dfg().get_separable_arrangement()
-        elif self.method == Method.DFGReduced:
-            return self.ranker.graph_H.get_separable_arrangement()
-        elif self.method == Method.DFG:
-            return self.ranker.get_dfg().get_separable_arrangement()
+        if self.method in (Method.DFG, Method.DFGReduced, Method.Min):
+            return list(self.get_analysis().get_separable_arrangement())
         else:
             raise ValueError("Method not supported")
     
@@ -112,9 +158,37 @@ class PartialRanker:
         """
         return self.ranker.get_rank_obj(obj)
         
-    def get_dfg(self):
+    def get_dfg(self, compact=False):
+        """
+        Args:
+            compact (bool, optional): Store the graph with integer node ids (see ``Graph``). Defaults to False.
+
+        Returns:
+            partial_ranker.Graph: A Graph object that represents the rank relation among the objects. It is cached until the ranks are recomputed.
         """
+        if self._dfg is None or self._dfg.compact != compact:
+            self._dfg = self.ranker.get_dfg(compact)
+        return self._dfg
+
+    def save(self, path:str) -> None:
+        """Saves the quantiles, the comparison matrix, the ranks and the derived structures to an NPZ file, see ``partial_ranker.serialization.save()``.
+
+        Args:
+            path (str): Path of the file.
+        """
+        from .serialization import save
+        save(self, path)
+
+    @classmethod
+    def load(cls, path:str, mmap=True):
+        """Loads a ranker that was saved with ``save()``, see ``partial_ranker.serialization.load()``.
+
+        Args:
+            path (str): Path of the file.
+            mmap (bool, optional): Memory-map the arrays instead of reading them. Defaults to True.
+
         Returns:
-            partial_ranker.Graph: A Graph object that represents the rank relation among the objects.
+            partial_ranker.PartialRanker: The ranker, with the ranks, the analysis and the DFG restored without recomputation.
         """
-        return self.ranker.get_dfg()
+        from .serialization import load
+        return load(path, mmap)
@@ -0,0 +1,211 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+"""Chooses how ``QuantileComparer`` and ``PartialRanker`` are run for a data set, before anything is computed.
+
+The engines are the modes of ``QuantileComparer``:
+
+    - 'sweep': The lazy mode (``lazy=True``). **C** is never materialized and the ranks are computed by sweeps over the sorted intervals.
+      It requires the IQI rule or an ``IntervalRelation``.
+    - 'dense': **C** is an (N x N) int8 array, computed in tiles (``jobs=...``).
+    - 'dict': **C** is a dictionary of dictionaries (the default mode).
+    - 'out_of_core': **C** is an (N x N) int8 array in a file (``path=...``), and the ranks are computed by streaming through it within a memory budget.
+
+The estimates are the peak memory of the comparer, the analysis and the ranks (without the measurements themselves), and the time of
+``compute_quantiles()``, ``compare()`` and ``compute_ranks()``. The constants were measured for Method.DFGReduced on a single core;
+they are meant to tell the engines apart by orders of magnitude, not to predict the run time.
+"""
+
+import os
+import math
+from .relations import IntervalRelation
+
+ENGINES = ('sweep', 'dense', 'dict', 'out_of_core')
+
+# Bytes per object and per pair of objects, seconds per object and per pair of objects.
+_MEMORY_PER_OBJ = {'sweep': 600, 'dense': 3000, 'dict': 3000, 'out_of_core': 3000}
+_MEMORY_PER_PAIR = {'sweep': 0, 'dense': 24, 'dict': 58, 'out_of_core': 0}
+_TIME_PER_OBJ = {'sweep': 5e-6, 'dense': 2e-6, 'dict': 2e-6, 'out_of_core': 2e-6}
+_TIME_PER_PAIR = {'sweep': 0, 'dense': 1.3e-6, 'dict': 2.2e-6, 'out_of_core': 6e-7}
+_TIME_PER_PAIR_RELATION = {'dense': 7.5e-7, 'dict': 3.4e-6, 'out_of_core': 7.5e-7}
+_OUT_OF_CORE_BLOCK = 1 << 28  # memory for a block of rows of the out-of-core engine, if the budget allows
+_MIN_BLOCK = 1 << 20
+
+
+def available_memory() -> int:
+    """
+    Returns:
+        int: The available physical memory in bytes, or None if it cannot be determined.
+    """
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def estimate(n_objs:int, n_reps:int, relation=None) -> dict:
+    """Estimates the memory and the time of each engine.
+
+    Args:
+        n_objs (int): The number of objects N.
+        n_reps (int): The (average) number of measurements per object.
+        relation (partial_ranker.Relation, optional): The relation that will be passed to ``QuantileComparer``. Defaults to None (the IQI rule).
+
+    Returns:
+        dict[str, dict]: For each engine that supports the relation, ``{'memory': bytes, 'disk': bytes, 'time': seconds}``.
+    """
+    pairs = n_objs * n_objs
+    quantiles = n_objs * (3e-5 + 3e-8 * n_reps * max(1, math.log2(max(n_reps, 2))))
+    samples = 16 * n_objs * n_reps if relation is not None else 0  # the flat and the sorted measurements of Relation.prepare()
+    estimates = {}
+    for engine in ENGINES:
+        if engine == 'sweep' and relation is not None and not isinstance(relation, IntervalRelation):
+            continue
+        per_pair = _TIME_PER_PAIR_RELATION.get(engine, 0) if relation is not None else _TIME_PER_PAIR[engine]
+        estimates[engine] = {
+            'memory': _MEMORY_PER_OBJ[engine] * n_objs + _MEMORY_PER_PAIR[engine] * pairs + samples + (_MIN_BLOCK if engine == 'out_of_core' else 0),
+            'disk': pairs if engine == 'out_of_core' else 0,
+            'time': quantiles + _TIME_PER_OBJ[engine] * n_objs * max(1, math.log2(max(n_objs, 2))) + per_pair * pairs,
+        }
+    return estimates
+
+
+class Plan:
+    """The engine chosen by ``plan()``, with the estimates of all the engines for logging.
+
+    **Attributes and Methods**:
+
+    Attributes:
+        engine (str): The chosen engine, one of ``ENGINES``.
+
+        n_objs (int): The number of objects.
+
+        n_reps (int): The average number of measurements per object.
+
+        memory_budget (int): The memory budget in bytes, or None.
+
+        estimates (dict[str, dict]): The estimates of ``estimate()``.
+
+        reason (str): Why the engine was chosen.
+
+        kwargs (dict): The keyword arguments of ``QuantileComparer`` for the engine.
+    """
+
+    def __init__(self, engine, n_objs, n_reps, memory_budget, estimates, reason, kwargs):
+        self.engine = engine
+        self.n_objs = n_objs
+        self.n_reps = n_reps
+        self.memory_budget = memory_budget
+        self.estimates = estimates
+        self.reason = reason
+        self.kwargs = kwargs
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: The plan as a JSON serializable dictionary.
+        """
+        kwargs = {k: v for k, v in self.kwargs.items() if k != 'relation'}
+        return {'engine': self.engine, 'n_objs': self.n_objs, 'n_reps': self.n_reps, 'memory_budget': self.memory_budget,
+                'reason': self.reason, 'kwargs': kwargs, 'estimates': self.estimates}
+
+    def __str__(self):
+        header = 'engine={} for N={} reps={} memory_budget={}: {}'.format(self.engine, self.n_objs, self.n_reps, _format_bytes(self.memory_budget), self.reason)
+        return header + '\n' + _format_estimates(self.estimates)
+
+    def make_comparer(self, measurements:dict):
+        """
+        Args:
+            measurements (dict[str, List[float]]): The measurements.
+
+        Returns:
+            partial_ranker.QuantileComparer: A comparer configured for the engine. ``compute_quantiles()`` and ``compare()`` must be called as usual.
+        """
+        from .quantile_comparer import QuantileComparer
+        return QuantileComparer(measurements, **self.kwargs)
+
+
+def _format_estimates(estimates):
+    return '\n'.join('  {:<12} memory {:>9}  disk {:>9}  time {:>9.3g} s'.format(engine, _format_bytes(e['memory']), _format_bytes(e['disk']), e['time'])
+                     for engine, e in estimates.items())
+
+
+def _format_bytes(n):
+    if n is None:
+        return 'none'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024:
+            return '{:.0f} {}'.format(n, unit)
+        n /= 1024
+    return '{:.1f} TB'.format(n)
+
+
+def plan(measurements:dict=None, memory_budget:int=None, relation=None, jobs:int=None, path:str=None, engines:tuple=ENGINES,
+         n_objs:int=None, n_reps:int=None) -> Plan:
+    """Chooses the fastest engine whose estimated memory is within **memory_budget**. The out-of-core engine is considered only if a **path** is given.
+
+    Args:
+        measurements (dict[str, List[float]], optional): The measurements. Alternatively, give **n_objs** and **n_reps**.
+        memory_budget (int, optional): The memory in bytes. Defaults to None (the available physical memory, if it can be determined).
+        relation (partial_ranker.Relation, optional): The relation for ``QuantileComparer``. Defaults to None (the IQI rule).
+        jobs (int, optional): The ``jobs`` of the dense and out-of-core engines. Defaults to None (1).
+        path (str, optional): The file of the comparison matrix of the out-of-core engine. Defaults to None.
+        engines (tuple[str], optional): The engines to choose from. Defaults to ``ENGINES``.
+        n_objs (int, optional): The number of objects, if no measurements are given.
+        n_reps (int, optional): The number of measurements per object, if no measurements are given.
+
+    Returns:
+        partial_ranker.planner.Plan: The plan.
+    """
+    if measurements is not None:
+        n_objs = len(measurements)
+        n_reps = int(round(sum(len(v) for v in measurements.values()) / max(1, n_objs)))
+    if n_objs is None or n_reps is None:
+        raise ValueError("Either measurements or n_objs and n_reps must be given")
+    if memory_budget is None:
+        memory_budget = available_memory()
+    estimates = estimate(n_objs, n_reps, relation)
+    candidates = [e for e in engines if e in estimates and (e != 'out_of_core' or path is not None)]
+    if not candidates:
+        raise ValueError("None of the engines {} supports the relation".format(tuple(engines)))
+    fits = [e for e in candidates if memory_budget is None or estimates[e]['memory'] <= memory_budget]
+    if not fits:
+        raise MemoryError("No engine fits in the memory budget of {}{}:\n{}".format(
+            _format_bytes(memory_budget), '' if path is not None else '; pass a path to consider the out-of-core engine',
+            _format_estimates(estimates)))
+    engine = min(fits, key=lambda e: estimates[e]['time'])
+    skipped = [e for e in candidates if e not in fits]
+    reason = 'fastest estimate' + (' within the memory budget (exceeded by {})'.format(', '.join(skipped)) if skipped else '')
+
+    kwargs = {'relation': relation} if relation is not None else {}
+    if engine == 'sweep':
+        kwargs['lazy'] = True
+    elif engine == 'dense':
+        kwargs['jobs'] = jobs or 1
+    elif engine == 'out_of_core':
+        kwargs['jobs'] = jobs or 1
+        kwargs['path'] = path
+        block = _OUT_OF_CORE_BLOCK
+        if memory_budget is not None:
+            block = max(_MIN_BLOCK, min(block, memory_budget - estimates[engine]['memory'] + _MIN_BLOCK))
+        kwargs['memory_budget'] = block
+    return Plan(engine, n_objs, n_reps, memory_budget, estimates, reason, kwargs)
@@ -20,7 +20,79 @@
 # Contributors:
 # - Aravind Sankaran
 
+import copy
+import os
+import tempfile
+import weakref
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import numpy as np
+from .instrumentation import instrumented, count, _profilers
+from .comparison_matrix import LazyComparisonMatrix, DenseComparisonMatrix
+from .relations import IntervalRelation
+
+
+def _select_percentiles(x, qs):
+    # numpy.percentile(x, qs) (linear interpolation) by partitioning x in place around the needed order statistics only.
+    n = len(x)
+    virtual = (n - 1) * np.true_divide(qs, 100)
+    below = np.floor(virtual).astype(np.intp)
+    above = np.minimum(below + 1, n - 1)
+    x.partition(np.unique(np.concatenate(([0, n - 1], below, above))))
+    if np.issubdtype(x.dtype, np.inexact) and np.isnan(x[-1]):
+        return np.full(len(qs), x[-1])
+    a = x[below]
+    b = x[above]
+    gamma = virtual - below
+    diff = b - a
+    return np.where(gamma >= 0.5, b - diff * (1 - gamma), a + diff * gamma)
+
+
+def _without_outliers(x):
+    # The values within the 1.5 IQR fences, from a copy of x whose order is not kept.
+    x = np.array(x)
+    q1, q2 = _select_percentiles(x, [25, 75])
+    iqr = q2 - q1
+    fence_low = q1 - 1.5 * iqr
+    fence_high = q2 + 1.5 * iqr
+    return x[(x > fence_low) & (x < fence_high)]
+
+
+def _interval_of(x, q_max, q_min, outliers):
+    # The (up, low) quantiles of the measurements x, as np.percentile(x, [q_max, q_min]) after the optional outlier removal.
+    x = _without_outliers(x) if outliers else np.array(x)
+    up, low = _select_percentiles(x, [q_max, q_min])
+    return up, low
+
+
+def _intervals_of(chunk, q_max, q_min, outliers):
+    return [_interval_of(x, q_max, q_min, outliers) for x in chunk]
+
+
+def _fill_tile(A, relation, rows, cols):
+    # Computes the tile (rows, cols) of the upper triangle and derives the mirrored tile as 2 - block.T.
+    block = relation.compare_block(rows, cols)
+    A[rows.start:rows.stop, cols.start:cols.stop] = block
+    if rows.start == cols.start:
+        np.fill_diagonal(A[rows.start:rows.stop, cols.start:cols.stop], -1)
+    else:
+        np.subtract(2, block.T, out=A[cols.start:cols.stop, rows.start:rows.stop])
+    return len(rows) * len(cols)
+
+
+_worker = {}
+
+def _init_tile_worker(path, offset, shape, relation):
+    _worker['A'] = np.memmap(path, dtype=np.int8, mode='r+', offset=offset, shape=shape)
+    _worker['relation'] = relation
+
+def _fill_tile_in_worker(rows, cols):
+    return _fill_tile(_worker['A'], _worker['relation'], rows, cols)
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
 
 class QuantileComparer:
     """
@@ -30,6 +102,29 @@ class QuantileComparer:
     
     Input:
         **measurements (dict[str, List[float]])**: A dictionary of objects consisting of a list of measurement values.
+        
+        **lazy (bool, optional)**: If True, **C** is not stored but is a ``LazyComparisonMatrix`` that computes the relations on demand from the quantile values. 
+        This uses O(N) instead of O(N^2) memory, and ``compare()`` does nothing. Defaults to False.
+        
+        **relation (partial_ranker.relations.Relation, optional)**: A better-than relation that replaces the quantile-based relation in ``compare()``, 
+        e.g., ``MannWhitneyRelation(alpha=0.01)``. The relation compares blocks of objects at once, and the results are stored in **C**.
+        In the lazy mode, only an ``IntervalRelation`` can be used. Defaults to None (the quantile-based relation of ``better_than_relation()``).
+        
+        **block_size (int, optional)**: The number of objects per block when a **relation** is used, and the size of the tiles when **jobs** is set. Defaults to 512.
+
+        **jobs (int, optional)**: If set, **C** is a ``DenseComparisonMatrix`` backed by an (N x N) int8 array, and ``compare()`` computes the tiles 
+        of its upper triangle in parallel on **jobs** workers; the lower triangle is derived from the upper one. Defaults to None (**C** is a dictionary of dictionaries).
+
+        **pool (str, optional)**: 'thread' or 'process'. With 'process', the array is a memory-mapped file in shared memory (``/dev/shm`` if available) 
+        that the worker processes write to. Threads suffice for the quantile-based relation, whose tiles are computed by NumPy without the GIL;
+        processes help with relations that compare in Python loops, like ``MannWhitneyRelation``. Defaults to 'thread'.
+
+        **path (str, optional)**: Store **C** out of core, in this ``.npy`` file, instead of in memory. The file can be opened with ``numpy.load(path, mmap_mode='r')``.
+        If **jobs** is not set, one worker is used. Defaults to None.
+
+        **memory_budget (int, optional)**: The memory in bytes that the comparison and the ranking methods use besides **C** itself. 
+        ``compare()`` limits the size of its tiles, and the rankers stream through **C** in blocks of rows instead of deriving per-object lists.
+        It requires **jobs** or **path**. Defaults to 1 GiB if **path** is set, and to None (no limit) otherwise.
             
     **Attributes and Methods**:
     
@@ -52,43 +147,164 @@ class QuantileComparer:
         
         t_low (dict[str, float]): A dictionary to store the lower quantile values of the measurements for each object.
     """
-    def __init__(self, measurements:dict[str, list[float]]):
+    def __init__(self, measurements:dict[str, list[float]], lazy=False, relation=None, block_size=512, jobs=None, pool='thread', path=None, memory_budget=None):
         self.measurements = measurements
         self.objs = list(measurements.keys())
+        self.lazy = lazy
+        self.relation = relation
+        self.block_size = block_size
+        self.jobs = jobs if jobs is not None or path is None else 1
+        self.pool = pool
+        self.path = path
+        self.memory_budget = memory_budget if memory_budget is not None or path is None else 1 << 30
+        if lazy and relation is not None and not isinstance(relation, IntervalRelation):
+            raise ValueError("The lazy mode requires an IntervalRelation")
+        if pool not in ('thread', 'process'):
+            raise ValueError("pool must be 'thread' or 'process', not '{}'".format(pool))
+        if self.memory_budget is not None and self.jobs is None:
+            raise ValueError("A memory_budget requires jobs or path")
         self.C = {}
+        self._outliers = False
+        self._quantiles = None
+        self.version = 0
         
         self.t_up = {}
         self.t_low = {}
 
-    def compute_quantiles(self, q_max:int, q_min:int, outliers=False) -> None:
+    @instrumented('QuantileComparer.compute_quantiles')
+    def compute_quantiles(self, q_max:int, q_min:int, outliers=False, threads:int=None) -> None:
         """For a given quantile range, the upper and lower quantile values of measurements are computed and stored in the **t_up** and **t_low** dictionaries.
-        The elements of the comparison matrix **C** is initialized to -1.
+        The elements of the comparison matrix **C** is initialized to -1. In the lazy mode, **C** is set to a ``LazyComparisonMatrix`` over the quantile values.
+
+        The quantiles are those of ``numpy.percentile`` (linear interpolation), selected with ``numpy.partition`` around the two order statistics that each quantile needs.
+        With **threads**, contiguous chunks of the objects are computed on a thread pool; NumPy releases the GIL while partitioning,
+        and every object is computed the same way, so the values do not depend on the number of threads.
 
         Args:
             q_max (int): Upper quantile. E.g., 75 for 75th percentile.
             q_min (int): Lower quantile. E.g., 25 for 25th percentile.
             outliers (bool, optional): Remove outliers using the 1.5 IQR rule. Defaults to False.
+            threads (int, optional): The number of threads. Defaults to None (the objects are computed one after another).
             
         Returns:
             None 
         """
         self.C = {}
-        for x in self.objs:
-            self.C[x] = {}
-            vals = self.measurements[x].copy()
-            if outliers:
-                vals = self._remove_outliers(self.measurements[x])
-            self.t_up[x], self.t_low[x]  = np.percentile(vals,[q_max, q_min])
-            for y in self.objs:
-                self.C[x][y] = -1
+        self._outliers = outliers
+        self._quantiles = (q_max, q_min)
+        values = [self.measurements[x] for x in self.objs]
+        if threads is not None and threads > 1 and len(values) > 1:
+            size = -(-len(values) // (4 * threads))
+            with ThreadPoolExecutor(threads) as ex:
+                chunks = ex.map(lambda chunk: _intervals_of(chunk, q_max, q_min, outliers), [values[i:i + size] for i in range(0, len(values), size)])
+                intervals = [interval for chunk in chunks for interval in chunk]
+        else:
+            intervals = _intervals_of(values, q_max, q_min, outliers)
+        for x, (up, low) in zip(self.objs, intervals):
+            self.t_up[x], self.t_low[x] = up, low
+            if not self.lazy and self.jobs is None:
+                self.C[x] = dict.fromkeys(self.objs, -1)
+        if self.jobs is not None and not self.lazy:
+            self.C = self._new_dense_matrix()
+        elif self.lazy and self.relation is not None:
+            self.relation.prepare(self._samples())
+            self.C = LazyComparisonMatrix(self.objs, self.relation.low, self.relation.up)
+        elif self.lazy:
+            self.C = LazyComparisonMatrix(self.objs, [self.t_low[x] for x in self.objs], [self.t_up[x] for x in self.objs])
+
+    @classmethod
+    def from_quantiles(cls, t_low:dict[str, float], t_up:dict[str, float], lazy=True):
+        """Creates a comparer from precomputed quantile values, e.g., quantiles that were computed elsewhere or loaded from disk.
+        The comparer has no measurements, so ``compute_quantiles()`` must not be called on it.
+
+        Args:
+            t_low (dict[str, float]): The lower quantile value of each object.
+            t_up (dict[str, float]): The upper quantile value of each object.
+            lazy (bool, optional): Create the comparer in the lazy mode. Otherwise **C** is initialized to -1 and ``compare()`` must be called. Defaults to True.
+
+        Returns:
+            partial_ranker.QuantileComparer: The comparer.
+        """
+        cm = cls({}, lazy=lazy)
+        cm.objs = list(t_low.keys())
+        cm.t_low = dict(t_low)
+        cm.t_up = {x: t_up[x] for x in cm.objs}
+        if lazy:
+            cm.C = LazyComparisonMatrix(cm.objs, [cm.t_low[x] for x in cm.objs], [cm.t_up[x] for x in cm.objs])
+        else:
+            cm.C = {x: dict.fromkeys(cm.objs, -1) for x in cm.objs}
+        return cm
+
+    @instrumented('QuantileComparer.subset')
+    def subset(self, mask) -> 'QuantileComparer':
+        """Restricts the comparer to a subset of the objects, e.g., to the variants of one matrix size, without recomputing the quantiles or the comparisons.
+        The quantiles and the relation are taken from this comparer, and **C** is restricted with vectorized indexing if it is a lazy or a dense matrix.
+        ``compare()`` need not be called on the returned comparer.
+
+        Args:
+            mask (numpy.ndarray): A boolean mask over **objs**, or the positions of the objects in **objs**.
+
+        Returns:
+            partial_ranker.QuantileComparer: A comparer of the objects in the subset, in the order of **objs**.
+        """
+        idx = np.asarray(mask)
+        if idx.dtype == bool:
+            if len(idx) != len(self.objs):
+                raise ValueError("The mask has length {}, but there are {} objects".format(len(idx), len(self.objs)))
+            idx = np.flatnonzero(idx)
+        else:
+            idx = np.sort(idx.astype(np.int64))
+        objs = [self.objs[i] for i in idx.tolist()]
+        cm = QuantileComparer({x: self.measurements[x] for x in objs if x in self.measurements}, lazy=self.lazy, block_size=self.block_size,
+                              jobs=self.jobs, pool=self.pool, memory_budget=self.memory_budget)
+        cm.objs = objs
+        cm.t_low = {x: self.t_low[x] for x in objs}
+        cm.t_up = {x: self.t_up[x] for x in objs}
+        cm._outliers = self._outliers
+        cm._quantiles = self._quantiles
+        if self.relation is not None:
+            cm.relation = copy.copy(self.relation)
+            if hasattr(self.relation, 'low'):
+                cm.relation.low, cm.relation.up = self.relation.low[idx], self.relation.up[idx]
+        C = self.C
+        if isinstance(C, LazyComparisonMatrix):
+            cm.C = LazyComparisonMatrix(objs, C.t_low[idx], C.t_up[idx])
+        elif hasattr(C, 'array'):
+            array = np.empty((len(idx), len(idx)), dtype=np.int8)
+            for i0 in range(0, len(idx), C.block_rows):
+                array[i0:i0 + C.block_rows] = C.array[idx[i0:i0 + C.block_rows]][:, idx]
+            cm.C = DenseComparisonMatrix(objs, array, C.memory_budget)
+        else:
+            cm.C = {x: {y: C[x][y] for y in objs} for x in objs}
+        return cm
+
+    def _new_dense_matrix(self):
+        n = len(self.objs)
+        if self.path is not None:
+            array = np.lib.format.open_memmap(self.path, mode='w+', dtype=np.int8, shape=(n, n))
+            C = DenseComparisonMatrix(self.objs, array, self.memory_budget)
+            for i0 in range(0, n, C.block_rows):
+                array[i0:i0 + C.block_rows] = -1
+            C.path = self.path
+            return C
+        if self.pool == 'process':
+            fd, path = tempfile.mkstemp(suffix='.C', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+            os.close(fd)
+            array = np.memmap(path, dtype=np.int8, mode='w+', shape=(n, n))
+            array[:] = -1
+            C = DenseComparisonMatrix(self.objs, array, self.memory_budget)
+            C.path = path
+            weakref.finalize(C, _remove_file, path)
+            return C
+        return DenseComparisonMatrix(self.objs, np.full((n, n), -1, dtype=np.int8), self.memory_budget)
+
+    def _samples(self):
+        if self._outliers:
+            return [self._remove_outliers(self.measurements[x]) for x in self.objs]
+        return [self.measurements[x] for x in self.objs]
 
     def _remove_outliers(self, x):
-        x = np.array(x)
-        q1, q2 = np.percentile(x, [25, 75])
-        iqr = q2 - q1
-        fence_low = q1 - 1.5 * iqr
-        fence_high = q2 + 1.5 * iqr
-        return x[(x > fence_low) & (x < fence_high)]
+        return _without_outliers(x)
     
     def better_than_relation(self, obj1:str, obj2:str) -> int:
         """The better than relation to compare two objects based on the quantile vales of their measurements.
@@ -107,9 +323,15 @@ class QuantileComparer:
                 - If **obj1** is equivalent to **obj2**, returns 1
                 - If **obj1** is worse than **obj2**, returns 2 
         """
+        if self.lazy:
+            return self.C.relation(self.C.index[obj1], self.C.index[obj2])
         
         if self.C[obj1][obj2] != -1:
+            if _profilers:
+                count('QuantileComparer.cache_hits')
             return self.C[obj1][obj2]
+        if _profilers:
+            count('QuantileComparer.comparisons')
         
         t1_up = self.t_up[obj1]
         t1_low = self.t_low[obj1]
@@ -133,20 +355,142 @@ class QuantileComparer:
 
         return ret
     
+    @instrumented('QuantileComparer.compare')
     def compare(self) -> None:
         """Performs a pair-wise comparison of all objects in the measurements dictionary and stores the results in **C**. 
         
         Returns:
             None
         """
+        if self.lazy:
+            return
+        if self.jobs is not None:
+            self._compare_tiles()
+            return
+        if self.relation is not None:
+            self._compare_blocks()
+            return
         for i in range(len(self.objs)):
             for j in range(i+1, len(self.objs)):
                 self.better_than_relation(self.objs[i], self.objs[j])
                 
+    def _compare_blocks(self):
+        self.relation.prepare(self._samples())
+        n = len(self.objs)
+        b = self.block_size
+        for i0 in range(0, n, b):
+            rows = range(i0, min(i0 + b, n))
+            for j0 in range(i0, n, b):
+                cols = range(j0, min(j0 + b, n))
+                block = self.relation.compare_block(rows, cols).tolist()
+                count('QuantileComparer.comparisons', len(rows) * len(cols))
+                for r, i in enumerate(rows):
+                    x = self.objs[i]
+                    row = block[r]
+                    for c, j in enumerate(cols):
+                        if j > i:
+                            y = self.objs[j]
+                            self.C[x][y] = row[c]
+                            self.C[y][x] = 2 - row[c]
+
+    def _compare_tiles(self):
+        if self.relation is not None:
+            relation = self.relation
+            relation.prepare(self._samples())
+        else:
+            relation = IntervalRelation()
+            relation.low = np.array([self.t_low[x] for x in self.objs], dtype=float)
+            relation.up = np.array([self.t_up[x] for x in self.objs], dtype=float)
+        n = len(self.objs)
+        b = self.block_size
+        if self.memory_budget is not None:
+            # A tile and its temporaries take about 4 bytes per entry.
+            b = max(1, min(b, int(np.sqrt(self.memory_budget / (4 * self.jobs)))))
+        tiles = [(range(i0, min(i0 + b, n)), range(j0, min(j0 + b, n))) for i0 in range(0, n, b) for j0 in range(i0, n, b)]
+        A = self.C.array
+        if self.pool == 'process':
+            A.flush()
+            with ProcessPoolExecutor(self.jobs, initializer=_init_tile_worker, initargs=(self.C.path, A.offset, A.shape, relation)) as ex:
+                done = ex.map(_fill_tile_in_worker, *zip(*tiles), chunksize=max(1, len(tiles) // (4 * self.jobs)))
+                count('QuantileComparer.comparisons', sum(done))
+        else:
+            with ThreadPoolExecutor(self.jobs) as ex:
+                done = ex.map(lambda tile: _fill_tile(A, relation, *tile), tiles)
+                count('QuantileComparer.comparisons', sum(done))
+        if isinstance(A, np.memmap):
+            A.flush()
+
+    def interval(self, measurements:list) -> tuple:
+        """The interval ``[low, up]`` of measurements that are not part of the comparer, e.g., of a new candidate, as the intervals of the objects
+        are computed by ``compute_quantiles()``: from the same quantiles, or from the relation if it is an ``IntervalRelation``.
+
+        Args:
+            measurements (List[float]): The measurements.
+
+        Returns:
+            tuple[float, float]: The lower and upper end of the interval.
+        """
+        if self._quantiles is None:
+            raise ValueError("compute_quantiles() has not been called")
+        if self.relation is not None and not isinstance(self.relation, IntervalRelation):
+            raise ValueError("{} does not summarize an object by an interval".format(type(self.relation).__name__))
+        vals = self._remove_outliers(measurements) if self._outliers else np.asarray(measurements, dtype=float)
+        if self.relation is not None:
+            low, up = self.relation.intervals([np.sort(vals)])
+            return float(low[0]), float(up[0])
+        q_max, q_min = self._quantiles
+        up, low = np.percentile(vals, [q_max, q_min])
+        return float(low), float(up)
+
+    @instrumented('QuantileComparer.update_object')
+    def update_object(self, obj:str, measurements:list=None) -> None:
+        """Recomputes the quantiles of one object, e.g., after it was remeasured, and updates its row and column of **C** in O(N) time.
+        **C** stays the same object; rankers are updated with their ``update()`` methods, which call this method.
+        Calling it directly makes the ``DominanceAnalysis`` of **C** stale, so that it is recomputed on next use.
+
+        Args:
+            obj (str): The key of an object in the measurements dictionary.
+            measurements (List[float], optional): The new measurements of the object. Defaults to None (the measurements dictionary was updated in place).
+        """
+        if self._quantiles is None:
+            raise ValueError("compute_quantiles() has not been called")
+        if measurements is not None:
+            self.measurements[obj] = measurements
+        q_max, q_min = self._quantiles
+        self.t_up[obj], self.t_low[obj] = _interval_of(self.measurements[obj], q_max, q_min, self._outliers)
+        self.version += 1
+
+        i = self.objs.index(obj) if not hasattr(self.C, 'index') else self.C.index[obj]
+        if self.relation is not None and self.lazy:
+            vals = self._remove_outliers(self.measurements[obj]) if self._outliers else self.measurements[obj]
+            low, up = self.relation.intervals([np.sort(np.asarray(vals, dtype=float))])
+            self.C.t_low[i], self.C.t_up[i] = low[0], up[0]
+            return
+        if self.lazy:
+            self.C.t_low[i], self.C.t_up[i] = self.t_low[obj], self.t_up[obj]
+            return
+        if self.relation is not None:
+            self.relation.prepare(self._samples())
+            row = self.relation.compare_block(range(i, i + 1), range(0, len(self.objs)))[0]
+        else:
+            low = np.array([self.t_low[x] for x in self.objs], dtype=float)
+            up = np.array([self.t_up[x] for x in self.objs], dtype=float)
+            row = (up[i] >= low).view(np.int8) + (up < low[i]).view(np.int8)
+        row[i] = -1
+        if hasattr(self.C, 'array'):
+            self.C.array[i] = row
+            self.C.array[:, i] = 2 - row
+            self.C.array[i, i] = -1
+        else:
+            for y, r in zip(self.objs, row.tolist()):
+                if y != obj:
+                    self.C[obj][y] = r
+                    self.C[y][obj] = 2 - r
+
     def get_comparison_matrix(self) -> dict[str, dict[str, int]]:
         """
         Returns:
-            dict[str, dict[str, int]]: The comparison matrix **C**.
+            dict[str, dict[str, int]]: The comparison matrix **C**. In the lazy mode, a ``LazyComparisonMatrix``, and if **jobs** is set, a ``DenseComparisonMatrix`` with the same interface.
         """
         return self.C
         
@@ -0,0 +1,147 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+import numpy as np
+from .dominance_analysis import DominanceAnalysis
+from .instrumentation import instrumented
+from .partial_ranker_wrapper import Method
+from .relations import IntervalRelation
+
+
+class RankIndex:
+    """A query index over a computed ranking, that classifies a new object, e.g., a candidate variant of an autotuner, in O(log N) time
+    without adding it to the measurements and ranking again.
+
+    The relation must be an interval relation (the IQI rule of ``QuantileComparer`` or an ``IntervalRelation``): x is better than y iff ``up[x] < low[y]``.
+    The index holds the objects sorted by ``up`` and by ``low``, and for each rank of Methodology 1 the objects sorted by ``up``.
+    Since every object at depth d+1 has a dependency at depth d, the smallest ``up`` of each depth increases with the depth,
+    so the depth of a new object is the number of depths whose smallest ``up`` is below its ``low``.
+    Likewise, the equivalence classes of Methodology 3 cover disjoint ranges of values, and the Min rank of a new object is the number of classes below its interval.
+
+    The answers are those of ranking the objects together with the new object, for the new object; the ranks of the objects that are worse than it may change.
+
+    Input:
+        comparer (partial_ranker.QuantileComparer):
+            The ``QuantileComparer`` object that contains the results of pair-wise comparisons.
+            i.e, ``comparer.compare()`` should have been called.
+
+        analysis (partial_ranker.DominanceAnalysis, optional):
+            A ``DominanceAnalysis`` of the same comparer, e.g., ``PartialRanker.get_analysis()``. If not provided, a new one is created.
+
+    **Attributes and Methods**:
+
+    Attributes:
+        objs (List[str]): List of object names.
+
+        low (numpy.ndarray): The lower end of the interval of each object.
+
+        up (numpy.ndarray): The upper end of the interval of each object.
+    """
+
+    @instrumented('RankIndex.__init__')
+    def __init__(self, comparer, analysis=None):
+        self.comparer = comparer
+        self.analysis = analysis if analysis is not None else DominanceAnalysis(comparer)
+        self.objs = self.analysis.objs
+        C = comparer.C
+        relation = getattr(comparer, 'relation', None)
+        if getattr(C, 'is_interval_order', False):
+            low, up = C.t_low, C.t_up
+        elif relation is not None:
+            if not isinstance(relation, IntervalRelation):
+                raise ValueError("{} does not summarize an object by an interval".format(type(relation).__name__))
+            low, up = relation.low, relation.up
+        else:
+            low = [comparer.t_low[obj] for obj in self.objs]
+            up = [comparer.t_up[obj] for obj in self.objs]
+        self.low = np.array(low, dtype=float)
+        self.up = np.array(up, dtype=float)
+
+        self._by_up = np.argsort(self.up, kind='stable')
+        self._sorted_up = self.up[self._by_up]
+        self._by_low = np.argsort(self.low, kind='stable')
+        self._sorted_low = self.low[self._by_low]
+
+        obj_depth, _ = self.analysis.get_depths()
+        depth = np.fromiter((obj_depth[obj] for obj in self.objs), dtype=np.int64, count=len(self.objs))
+        # The objects by depth and then by up; the first object of each depth has the smallest up.
+        self._by_depth = np.lexsort((self.up, depth))
+        self._depth_ptr = np.zeros(depth.max() + 2 if len(depth) else 1, dtype=np.int64)
+        np.cumsum(np.bincount(depth), out=self._depth_ptr[1:])
+        self._depth_up = self.up[self._by_depth]
+        self._depth_min_up = self._depth_up[self._depth_ptr[:-1]]
+
+        # The upper end of each equivalence class, i.e., of each maximal run of overlapping intervals in the order of low.
+        reach = np.maximum.accumulate(self.up[self._by_low])
+        ends = np.flatnonzero(reach[:-1] < self._sorted_low[1:])
+        self._class_up = np.append(reach[ends], reach[-1:])
+
+    def rank(self, measurements:list, method:Method=Method.DFG) -> int:
+        """
+        Args:
+            measurements (List[float]): The measurements of the new object.
+            method (Method, optional): Method.DFG or Method.Min. Defaults to Method.DFG.
+
+        Returns:
+            int: The rank of the new object.
+        """
+        low, _ = self.comparer.interval(measurements)
+        if method == Method.DFG:
+            return int(np.searchsorted(self._depth_min_up, low, side='left'))
+        if method == Method.Min:
+            return int(np.searchsorted(self._class_up, low, side='left'))
+        raise ValueError("The rank of Method.{} depends on the separable arrangement of all the objects; use Method.DFG or Method.Min".format(method.name))
+
+    @instrumented('RankIndex.classify')
+    def classify(self, measurements:list) -> dict:
+        """Classifies a new object. The ranks and the numbers of better and worse objects take O(log N) time; listing the objects takes time proportional to their number.
+
+        Args:
+            measurements (List[float]): The measurements of the new object.
+
+        Returns:
+            dict: With the keys
+
+                - 'dfg_rank' (int): The rank according to Methodology 1.
+                - 'min_rank' (int): The rank according to Methodology 3.
+                - 'n_better', 'n_worse' (int): The number of objects that are better and worse than the new object.
+                - 'better', 'worse' (List[str]): The objects that are better and worse than the new object.
+                - 'predecessors' (List[str]): The objects that are better than the new object at the rank before its rank, i.e., its parents in graph H.
+        """
+        low, up = self.comparer.interval(measurements)
+        n_better = int(np.searchsorted(self._sorted_up, low, side='left'))
+        first_worse = int(np.searchsorted(self._sorted_low, up, side='right'))
+        depth = int(np.searchsorted(self._depth_min_up, low, side='left'))
+        predecessors = []
+        if depth > 0:
+            start, stop = self._depth_ptr[depth - 1], self._depth_ptr[depth]
+            k = start + np.searchsorted(self._depth_up[start:stop], low, side='left')
+            predecessors = [self.objs[i] for i in self._by_depth[start:k].tolist()]
+        return {
+            'dfg_rank': depth,
+            'min_rank': int(np.searchsorted(self._class_up, low, side='left')),
+            'n_better': n_better,
+            'n_worse': len(self.objs) - first_worse,
+            'better': [self.objs[i] for i in self._by_up[:n_better].tolist()],
+            'worse': [self.objs[i] for i in self._by_low[first_worse:].tolist()],
+            'predecessors': predecessors,
+        }
@@ -0,0 +1,294 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+"""A long-running asyncio service that keeps named datasets of measurements in memory and serves their partial ranks.
+
+Start it with ``python -m partial_ranker.ranking_service --port 8080`` (or ``--unix /path/to/socket``) and use the HTTP/JSON API:
+
+    - ``PUT /datasets/<name>`` with ``{"measurements": {...}, "q_max": 75, "q_min": 25, "outliers": false, "method": "DFGReduced"}`` creates or replaces a dataset.
+    - ``POST /datasets/<name>/measurements`` with ``{"obj1": [1.2, 1.3], ...}`` appends measurements.
+    - ``GET /datasets/<name>/ranks`` returns the ranks.
+    - ``GET /datasets/<name>/rank?obj=<obj>`` returns the rank of one object.
+    - ``DELETE /datasets/<name>`` removes a dataset.
+
+Invalid requests, e.g., measurements that are not non-empty lists of numbers, are answered with status 400 and failures of the service with status 500,
+both with a JSON body ``{"error": ...}``.
+"""
+
+import argparse
+import asyncio
+import json
+import numpy as np
+from urllib.parse import urlsplit, parse_qs, unquote
+from .quantile_comparer import QuantileComparer
+from .partial_ranker_wrapper import Method, PartialRanker
+
+
+def _check_measurements(measurements):
+    # Raises ValueError unless every object has a non-empty list of numbers, before anything is changed.
+    if not isinstance(measurements, dict):
+        raise ValueError("The measurements must be an object of lists of numbers, not {}".format(type(measurements).__name__))
+    for obj, v in measurements.items():
+        try:
+            values = np.asarray(v, dtype=float)
+        except (TypeError, ValueError):
+            values = None
+        if values is None or values.ndim != 1 or len(values) == 0:
+            raise ValueError("The measurements of '{}' must be a non-empty list of numbers".format(obj))
+
+
+class Dataset:
+    """A named set of measurements with the ranking parameters and the cached result.
+    The quantiles are cached per object, so that a refresh only recomputes the quantiles of the objects that received measurements,
+    and the ranks are computed from the quantiles with a lazy ``QuantileComparer`` in O(N log N) time.
+
+    Input:
+        **measurements (dict[str, List[float]])**: The initial measurements.
+
+        **q_max (int, optional)**: Upper quantile. Defaults to 75.
+
+        **q_min (int, optional)**: Lower quantile. Defaults to 25.
+
+        **outliers (bool, optional)**: Remove outliers using the 1.5 IQR rule. Defaults to False.
+
+        **method (Method, optional)**: The ranking method. Defaults to Method.DFGReduced.
+
+    **Attributes and Methods**:
+
+    Attributes:
+        version (int): Incremented by every change of the measurements.
+        ranker (partial_ranker.PartialRanker): The ranker of the last refresh.
+        ranker_version (int): The version of the measurements that **ranker** was computed from.
+    """
+
+    def __init__(self, measurements:dict, q_max=75, q_min=25, outliers=False, method:Method=Method.DFGReduced):
+        _check_measurements(measurements)
+        if not 0 <= q_min < q_max <= 100:
+            raise ValueError("Expected 0 <= q_min < q_max <= 100, got q_min={} and q_max={}".format(q_min, q_max))
+        self.measurements = {obj: list(v) for obj, v in measurements.items()}
+        self.q_max = q_max
+        self.q_min = q_min
+        self.outliers = outliers
+        self.method = method
+        self.version = 1
+        self.ranker = None
+        self.ranker_version = 0
+        self._t_low = {}
+        self._t_up = {}
+        self._dirty = set(self.measurements)
+        self._refresh = None
+
+    def append(self, measurements:dict) -> None:
+        """
+        Args:
+            measurements (dict[str, List[float]]): Measurements to append, possibly of new objects.
+
+        Raises:
+            ValueError: If the measurements of an object are not a non-empty list of numbers. Nothing is appended then.
+        """
+        _check_measurements(measurements)
+        for obj, v in measurements.items():
+            self.measurements.setdefault(obj, []).extend(v)
+            self._dirty.add(obj)
+        self.version += 1
+
+    def snapshot(self) -> tuple:
+        """Copies what a refresh needs, so that the refresh can run in a worker thread while ``append()`` changes the measurements.
+        It must be called where ``append()`` is called, i.e., on the event loop of the service.
+
+        Returns:
+            tuple[int, dict[str, List[float]], List[str]]: The version, the measurements of the changed objects, and all the objects.
+        """
+        dirty, self._dirty = self._dirty, set()
+        return self.version, {obj: list(self.measurements[obj]) for obj in dirty}, list(self.measurements)
+
+    def refresh(self, snapshot:tuple=None) -> int:
+        """Recomputes the quantiles of the changed objects and the ranks. This is called in a worker thread of the service.
+        If it fails, the objects of the snapshot are marked as changed again, so that the next refresh retries them.
+
+        Args:
+            snapshot (tuple, optional): The output of ``snapshot()``. Defaults to None (a snapshot is taken now).
+
+        Returns:
+            int: The version of the measurements that the ranks were computed from.
+        """
+        version, dirty, objs = snapshot if snapshot is not None else self.snapshot()
+        try:
+            if dirty:
+                cm = QuantileComparer(dirty, lazy=True)
+                cm.compute_quantiles(self.q_max, self.q_min, outliers=self.outliers)
+                self._t_low.update(cm.t_low)
+                self._t_up.update(cm.t_up)
+            t_low = {obj: self._t_low[obj] for obj in objs if obj in self._t_low}
+            pr = PartialRanker(QuantileComparer.from_quantiles(t_low, self._t_up, lazy=True))
+            pr.compute_ranks(self.method)
+        except BaseException:
+            self._dirty.update(dirty)
+            raise
+        self.ranker = pr
+        self.ranker_version = version
+        return version
+
+
+class RankingService:
+    """Holds the datasets and coalesces the refreshes: all the queries that arrive while a dataset is stale wait for the same refresh,
+    and all the measurements appended meanwhile are included in the next one.
+
+    **Attributes and Methods**:
+
+    Attributes:
+        datasets (dict[str, Dataset]): The datasets by name.
+    """
+
+    def __init__(self):
+        self.datasets = {}
+
+    def put(self, name:str, dataset:Dataset) -> None:
+        self.datasets[name] = dataset
+
+    def delete(self, name:str) -> None:
+        self.datasets.pop(name)
+
+    def append(self, name:str, measurements:dict) -> int:
+        ds = self.datasets[name]
+        ds.append(measurements)
+        return ds.version
+
+    async def ranker(self, name:str) -> PartialRanker:
+        """
+        Args:
+            name (str): The name of a dataset.
+
+        Returns:
+            partial_ranker.PartialRanker: A ranker that is up to date with the measurements at the time of the call.
+
+        Raises:
+            RuntimeError: If the refresh failed. The dataset stays stale, and the next call retries the refresh.
+        """
+        ds = self.datasets[name]
+        while ds.ranker_version < ds.version:
+            if ds._refresh is None:
+                ds._refresh = asyncio.get_running_loop().run_in_executor(None, ds.refresh, ds.snapshot())
+            task = ds._refresh
+            try:
+                await task
+            except Exception as e:
+                raise RuntimeError("The refresh of dataset '{}' failed: {!r}".format(name, e)) from e
+            finally:
+                if ds._refresh is task:
+                    ds._refresh = None
+        return ds.ranker
+
+    async def get_ranks(self, name:str) -> dict:
+        pr = await self.ranker(name)
+        ranks = pr.get_ranks()
+        return {'version': self.datasets[name].ranker_version, 'ranks': {str(r): list(ranks[r]) for r in sorted(ranks)}}
+
+    async def get_rank_obj(self, name:str, obj:str) -> dict:
+        pr = await self.ranker(name)
+        return {'version': self.datasets[name].ranker_version, 'obj': obj, 'rank': pr.get_rank_obj(obj)}
+
+    async def handle(self, method:str, target:str, body:bytes) -> tuple:
+        """Dispatches one HTTP request. Invalid requests are answered with status 400, and failures of the service with status 500.
+
+        Returns:
+            tuple[int, dict]: The status code and the JSON response.
+        """
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.strip('/').split('/')]
+        if len(parts) < 2 or parts[0] != 'datasets':
+            return 404, {'error': 'not found'}
+        name = parts[1]
+        try:
+            data = json.loads(body) if body else {}
+            if len(parts) == 2 and method == 'PUT':
+                self.put(name, Dataset(data['measurements'], data.get('q_max', 75), data.get('q_min', 25),
+                                       data.get('outliers', False), Method[data.get('method', 'DFGReduced')]))
+                return 201, {'name': name}
+            if name not in self.datasets:
+                return 404, {'error': "no dataset '{}'".format(name)}
+            if len(parts) == 2 and method == 'DELETE':
+                self.delete(name)
+                return 200, {'name': name}
+            if parts[2:] == ['measurements'] and method == 'POST':
+                return 200, {'version': self.append(name, data)}
+            if parts[2:] == ['ranks'] and method == 'GET':
+                return 200, await self.get_ranks(name)
+            if parts[2:] == ['rank'] and method == 'GET':
+                return 200, await self.get_rank_obj(name, parse_qs(url.query)['obj'][0])
+        except (KeyError, ValueError, TypeError) as e:
+            return 400, {'error': repr(e)}
+        except Exception as e:
+            return 500, {'error': repr(e)}
+        return 404, {'error': 'not found'}
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, _ = line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b'\r\n', b'\n', b''):
+                        break
+                    k, v = h.decode('latin-1').split(':', 1)
+                    headers[k.strip().lower()] = v.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                try:
+                    status, response = await self.handle(method, target, body)
+                    payload = json.dumps(response).encode()
+                except Exception as e:
+                    status, payload = 500, json.dumps({'error': repr(e)}).encode()
+                writer.write(b'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n'
+                             % (status, b'OK' if status < 400 else b'Error', len(payload)) + payload)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host:str='127.0.0.1', port:int=8080, unix:str=None):
+        """Serves the HTTP API on a TCP port or, if **unix** is given, on a Unix socket, until cancelled."""
+        if unix:
+            server = await asyncio.start_unix_server(self._serve_connection, path=unix)
+        else:
+            server = await asyncio.start_server(self._serve_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Partial ranking service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--unix', default=None, help='serve on this Unix socket instead of TCP')
+    args = parser.parse_args(argv)
+    asyncio.run(RankingService().serve(args.host, args.port, args.unix))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+from statistics import NormalDist
+from typing import List
+import numpy as np
+
+
+class Relation:
+    """Base class of the better-than relations that can be passed to ``QuantileComparer(measurements, relation=...)``.
+    A relation compares blocks of objects at once and returns the results with the encoding of the comparison matrix **C**:
+    0 if the object of the row is better than the object of the column, 1 if they are equivalent and 2 if it is worse.
+
+    Subclasses implement ``compare_block()`` and may override ``prepare()`` to precompute per-object data.
+
+    **Methods**:
+    """
+
+    def prepare(self, samples:List[np.ndarray]) -> None:
+        """Called once by ``QuantileComparer.compare()`` before the blocks are compared.
+        The samples are sorted and concatenated, so that ``compare_block()`` can work on flat arrays.
+
+        Args:
+            samples (List[numpy.ndarray]): The measurements of each object, in the order of ``QuantileComparer.objs``.
+        """
+        self.sorted = [np.sort(np.asarray(s, dtype=float)) for s in samples]
+        self.sizes = np.array([len(s) for s in self.sorted], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(self.sizes)))
+        self.flat = np.concatenate(self.sorted) if self.sorted else np.empty(0)
+
+    def compare_block(self, rows:range, cols:range) -> np.ndarray:
+        """
+        Args:
+            rows (range): Indices of the objects of the rows.
+            cols (range): Indices of the objects of the columns.
+
+        Returns:
+            numpy.ndarray: An int8 array of shape (len(rows), len(cols)) with the results of the comparisons.
+        """
+        raise NotImplementedError
+
+    def _segments(self, cols):
+        # Flat values of the objects in cols and the start of each object within them.
+        lo, hi = self.offsets[cols.start], self.offsets[cols.stop]
+        return self.flat[lo:hi], self.offsets[cols.start:cols.stop] - lo
+
+
+class IntervalRelation(Relation):
+    """Base class of the relations where each object is summarized by an interval ``[low, up]``,
+    and an object is better than another if its interval lies entirely below the interval of the other.
+    The IQI rule of ``QuantileComparer`` is of this kind. Subclasses implement ``intervals()``.
+    """
+
+    def prepare(self, samples):
+        super().prepare(samples)
+        self.low, self.up = self.intervals(self.sorted)
+
+    def intervals(self, samples:List[np.ndarray]) -> tuple:
+        """
+        Args:
+            samples (List[numpy.ndarray]): The sorted measurements of each object.
+
+        Returns:
+            tuple[numpy.ndarray, numpy.ndarray]: The lower and upper ends of the interval of each object.
+        """
+        raise NotImplementedError
+
+    def compare_block(self, rows, cols):
+        up_r = self.up[rows.start:rows.stop, None]
+        low_r = self.low[rows.start:rows.stop, None]
+        # 1 - [row better] + [row worse], from the boolean masks viewed as int8.
+        block = (up_r >= self.low[None, cols.start:cols.stop]).view(np.int8)
+        block += (self.up[None, cols.start:cols.stop] < low_r).view(np.int8)
+        return block
+
+
+class IQIRelation(IntervalRelation):
+    """The inter-quantile-interval rule of ``QuantileComparer.better_than_relation()``, computed block by block.
+
+    Input:
+        **q_max (int, optional)**: Upper quantile. Defaults to 75.
+
+        **q_min (int, optional)**: Lower quantile. Defaults to 25.
+    """
+
+    def __init__(self, q_max=75, q_min=25):
+        self.q_max = q_max
+        self.q_min = q_min
+
+    def intervals(self, samples):
+        q = np.array([np.percentile(s, [self.q_min, self.q_max]) for s in samples]).reshape(-1, 2)
+        return q[:, 0], q[:, 1]
+
+
+class BootstrapCIRelation(IntervalRelation):
+    """An object is better than another if the bootstrap confidence interval of a statistic of its measurements lies entirely below that of the other.
+
+    Input:
+        **alpha (float, optional)**: Significance level; the intervals are the (alpha/2, 1-alpha/2) percentiles of the bootstrap distribution. Defaults to 0.05.
+
+        **n_boot (int, optional)**: Number of bootstrap resamples per object. Defaults to 1000.
+
+        **statistic (Callable, optional)**: A function ``statistic(x, axis)`` like ``np.median`` or ``np.mean``. Defaults to ``np.median``.
+
+        **seed (int, optional)**: Seed of the resampling. Defaults to 0.
+    """
+
+    def __init__(self, alpha=0.05, n_boot=1000, statistic=np.median, seed=0):
+        self.alpha = alpha
+        self.n_boot = n_boot
+        self.statistic = statistic
+        self.seed = seed
+
+    def intervals(self, samples):
+        rng = np.random.default_rng(self.seed)
+        low = np.empty(len(samples))
+        up = np.empty(len(samples))
+        for k, s in enumerate(samples):
+            resamples = s[rng.integers(0, len(s), size=(self.n_boot, len(s)))]
+            stats = self.statistic(resamples, axis=1)
+            low[k], up[k] = np.percentile(stats, [100 * self.alpha / 2, 100 * (1 - self.alpha / 2)])
+        return low, up
+
+
+class MannWhitneyRelation(Relation):
+    """An object is better than another if the two-sided Mann-Whitney U test rejects equal distributions at the significance level **alpha**
+    and its measurements tend to be smaller. The U statistics of a row against a block of columns are obtained by merging the sorted samples
+    with ``np.searchsorted``, and the p-value uses the normal approximation.
+
+    Input:
+        **alpha (float, optional)**: Significance level. Defaults to 0.05.
+    """
+
+    def __init__(self, alpha=0.05):
+        self.alpha = alpha
+        self.z_crit = NormalDist().inv_cdf(1 - alpha / 2)
+
+    def compare_block(self, rows, cols):
+        vals, starts = self._segments(cols)
+        n2 = self.sizes[cols.start:cols.stop].astype(float)
+        block = np.empty((len(rows), len(cols)), dtype=np.int8)
+        for r, i in enumerate(rows):
+            s = self.sorted[i]
+            less = np.searchsorted(s, vals, side='left')
+            leq = np.searchsorted(s, vals, side='right')
+            # U counts the pairs (a, b), a from row i and b from column j, with a < b; ties count 1/2.
+            U = np.add.reduceat(less + 0.5 * (leq - less), starts)
+            n1 = float(len(s))
+            z = (U - n1 * n2 / 2) / np.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+            block[r] = np.where(z > self.z_crit, 0, np.where(z < -self.z_crit, 2, 1))
+        return block
+
+
+class KSRelation(Relation):
+    """An object is better than another if the two-sample Kolmogorov-Smirnov test finds that its empirical distribution function
+    lies significantly above that of the other (i.e., its measurements are smaller), but not significantly below it.
+    The asymptotic critical value ``c(alpha) * sqrt((n+m)/(n*m))`` is used.
+
+    Input:
+        **alpha (float, optional)**: Significance level. Defaults to 0.05.
+    """
+
+    def __init__(self, alpha=0.05):
+        self.alpha = alpha
+        self.c_alpha = np.sqrt(-np.log(alpha / 2) / 2)
+
+    def prepare(self, samples):
+        super().prepare(samples)
+        # Value of each object's own ECDF at each of its sorted measurements (right-continuous, so ties take the last position).
+        self.self_cdf = np.concatenate([np.searchsorted(s, s, side='right') / len(s) for s in self.sorted]) if self.sorted else np.empty(0)
+
+    def _sweep(self, i, cols):
+        # Largest F_i - F_j and F_j - F_i evaluated at the measurements of every j in cols.
+        vals, starts = self._segments(cols)
+        lo = self.offsets[cols.start]
+        diff = np.searchsorted(self.sorted[i], vals, side='right') / len(self.sorted[i]) - self.self_cdf[lo:lo + len(vals)]
+        return np.maximum.reduceat(diff, starts), np.maximum.reduceat(-diff, starts)
+
+    def compare_block(self, rows, cols):
+        P = np.empty((len(rows), len(cols)))
+        M = np.empty((len(rows), len(cols)))
+        for r, i in enumerate(rows):
+            P[r], M[r] = self._sweep(i, cols)
+        for c, j in enumerate(cols):
+            Pt, Mt = self._sweep(j, rows)
+            # The supremum over the union of both samples.
+            M[:, c] = np.maximum(M[:, c], Pt)
+            P[:, c] = np.maximum(P[:, c], Mt)
+        n1 = self.sizes[rows.start:rows.stop, None].astype(float)
+        n2 = self.sizes[None, cols.start:cols.stop].astype(float)
+        crit = self.c_alpha * np.sqrt((n1 + n2) / (n1 * n2))
+        above = P > crit  # F_i above F_j: row object is faster
+        below = M > crit
+        return np.where(above & ~below, 0, np.where(below & ~above, 2, 1)).astype(np.int8)
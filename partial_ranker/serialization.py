@@ -0,0 +1,229 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+"""Saves a ``PartialRanker`` with its comparer and derived structures to an NPZ file, and loads it back without recomputing anything.
+
+The file is an uncompressed NPZ archive that ``numpy.load()`` can read. Objects are referred to by their position in ``objs``:
+
+    - **objs**, **t_low**, **t_up**: The object names (strings, or numbers of one type) and their quantile values.
+    - **C**: The comparison matrix as an (N x N) int8 array. It is omitted for a lazy comparer, whose relations follow from the quantiles.
+    - **c_low**, **c_up**: The interval bounds of a lazy comparison matrix, which differ from **t_low** and **t_up** if the comparer has a **relation**,
+      e.g., ``IQIRelation(90, 10)``.
+    - **dep_indptr**, **dep_indices**: The dependencies in the CSR format, if they were derived as lists.
+    - **depth**, **arrangement**, **equiv_labels**, **h_edges**: The depths of Methodology 1, the separable arrangement, the equivalence classes
+      (the first object of the class of each object) and the edges of graph H, as far as they were computed.
+    - **method**, **rank_keys**, **rank_ptr**, **rank_members**: The method and the ranks in the CSR format, in the order of ``get_ranks()``.
+    - **dfg_edges**: The edges of ``get_dfg()``, as an (E x 2) array.
+
+Since the members of the archive are stored uncompressed, ``load()`` memory-maps them, so that loading takes time independent of the size of **C**.
+"""
+
+import zipfile
+import numpy as np
+from . import kernels
+from .graph import Graph
+from .comparison_matrix import DenseComparisonMatrix, LazyComparisonMatrix, LazyRelationLists
+from .dominance_analysis import DominanceAnalysis
+from .quantile_comparer import QuantileComparer
+from .partial_ranker_dfg import PartialRankerDFG
+from .partial_ranker_dfg_r import PartialRankerDFGReduced
+from .partial_ranker_min import PartialRankerMin
+from .partial_ranker_wrapper import Method, PartialRanker
+
+FORMAT_VERSION = 1
+
+
+def _names_array(objs):
+    # The object names as an array from which .tolist() restores them: strings, or numbers of one type, e.g., integer ids.
+    names = np.array(objs)
+    if all(isinstance(obj, str) for obj in objs):
+        return names
+    if names.dtype.kind in 'biuf' and len({type(obj) for obj in objs}) == 1:
+        return names
+    raise TypeError("The object names must be strings or numbers of one type to be saved, not {}".format(sorted({type(obj).__name__ for obj in objs})))
+
+
+def _edges_array(graph, index):
+    # Edges in the order of get_edges(), from which Graph(..., edges=...) restores in_nodes and out_nodes.
+    edges = [(index[node1], index[node2]) for node1, node2 in graph.get_edges()]
+    return np.array(edges, dtype=np.int32).reshape(-1, 2)
+
+
+def _csr(groups, index):
+    indptr, indices = kernels.to_csr(groups, index)
+    return indptr, indices.astype(np.int32)
+
+
+def save(pr:PartialRanker, path:str) -> None:
+    """Saves a ranker whose ranks have been computed. The separable arrangement and the DFG are computed if they have not been yet.
+
+    Args:
+        pr (partial_ranker.PartialRanker): The ranker.
+        path (str): Path of the file. As with ``numpy.savez()``, '.npz' is appended if missing.
+    """
+    if pr.ranker is None:
+        raise ValueError("The ranks have not been computed: call compute_ranks() first")
+    cm = pr.comparer
+    analysis = pr.get_analysis()
+    objs = analysis.objs
+    index = {obj: i for i, obj in enumerate(objs)}
+    C = cm.C
+
+    arrays = {
+        'version': np.array(FORMAT_VERSION),
+        'method': np.array(pr.method.name),
+        'objs': _names_array(objs),
+        't_low': np.array([cm.t_low[obj] for obj in objs], dtype=float),
+        't_up': np.array([cm.t_up[obj] for obj in objs], dtype=float),
+    }
+    if getattr(C, 'is_interval_order', False):
+        pos = np.array([C.index[obj] for obj in objs], dtype=np.int64)
+        arrays['c_low'], arrays['c_up'] = C.t_low[pos], C.t_up[pos]
+    else:
+        if hasattr(C, 'array'):
+            arrays['C'] = C.array
+        else:
+            arrays['C'] = np.array([[C[x][y] for y in objs] for x in objs], dtype=np.int8).reshape(len(objs), len(objs))
+    if isinstance(analysis.dependencies, dict):
+        arrays['dep_indptr'], arrays['dep_indices'] = _csr([analysis.dependencies[obj] for obj in objs], index)
+
+    obj_depth, _ = analysis.get_depths()
+    arrays['depth'] = np.array([obj_depth[obj] for obj in objs], dtype=np.int32)
+    arrays['arrangement'] = np.array([index[obj] for obj in analysis.get_separable_arrangement()], dtype=np.int32)
+    if analysis._equiv_classes is not None:
+        labels = np.empty(len(objs), dtype=np.int32)
+        for V in analysis._equiv_classes:
+            ids = [index[obj] for obj in V]
+            labels[ids] = min(ids)
+        arrays['equiv_labels'] = labels
+    if analysis._graph_H is not None:
+        arrays['h_edges'] = _edges_array(analysis._graph_H, index)
+
+    ranks = pr.get_ranks()
+    arrays['rank_keys'] = np.array(list(ranks.keys()), dtype=np.int32)
+    arrays['rank_ptr'], arrays['rank_members'] = _csr(list(ranks.values()), index)
+    arrays['dfg_edges'] = _edges_array(pr.get_dfg(), index)
+
+    np.savez(path, **arrays)
+
+
+def _read_npz(path, mmap):
+    if not mmap:
+        with np.load(path) as f:
+            return {name: f[name] for name in f.files}
+    arrays = {}
+    with zipfile.ZipFile(path) as z, open(path, 'rb') as fh:
+        for info in z.infolist():
+            name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                arrays[name] = np.lib.format.read_array(z.open(info))
+                continue
+            # The data of a stored member follows its local file header, whose name and extra field lengths are at bytes 26 to 30.
+            fh.seek(info.header_offset + 26)
+            n_name, n_extra = np.frombuffer(fh.read(4), dtype='<u2')
+            fh.seek(info.header_offset + 30 + int(n_name) + int(n_extra))
+            version = np.lib.format.read_magic(fh)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran, dtype = read_header(fh)
+            if dtype.hasobject or 0 in shape:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=fh.tell(), shape=shape, order='F' if fortran else 'C')
+    return arrays
+
+
+def _csr_lists(objs, indptr, indices):
+    def fn(obj):
+        i = pos[obj]
+        return [objs[k] for k in indices[indptr[i]:indptr[i+1]]]
+    def indices_fn(obj):
+        i = pos[obj]
+        return np.asarray(indices[indptr[i]:indptr[i+1]], dtype=np.int64)
+    pos = {obj: i for i, obj in enumerate(objs)}
+    return LazyRelationLists(objs, fn, indices_fn)
+
+
+def load(path:str, mmap=True) -> PartialRanker:
+    """Loads a ranker saved with ``save()``. The comparer has the quantiles and the comparison matrix, but no measurements,
+    so ``compute_quantiles()`` must not be called on it. The dependencies are computed on access from the stored lists or the comparison matrix.
+
+    Args:
+        path (str): Path of the file.
+        mmap (bool, optional): Memory-map the arrays instead of reading them. Defaults to True.
+
+    Returns:
+        partial_ranker.PartialRanker: The ranker, with the ranks, the analysis and the DFG restored.
+    """
+    a = _read_npz(path, mmap)
+    if int(a['version']) > FORMAT_VERSION:
+        raise ValueError("{} was written by a newer version of partial_ranker".format(path))
+    objs = a['objs'].tolist()
+    t_low = dict(zip(objs, a['t_low'].tolist()))
+    t_up = dict(zip(objs, a['t_up'].tolist()))
+
+    if 'C' in a:
+        cm = QuantileComparer({}, jobs=1)
+        cm.objs = objs
+        cm.t_low = t_low
+        cm.t_up = t_up
+        cm.C = DenseComparisonMatrix(objs, a['C'])
+        if 'dep_indptr' in a:
+            dependencies = _csr_lists(objs, a['dep_indptr'], a['dep_indices'])
+        else:
+            dependencies = LazyRelationLists(objs, cm.C.better_than, cm.C.better_than_indices)
+        analysis = DominanceAnalysis(cm, dependencies, LazyRelationLists(objs, cm.C.equivalent_to))
+    else:
+        cm = QuantileComparer.from_quantiles(t_low, t_up, lazy=True)
+        if 'c_low' in a:
+            cm.C = LazyComparisonMatrix(objs, np.asarray(a['c_low']), np.asarray(a['c_up']))
+        analysis = DominanceAnalysis(cm)
+
+    depth_objs = {}
+    for obj, d in zip(objs, a['depth'].tolist()):
+        depth_objs.setdefault(d, []).append(obj)
+    analysis._obj_depth = dict(zip(objs, a['depth'].tolist()))
+    analysis._depth_objs = depth_objs
+    analysis._arrangement = [objs[k] for k in a['arrangement'].tolist()]
+    if 'equiv_labels' in a:
+        classes = {}
+        for obj, c in zip(objs, a['equiv_labels'].tolist()):
+            classes.setdefault(c, set()).add(obj)
+        analysis._equiv_classes = list(classes.values())
+    if 'h_edges' in a:
+        analysis._graph_H = Graph(analysis.dependencies, depth_objs, [(objs[i], objs[j]) for i, j in a['h_edges'].tolist()])
+
+    method = Method[str(a['method'])]
+    ranker = {Method.DFG: PartialRankerDFG, Method.DFGReduced: PartialRankerDFGReduced, Method.Min: PartialRankerMin}[method](cm, analysis)
+    if method == Method.DFGReduced:
+        ranker.pr_dfg.compute_ranks()  # from the restored depths
+    ptr, members = a['rank_ptr'], a['rank_members']
+    for k, rank in enumerate(a['rank_keys'].tolist()):
+        group = [objs[i] for i in members[ptr[k]:ptr[k+1]].tolist()]
+        ranker._rank_objs[rank] = set(group) if method == Method.Min else group
+        for obj in group:
+            ranker._obj_rank[obj] = rank
+
+    pr = PartialRanker(cm, method)
+    pr.analysis = analysis
+    pr.ranker = ranker
+    pr._dfg = Graph(analysis.dependencies, ranker.get_ranks(), [(objs[i], objs[j]) for i, j in a['dfg_edges'].tolist()])
+    return pr
@@ -0,0 +1,162 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+import numpy as np
+from typing import Callable, List
+from .quantile_comparer import QuantileComparer
+from .partial_ranker_wrapper import Method, PartialRanker
+from .instrumentation import instrumented
+
+
+def summarize_shard(shard, q_max:int, q_min:int, outliers:bool=False) -> tuple:
+    """Computes the quantile summary of one shard. This function runs on the workers.
+
+    Args:
+        shard (dict[str, List[float]] | str): The measurements of the objects of the shard, or the path of a file that ``measurements_io.read_measurements()`` can read.
+        q_max (int): Upper quantile.
+        q_min (int): Lower quantile.
+        outliers (bool, optional): Remove outliers using the 1.5 IQR rule. Defaults to False.
+
+    Returns:
+        tuple[List[str], numpy.ndarray, numpy.ndarray]: The object names, and their lower and upper quantile values.
+    """
+    if isinstance(shard, str):
+        from .measurements_io import read_measurements
+        shard = read_measurements(shard)
+    cm = QuantileComparer(shard, lazy=True)
+    cm.compute_quantiles(q_max, q_min, outliers=outliers)
+    low = np.array([cm.t_low[x] for x in cm.objs], dtype=float)
+    up = np.array([cm.t_up[x] for x in cm.objs], dtype=float)
+    return cm.objs, low, up
+
+
+class SerialTransport:
+    """Runs the shards one after another in the current process."""
+
+    def map(self, fn:Callable, args:List[tuple]) -> List:
+        """
+        Args:
+            fn (Callable): The function to run on the workers.
+            args (List[tuple]): The arguments of each call.
+
+        Returns:
+            List: The results of the calls, in the order of **args**.
+        """
+        return [fn(*a) for a in args]
+
+
+class LocalPoolTransport(SerialTransport):
+    """Runs the shards on a local ``multiprocessing`` pool.
+
+    Input:
+        **processes (int, optional)**: The number of worker processes. Defaults to the number of CPUs.
+    """
+
+    def __init__(self, processes:int=None):
+        self.processes = processes
+
+    def map(self, fn, args):
+        import multiprocessing
+        with multiprocessing.Pool(self.processes) as pool:
+            return pool.starmap(fn, args, chunksize=1)
+
+
+class ShardedRanker:
+    """Partial ranking of objects whose measurements are partitioned into shards. The quantiles of each shard are computed by a worker,
+    and only the summaries ``(objs, t_low, t_up)`` are sent back. The coordinator merges the summaries into a lazy ``QuantileComparer``,
+    so neither the measurements nor the comparison matrix of all the objects are held in one process.
+
+    The workers are run by a transport, an object with a method ``map(fn, args)`` that returns ``[fn(*a) for a in args]``.
+    ``LocalPoolTransport`` uses a local process pool; for multiple nodes, a transport can submit the calls to, e.g., an MPI or a cluster scheduler.
+    The shards are sent to the workers as they are, so for multiple nodes, the shards should be file paths that the workers can read.
+
+    Input:
+        **shards (List[dict[str, List[float]] | str])**: The shards, each either a measurements dictionary or the path of a measurements file.
+        The object names must be unique across the shards.
+
+        **transport (optional)**: The transport that runs the workers. Defaults to ``LocalPoolTransport()``.
+
+    **Attributes and Methods**:
+
+    Attributes:
+        comparer (partial_ranker.QuantileComparer): The merged lazy comparer, available after ``compute_quantiles()``.
+        ranker (partial_ranker.PartialRanker): The ranker of the merged comparer, available after ``compute_ranks()``.
+    """
+
+    def __init__(self, shards:List, transport=None):
+        self.shards = list(shards)
+        self.transport = transport if transport is not None else LocalPoolTransport()
+        self.comparer = None
+        self.ranker = None
+
+    @instrumented('ShardedRanker.compute_quantiles')
+    def compute_quantiles(self, q_max:int, q_min:int, outliers=False) -> None:
+        """Computes the quantiles of all the shards on the workers and merges them.
+
+        Args:
+            q_max (int): Upper quantile. E.g., 75 for 75th percentile.
+            q_min (int): Lower quantile. E.g., 25 for 25th percentile.
+            outliers (bool, optional): Remove outliers using the 1.5 IQR rule. Defaults to False.
+        """
+        summaries = self.transport.map(summarize_shard, [(shard, q_max, q_min, outliers) for shard in self.shards])
+        t_low = {}
+        t_up = {}
+        for objs, low, up in summaries:
+            for obj, l, u in zip(objs, low.tolist(), up.tolist()):
+                if obj in t_low:
+                    raise ValueError("Object '{}' appears in more than one shard".format(obj))
+                t_low[obj] = l
+                t_up[obj] = u
+        self.comparer = QuantileComparer.from_quantiles(t_low, t_up, lazy=True)
+
+    def compute_ranks(self, method:Method=Method.DFGReduced) -> None:
+        """Computes the partial ranks of all the objects from the merged quantiles.
+
+        Args:
+            method (Method, optional): The method to compute the partial ranks. Defaults to Method.DFGReduced.
+        """
+        self.ranker = PartialRanker(self.comparer)
+        self.ranker.compute_ranks(method)
+
+    def get_ranks(self) -> dict[int,list[str]]:
+        """
+        Returns:
+            dict[int,List[str]]: A dictionary consisting of the list of objects at each rank.
+        """
+        return self.ranker.get_ranks()
+
+    def get_rank_obj(self, obj:str) -> int:
+        """
+        Args:
+            obj (str): Object name.
+
+        Returns:
+            int: The partial rank of a given object.
+        """
+        return self.ranker.get_rank_obj(obj)
+
+    def get_separable_arrangement(self) -> List[str]:
+        """
+        Returns:
+            List[str]: Arrangement of the objects according to Methodology 2 (Step 1 to 3) in the paper.
+        """
+        return self.ranker.get_separable_arrangement()
@@ -0,0 +1,285 @@
+# Partial Ranker
+#
+# Copyright (C) 2019-2024, Aravind Sankaran
+# IRTG-2379: Modern Inverse Problems, RWTH Aachen University, Germany
+# HPAC, Umeå University, Sweden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# Contributors:
+# - Aravind Sankaran
+
+import heapq
+import math
+import time
+from collections import deque
+import numpy as np
+from .comparison_matrix import LazyComparisonMatrix
+
+
+class _QuantileHeap:
+    # Maintains one percentile of a multiset under insertion and deletion: the k+1 smallest values are in a max-heap (low, negated)
+    # and the others in a min-heap (high), where k is the index before the percentile in the sorted values.
+    # Deleted values stay in the heaps until they reach the top (lazy deletion), so every operation takes O(log W) amortized time.
+    __slots__ = ('q', 'low', 'high', 'n_low', 'n_high', 'del_low', 'del_high')
+
+    def __init__(self, q):
+        self.q = q / 100
+        self.low = []
+        self.high = []
+        self.n_low = 0
+        self.n_high = 0
+        self.del_low = {}
+        self.del_high = {}
+
+    def _prune(self):
+        while self.low and self.del_low.get(-self.low[0]):
+            v = -heapq.heappop(self.low)
+            self.del_low[v] -= 1
+        while self.high and self.del_high.get(self.high[0]):
+            v = heapq.heappop(self.high)
+            self.del_high[v] -= 1
+        # Rebuild a heap when most of it are deleted values, so that the heaps stay O(W) in size.
+        if len(self.low) > 2 * self.n_low + 32:
+            self.low = self._compact(self.low, self.del_low, -1)
+        if len(self.high) > 2 * self.n_high + 32:
+            self.high = self._compact(self.high, self.del_high, 1)
+
+    @staticmethod
+    def _compact(heap, deleted, sign):
+        kept = []
+        for v in heap:
+            if deleted.get(sign * v):
+                deleted[sign * v] -= 1
+            else:
+                kept.append(v)
+        deleted.clear()
+        heapq.heapify(kept)
+        return kept
+
+    def _rebalance(self):
+        n = self.n_low + self.n_high
+        target = min(math.floor((n - 1) * self.q), n - 1) + 1 if n else 0
+        while self.n_low > target:
+            heapq.heappush(self.high, -heapq.heappop(self.low))
+            self.n_low -= 1
+            self.n_high += 1
+            self._prune()
+        while self.n_low < target:
+            heapq.heappush(self.low, -heapq.heappop(self.high))
+            self.n_low += 1
+            self.n_high -= 1
+            self._prune()
+
+    def add(self, v):
+        if self.n_low and v <= -self.low[0]:
+            heapq.heappush(self.low, -v)
+            self.n_low += 1
+        else:
+            heapq.heappush(self.high, v)
+            self.n_high += 1
+        self._rebalance()
+
+    def remove(self, v):
+        # max(low) is in low, so a value not above it can be taken from low; larger values are in high.
+        if self.n_low and v <= -self.low[0]:
+            self.del_low[v] = self.del_low.get(v, 0) + 1
+            self.n_low -= 1
+        else:
+            self.del_high[v] = self.del_high.get(v, 0) + 1
+            self.n_high -= 1
+        self._prune()
+        self._rebalance()
+
+    def value(self):
+        # The linear interpolation of numpy.percentile, with the same floating point operations.
+        n = self.n_low + self.n_high
+        virtual = (n - 1) * self.q
+        a = -self.low[0]
+        if virtual >= n - 1:
+            return a
+        gamma = virtual - math.floor(virtual)
+        b = self.high[0]
+        diff = b - a
+        return b - diff * (1 - gamma) if gamma >= 0.5 else a + diff * gamma
+
+
+class SlidingWindowComparer:
+    """
+    Keeps only the most recent measurements of each object, e.g., of production timings that drift over time, and maintains their quantiles
+    as measurements arrive. It can be used in place of a lazy ``QuantileComparer`` with the ranking classes, e.g., ``PartialRanker(comparer)``.
+
+    Each object has a ring buffer of its last **window** measurements (and/or the measurements of the last **horizon** seconds), and an order-statistic
+    structure (a pair of heaps per quantile) from which the quantiles are read in O(1) time. Adding a measurement, and evicting the oldest one, takes O(log W) time.
+    The values are identical to ``np.percentile`` of the measurements in the window.
+
+    The ranks are maintained incrementally: **C** is a ``LazyComparisonMatrix`` that is rebuilt in O(N) time only when it is read after a change,
+    and rankers that share a ``DominanceAnalysis`` detect the new matrix and recompute the ranks in O(N log N) time.
+
+    Input:
+        **window (int, optional)**: The number of most recent measurements kept per object. Defaults to None (no limit).
+
+        **horizon (float, optional)**: Keep only the measurements whose timestamps are within **horizon** seconds of the latest timestamp. Defaults to None (no limit).
+
+        **q_max (int, optional)**: Upper quantile. Defaults to 75.
+
+        **q_min (int, optional)**: Lower quantile. Defaults to 25.
+
+    **Attributes and Methods**:
+
+    Attributes:
+        objs (list[str]): The objects that have measurements in their window, in the order in which they were first added.
+
+        t_up (dict[str, float]): The upper quantile of the measurements in the window of each object.
+
+        t_low (dict[str, float]): The lower quantile of the measurements in the window of each object.
+
+        version (int): Incremented by every change of the windows.
+    """
+    lazy = True
+
+    def __init__(self, window:int=None, horizon:float=None, q_max=75, q_min=25):
+        if window is None and horizon is None:
+            raise ValueError("Either window or horizon must be given")
+        self.window = window
+        self.horizon = horizon
+        self.q_max = q_max
+        self.q_min = q_min
+        self.t_up = {}
+        self.t_low = {}
+        self.version = 0
+        self._buffers = {}
+        self._heaps = {}
+        self._latest = -math.inf
+        self._arrivals = []  # heap of (timestamp, seq, obj) of the measurements, for the horizon
+        self._seq = 0
+        self._C = None
+
+    @property
+    def objs(self) -> list:
+        return list(self.t_low)
+
+    @property
+    def C(self) -> LazyComparisonMatrix:
+        if self._C is None:
+            objs = self.objs
+            self._C = LazyComparisonMatrix(objs, [self.t_low[x] for x in objs], [self.t_up[x] for x in objs])
+        return self._C
+
+    def add(self, obj:str, value:float, timestamp:float=None) -> None:
+        """Adds a measurement to the window of an object, evicting the measurements that fall out of the window.
+
+        Args:
+            obj (str): Object name.
+            value (float): The measured value.
+            timestamp (float, optional): The time of the measurement in seconds. Defaults to ``time.time()`` if a **horizon** is used.
+        """
+        if timestamp is None and self.horizon is not None:
+            timestamp = time.time()
+        value = float(value)
+        buf = self._buffers.get(obj)
+        if buf is None:
+            buf = self._buffers[obj] = deque()
+            self._heaps[obj] = (_QuantileHeap(self.q_max), _QuantileHeap(self.q_min))
+        buf.append((timestamp, value))
+        for h in self._heaps[obj]:
+            h.add(value)
+        if self.horizon is not None:
+            heapq.heappush(self._arrivals, (timestamp, self._seq, obj))
+            self._seq += 1
+        if self.window is not None and len(buf) > self.window:
+            self._evict(obj)
+        if self.horizon is not None and timestamp > self._latest:
+            self._latest = timestamp
+            self.expire()
+        self._update(obj)
+
+    def add_measurements(self, measurements:dict, timestamp:float=None) -> None:
+        """
+        Args:
+            measurements (dict[str, List[float]]): Measurements to add, in the order in which they were taken.
+            timestamp (float, optional): The time of the measurements. Defaults to ``time.time()`` if a **horizon** is used.
+        """
+        for obj, values in measurements.items():
+            for v in values:
+                self.add(obj, v, timestamp)
+
+    def expire(self, now:float=None) -> None:
+        """Evicts the measurements that are older than **horizon** seconds. This is done by ``add()`` too; call it to expire objects that are no longer measured.
+
+        Args:
+            now (float, optional): The current time. Defaults to the latest timestamp of a measurement.
+        """
+        if self.horizon is None:
+            return
+        if now is not None:
+            self._latest = max(self._latest, now)
+        limit = self._latest - self.horizon
+        # Only the objects with a measurement older than the limit can expire. The heap may hold measurements that were already evicted by the window.
+        expiring = {}
+        while self._arrivals and self._arrivals[0][0] < limit:
+            expiring[heapq.heappop(self._arrivals)[2]] = None
+        for obj in expiring:
+            buf = self._buffers.get(obj)
+            if buf and buf[0][0] < limit:
+                while buf and buf[0][0] < limit:
+                    self._evict(obj)
+                self._update(obj)
+
+    def _evict(self, obj):
+        _, value = self._buffers[obj].popleft()
+        for h in self._heaps[obj]:
+            h.remove(value)
+
+    def _update(self, obj):
+        if self._buffers[obj]:
+            h_up, h_low = self._heaps[obj]
+            self.t_up[obj] = h_up.value()
+            self.t_low[obj] = h_low.value()
+        else:
+            del self._buffers[obj], self._heaps[obj], self.t_up[obj], self.t_low[obj]
+        self.version += 1
+        self._C = None
+
+    def get_window(self, obj:str) -> list:
+        """
+        Args:
+            obj (str): Object name.
+
+        Returns:
+            List[float]: The measurements in the window of the object, from the oldest to the latest.
+        """
+        return [v for _, v in self._buffers[obj]]
+
+    def interval(self, measurements:list) -> tuple:
+        """
+        Args:
+            measurements (List[float]): Measurements that are not part of the windows, e.g., of a new candidate.
+
+        Returns:
+            tuple[float, float]: The lower and upper quantile of the measurements.
+        """
+        low, up = np.percentile(measurements, [self.q_min, self.q_max])
+        return float(low), float(up)
+
+    def compare(self) -> None:
+        """Does nothing: the relations are computed on demand from the quantiles, as in the lazy mode of ``QuantileComparer``."""
+        return
+
+    def get_comparison_matrix(self) -> LazyComparisonMatrix:
+        """
+        Returns:
+            partial_ranker.comparison_matrix.LazyComparisonMatrix: The comparison matrix of the current windows.
+        """
+        return self.C
@@ -18,5 +18,14 @@ setup(
     ],
     python_requires=">3.6",
     install_requires=open("requirements.txt").read().splitlines(),
+    extras_require={
+        "numba": ["numba"],
+        "parquet": ["pyarrow"],
+    },
+    entry_points={
+        "console_scripts": [
+            "partial-ranker=partial_ranker.cli:main",
+        ],
+    },
 
 )
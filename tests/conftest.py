@@ -0,0 +1,19 @@
+import pytest
+from partial_ranker import MeasurementsSimulator
+
+# (seed, number of objects, repetitions, largest standard deviation): from few ranks with many ties to many small ranks.
+DATASETS = [(0, 8, 10, 0.3), (1, 40, 20, 0.1), (2, 120, 15, 0.05)]
+
+
+def simulate(seed, n, reps, spread):
+    import numpy as np
+    rng = np.random.RandomState(seed)
+    params = {"obj{}".format(i): [float(rng.uniform(1, 2)), float(rng.uniform(0.01, spread))] for i in range(n)}
+    sim = MeasurementsSimulator(params, seed=seed)
+    sim.measure(reps)
+    return sim.get_measurements()
+
+
+@pytest.fixture(params=DATASETS, ids=lambda d: 'n{}'.format(d[1]))
+def measurements(request):
+    return simulate(*request.param)
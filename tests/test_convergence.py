@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+from partial_ranker import QuantileComparer, PartialRanker, Method
+from partial_ranker.convergence import rank_convergence
+
+pytest.importorskip('pandas')
+
+
+@pytest.mark.parametrize('outliers', [False, True])
+@pytest.mark.parametrize('method', [Method.DFG, Method.DFGReduced, Method.Min])
+def test_prefix_ranks_match_ranking_the_truncated_measurements(outliers, method):
+    rng = np.random.default_rng(0)
+    measurements = {"o{}".format(i): list(rng.normal(rng.uniform(0, 3), 1, rng.integers(5, 40))) for i in range(30)}
+    prefixes = [3, 10, 17, 40]
+    ranks, metrics = rank_convergence(measurements, prefixes, method, outliers=outliers)
+    for k in prefixes:
+        cm = QuantileComparer({x: v[:k] for x, v in measurements.items()})
+        cm.compute_quantiles(75, 25, outliers=outliers)
+        cm.compare()
+        pr = PartialRanker(cm)
+        pr.compute_ranks(method)
+        assert ranks[k].tolist() == [pr.get_rank_obj(x) for x in measurements]
+    assert metrics.loc[40, 'pairwise_agreement'] == 1.0
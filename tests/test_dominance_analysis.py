@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from partial_ranker import QuantileComparer, PartialRanker, Method, DominanceAnalysis, Profiler
+
+MODES = {'dict': dict(), 'lazy': dict(lazy=True), 'streamed': dict(jobs=1, memory_budget=4096)}
+
+
+def comparer(measurements, **kwargs):
+    cm = QuantileComparer(measurements, **kwargs)
+    cm.compute_quantiles(75, 25)
+    cm.compare()
+    return cm
+
+
+def brute_force(cm):
+    # The depths (longest paths), dependencies and equivalence classes straight from the definitions.
+    objs = cm.objs
+    C = {x: {y: cm.C[x][y] for y in objs} for x in objs}
+    dependencies = {y: sorted(x for x in objs if C[x][y] == 0) for y in objs}
+    depth = {}
+    for y in sorted(objs, key=lambda y: len(dependencies[y])):
+        # An object has more dependencies than each of its dependencies, since the relation is transitive.
+        depth[y] = max((depth[x] + 1 for x in dependencies[y]), default=0)
+    classes, seen = [], set()
+    for x in objs:
+        if x in seen:
+            continue
+        component, stack = set(), [x]
+        while stack:
+            z = stack.pop()
+            if z not in component:
+                component.add(z)
+                stack.extend(w for w in objs if C[z][w] == 1)
+        seen |= component
+        classes.append(component)
+    return depth, dependencies, classes
+
+
+@pytest.mark.parametrize('mode', MODES)
+def test_analysis_matches_the_definitions(measurements, mode):
+    cm = comparer(measurements, **MODES[mode])
+    a = DominanceAnalysis(cm)
+    depth, dependencies, classes = brute_force(cm)
+    assert a.get_depths()[0] == depth
+    assert {y: sorted(a.dependencies[y]) for y in a.objs} == dependencies
+    assert a.get_equivalence_classes() == classes
+
+    arrangement = a.get_separable_arrangement()
+    assert sorted(arrangement) == sorted(a.objs)
+    assert [depth[x] for x in arrangement] == sorted(depth.values())
+
+
+def test_analysis_is_shared_across_methods(measurements):
+    pr = PartialRanker(comparer(measurements))
+    pr.compute_ranks(Method.DFG)
+    analysis = pr.get_analysis()
+    with Profiler() as prof:
+        pr.compute_ranks(Method.DFGReduced)
+        pr.compute_ranks(Method.Min)
+    assert pr.get_analysis() is analysis
+    assert prof.to_dict()['counters'].get('DominanceAnalysis.cache_hits', 0) > 0
+    assert 'DominanceAnalysis._derive_relations' not in prof.to_dict()['stages']
+
+
+def test_analysis_is_recreated_after_new_quantiles(measurements):
+    cm = comparer(measurements)
+    pr = PartialRanker(cm)
+    pr.compute_ranks(Method.DFGReduced)
+    analysis = pr.get_analysis()
+    cm.compute_quantiles(90, 10)
+    cm.compare()
+    pr.compute_ranks(Method.DFGReduced)
+    assert pr.get_analysis() is not analysis
+    expected = PartialRanker(cm)
+    expected.compute_ranks(Method.DFGReduced)
+    assert pr.get_ranks() == expected.get_ranks()
+
+
+def test_cycle_is_reported():
+    cm = comparer({'a': [1.0], 'b': [2.0], 'c': [3.0]})
+    cm.C['c']['a'], cm.C['a']['c'] = 0, 2
+    with pytest.raises(ValueError, match='not transitive'):
+        DominanceAnalysis(cm).get_depths()
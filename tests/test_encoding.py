@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from partial_ranker import QuantileComparer, PartialRanker, Method
+from partial_ranker.encoding import encode, load, ENCODINGS
+
+
+def _timings(n=200, reps=500, seed=0):
+    # Timings of 1 ms to 1 s with a noise of 1%.
+    rng = np.random.default_rng(seed)
+    return {"o{}".format(i): rng.uniform(1e-3, 1) * (1 + 0.01 * rng.standard_normal(reps)) for i in range(n)}
+
+
+def _ranks(measurements, outliers=False):
+    cm = QuantileComparer(measurements)
+    cm.compute_quantiles(75, 25, outliers=outliers)
+    cm.compare()
+    pr = PartialRanker(cm)
+    pr.compute_ranks(Method.DFGReduced)
+    return cm, pr.get_ranks()
+
+
+@pytest.mark.parametrize('encoding, resolution, bytes_per_value', [('float32', None, 4.1), ('scaled', 1e-6, 2.2), ('delta', 1e-6, 2.4), ('scaled', 1e-9, 4.1)])
+def test_size_on_noisy_timings(encoding, resolution, bytes_per_value):
+    measurements = _timings()
+    encoded = encode(measurements, encoding, resolution)
+    n = sum(len(v) for v in measurements.values())
+    assert encoded.nbytes / n <= bytes_per_value
+
+
+@pytest.mark.parametrize('encoding', ENCODINGS)
+@pytest.mark.parametrize('outliers', [False, True])
+def test_decoded_values_and_ranks(tmp_path, encoding, outliers):
+    measurements = _timings(n=40, reps=50)
+    encoded = encode(measurements, encoding, 1e-9)
+    for obj, values in measurements.items():
+        assert np.abs(encoded[obj] - values).max() <= encoded.error_bound
+    encoded.save(str(tmp_path / 'm.npz'))
+    loaded = load(str(tmp_path / 'm.npz'))
+    assert all(np.array_equal(loaded[obj], encoded[obj]) for obj in measurements)
+
+    cm, ranks = _ranks(loaded, outliers)
+    assert encoded.preserves_comparisons(cm)
+    assert ranks == _ranks(measurements, outliers)[1]
+
+
+def test_coarse_resolution_is_detected():
+    measurements = {'a': [1.0, 1.1, 1.2], 'b': [1.25, 1.3, 1.4]}
+    encoded = encode(measurements, 'scaled', 0.5)
+    cm, _ = _ranks(encoded)
+    assert not encoded.preserves_comparisons(cm)
@@ -0,0 +1,49 @@
+import pytest
+from partial_ranker import QuantileComparer, PartialRanker, Method
+
+METHODS = [Method.DFG, Method.DFGReduced, Method.Min]
+ENGINES = {
+    'lazy': dict(lazy=True),
+    'dense': dict(jobs=1),
+    'tiled': dict(jobs=2, block_size=16),
+    'process': dict(jobs=2, block_size=16, pool='process'),
+    'streamed': dict(jobs=1, memory_budget=4096),
+    'out_of_core': dict(memory_budget=4096),
+}
+
+
+def rank_all(measurements, outliers, **kwargs):
+    cm = QuantileComparer(measurements, **kwargs)
+    cm.compute_quantiles(75, 25, outliers=outliers)
+    cm.compare()
+    pr = PartialRanker(cm)
+    results = {}
+    for method in METHODS:
+        pr.compute_ranks(method)
+        ranks = pr.get_ranks()
+        results[method] = {
+            'ranks': {r: sorted(ranks[r]) for r in ranks},
+            'rank_obj': {obj: pr.get_rank_obj(obj) for obj in measurements},
+            'arrangement': pr.get_separable_arrangement(),
+            'edges': sorted(pr.get_dfg().get_edges()),
+        }
+    results['depths'] = pr.get_analysis().get_depths()[0]
+    return results
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('outliers', [False, True])
+def test_engines_match_the_dict_comparer(tmp_path, measurements, engine, outliers):
+    kwargs = dict(ENGINES[engine])
+    if engine == 'out_of_core':
+        kwargs['path'] = str(tmp_path / 'C.npy')
+    expected = rank_all(measurements, outliers)
+    assert rank_all(measurements, outliers, **kwargs) == expected
+
+
+def test_dict_comparer_ranks_separated_objects():
+    measurements = {'a': [1.0, 1.1, 1.2], 'b': [1.1, 1.15, 1.3], 'c': [2.0, 2.1, 2.2]}
+    results = rank_all(measurements, False)
+    assert results[Method.DFG]['ranks'] == {0: ['a', 'b'], 1: ['c']}
+    assert results[Method.DFG]['edges'] == [('a', 'c'), ('b', 'c')]
+    assert results[Method.Min]['ranks'] == {0: ['a', 'b'], 1: ['c']}
@@ -0,0 +1,102 @@
+import io
+import json
+import xml.etree.ElementTree as ET
+import pytest
+from partial_ranker import QuantileComparer, PartialRanker, Method, Graph
+
+
+def ranker(measurements, method=Method.DFG):
+    cm = QuantileComparer(measurements)
+    cm.compute_quantiles(75, 25)
+    cm.compare()
+    pr = PartialRanker(cm)
+    pr.compute_ranks(method)
+    return pr
+
+
+def snapshot(g):
+    return (list(g.in_nodes.items()), list(g.out_nodes.items()), list(g.get_edges()), g.get_rank_edges(), g.get_separable_arrangement())
+
+
+def closure(g, nodes):
+    # The descendants of every node by a depth-first search over out_nodes.
+    descendants = {}
+    for node in nodes:
+        seen, stack = set(), list(g.out_nodes.get(node, []))
+        while stack:
+            z = stack.pop()
+            if z not in seen:
+                seen.add(z)
+                stack.extend(g.out_nodes.get(z, []))
+        descendants[node] = seen
+    return descendants
+
+
+@pytest.mark.parametrize('method', [Method.DFG, Method.DFGReduced, Method.Min])
+def test_compact_graph_matches_the_dict_graph(measurements, method):
+    pr = ranker(measurements, method)
+    g = pr.get_dfg()
+    compact = pr.get_dfg(compact=True)
+    assert [(k, list(v)) for k, v in snapshot(compact)[0]] == snapshot(g)[0]
+    assert [(k, list(v)) for k, v in snapshot(compact)[1]] == snapshot(g)[1]
+    assert snapshot(compact)[2:] == snapshot(g)[2:]
+
+
+def test_edges_join_consecutive_ranks_of_better_objects(measurements):
+    pr = ranker(measurements)
+    g = pr.get_dfg()
+    C = pr.comparer.C
+    expected = sorted((x, y) for y in pr.comparer.objs for x in pr.get_analysis().dependencies[y]
+                      if pr.get_rank_obj(x) + 1 == pr.get_rank_obj(y))
+    assert sorted(g.get_edges()) == expected
+    assert all(C[x][y] == 0 for x, y in expected)
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_edges_restore_the_graph(measurements, compact):
+    pr = ranker(measurements)
+    g = pr.get_dfg(compact=compact)
+    restored = Graph(pr.get_analysis().dependencies, pr.get_ranks(), list(g.get_edges()), compact=compact)
+    assert snapshot(restored) == snapshot(g)
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_reachability_matches_a_graph_search(measurements, compact):
+    pr = ranker(measurements)
+    g = pr.get_dfg(compact=compact)
+    nodes = pr.comparer.objs
+    descendants = closure(g, nodes)
+    ancestors = {y: {x for x in nodes if y in descendants[x]} for y in nodes}
+    rank = {node: pr.get_rank_obj(node) for node in nodes}
+    for x in nodes:
+        assert set(g.get_descendants(x)) == descendants[x]
+        assert set(g.get_ancestors(x)) == ancestors[x]
+        assert [rank[z] for z in g.get_ancestors(x)] == sorted(rank[z] for z in ancestors[x])
+        for y in nodes:
+            assert g.is_reachable(x, y) == (y in descendants[x])
+    assert g.get_dominance_counts() == {x: (len(ancestors[x]), len(descendants[x])) for x in nodes}
+
+
+def test_writers_emit_the_edges(measurements):
+    g = ranker(measurements).get_dfg()
+    edges = list(g.get_edges())
+    f = io.StringIO()
+    g.write_json(f)
+    data = json.loads(f.getvalue())
+    assert [(data['nodes'][i], data['nodes'][j]) for i, j in data['edges']] == edges
+
+    f = io.StringIO()
+    g.write_graphml(f)
+    ns = {'g': 'http://graphml.graphdrawing.org/xmlns'}
+    root = ET.fromstring(f.getvalue())
+    assert [(e.get('source'), e.get('target')) for e in root.iterfind('.//g:edge', ns)] == edges
+
+    f = io.StringIO()
+    g.write_json(f, collapse_ranks=True)
+    data = json.loads(f.getvalue())
+    assert {(d1, d2): n for d1, d2, n in data['edges']} == g.get_rank_edges()
+    assert sum(data['sizes']) == len(measurements)
+
+    f = io.StringIO()
+    g.write_dot(f)
+    assert f.getvalue().startswith('digraph {') and f.getvalue().count('->') == len(edges)
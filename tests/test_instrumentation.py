@@ -0,0 +1,50 @@
+import sys
+import threading
+import time
+from partial_ranker import QuantileComparer
+from partial_ranker.instrumentation import Profiler, count, stage
+
+
+def test_counters_are_exact_under_contention():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with Profiler() as prof:
+            def work():
+                for _ in range(20000):
+                    count('hits')
+            threads = [threading.Thread(target=work) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert prof.to_dict()['counters']['hits'] == 8 * 20000
+
+
+def test_stages_nest_per_thread():
+    with Profiler() as prof:
+        def work(i):
+            with stage('outer{}'.format(i)):
+                time.sleep(0.01 * (i + 1))
+                with stage('inner{}'.format(i)):
+                    time.sleep(0.02)
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    events = {e['name']: e for e in prof.events}
+    for i in range(4):
+        outer, inner = events['outer{}'.format(i)], events['inner{}'.format(i)]
+        assert outer['tid'] == inner['tid']
+        assert outer['start'] <= inner['start'] and inner['start'] + inner['time_s'] <= outer['start'] + outer['time_s'] + 1e-6
+
+
+def test_stages_of_the_pipeline_are_recorded():
+    cm = QuantileComparer({'a': [1, 2, 3], 'b': [4, 5, 6]})
+    with Profiler() as prof:
+        cm.compute_quantiles(75, 25)
+        cm.compare()
+    assert {'QuantileComparer.compare'} <= set(prof.to_dict()['stages'])
@@ -0,0 +1,24 @@
+import io
+from importlib.util import find_spec
+import pytest
+from partial_ranker import cli
+from partial_ranker.measurements_io import read_event_log, read_csv
+
+
+def test_event_log_keeps_underscores_in_variant_names():
+    fh = io.StringIO("case:concept:name;timestamp:start;timestamp:end\n"
+                     "gls_var_3_0;0.0;1.0\ngls_var_3_0;1.0;3.0\ngls_var_3_1;0.0;2.5\ngls_var_4_0;0.0;1.5\n")
+    assert read_event_log(fh) == {'gls_var_3': [3.0, 2.5], 'gls_var_4': [1.5]}
+
+
+def test_csv_skips_header():
+    assert read_csv(io.StringIO("obj,value\na,1\nb,2\na,3\n")) == {'a': [1.0, 3.0], 'b': [2.0]}
+
+
+def test_cli_reports_a_missing_parquet_engine(tmp_path, capsys):
+    if find_spec('pyarrow') or find_spec('fastparquet'):
+        pytest.skip('a parquet engine is installed')
+    path = tmp_path / 'm.csv'
+    path.write_text("a,1\nb,2\n")
+    assert cli.main([str(path), '-o', str(tmp_path / 'r.parquet'), '--output-format', 'parquet']) == 2
+    assert 'pyarrow' in capsys.readouterr().err
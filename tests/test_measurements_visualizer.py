@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('matplotlib')
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from partial_ranker import MeasurementsVisualizer
+
+
+def _visualizer():
+    rng = np.random.default_rng(0)
+    return MeasurementsVisualizer({"o{}".format(i): list(rng.normal(i, 1, 50)) for i in range(5)})
+
+
+def test_histogram_counts_match_numpy():
+    v = _visualizer()
+    counts, edges = v.histogram_counts(bins=8)
+    for obj, c in zip(v.obj_seq, counts):
+        assert np.array_equal(c, np.histogram(v.measurements[obj], bins=edges)[0])
+
+
+def test_shown_histograms_use_the_shared_bins(monkeypatch):
+    monkeypatch.setattr(plt, 'show', lambda: None)
+    v = _visualizer()
+    v.show_measurement_histograms(bins=8)
+    counts, edges = v.histogram_counts(sorted(v.obj_seq), bins=8)
+    for ax, c in zip(plt.gcf().axes, counts):
+        stairs = ax.patches[0]
+        assert np.array_equal(stairs.get_data().values, c) and np.array_equal(stairs.get_data().edges, edges)
+    plt.close('all')
+
+
+def test_export_writes_pages(tmp_path):
+    paths = _visualizer().export_measurement_histograms(str(tmp_path), per_page=2)
+    assert len(paths) == 3 and all((tmp_path / p).exists() for p in paths)
@@ -0,0 +1,77 @@
+import asyncio
+import json
+import pytest
+from partial_ranker import PartialRanker
+from partial_ranker.ranking_service import RankingService
+
+MEASUREMENTS = {'x': [1.0, 1.1, 1.2], 'y': [2.0, 2.1, 2.2]}
+
+
+def _request(service, method, target, data=None):
+    body = json.dumps(data).encode() if data is not None else b''
+    return asyncio.run(service.handle(method, target, body))
+
+
+@pytest.fixture
+def service():
+    service = RankingService()
+    assert _request(service, 'PUT', '/datasets/d', {'measurements': MEASUREMENTS})[0] == 201
+    return service
+
+
+@pytest.mark.parametrize('method, target, body', [
+    ('PUT', '/datasets/e', {'measurements': [1, 2]}),
+    ('PUT', '/datasets/e', {'measurements': {'x': []}}),
+    ('PUT', '/datasets/e', {'measurements': {'x': 'abc'}}),
+    ('PUT', '/datasets/e', {'measurements': MEASUREMENTS, 'q_max': 10, 'q_min': 90}),
+    ('PUT', '/datasets/e', [1, 2]),
+    ('POST', '/datasets/d/measurements', [1, 2]),
+    ('POST', '/datasets/d/measurements', {'new': []}),
+    ('POST', '/datasets/d/measurements', {'new': [[1, 2]]}),
+    ('GET', '/datasets/d/rank', None),
+])
+def test_bad_requests_are_answered_with_400(service, method, target, body):
+    status, response = _request(service, method, target, body)
+    assert status == 400 and 'error' in response
+    status, response = _request(service, 'GET', '/datasets/d/ranks')
+    assert status == 200 and response == {'version': 1, 'ranks': {'0': ['x'], '1': ['y']}}
+
+
+def test_invalid_json_is_answered_with_400(service):
+    assert asyncio.run(service.handle('POST', '/datasets/d/measurements', b'{'))[0] == 400
+
+
+def test_failed_refresh_is_retried(service, monkeypatch):
+    assert _request(service, 'POST', '/datasets/d/measurements', {'new': [0.1, 0.2]}) == (200, {'version': 2})
+    compute_ranks = PartialRanker.compute_ranks
+
+    def fail(self, method=None):
+        raise MemoryError()
+    monkeypatch.setattr(PartialRanker, 'compute_ranks', fail)
+    status, response = _request(service, 'GET', '/datasets/d/ranks')
+    assert status == 500 and 'MemoryError' in response['error']
+
+    monkeypatch.setattr(PartialRanker, 'compute_ranks', compute_ranks)
+    status, response = _request(service, 'GET', '/datasets/d/ranks')
+    assert status == 200 and response == {'version': 2, 'ranks': {'0': ['new'], '1': ['x'], '2': ['y']}}
+
+
+def test_ranks_of_the_min_method_are_json_serializable():
+    service = RankingService()
+    _request(service, 'PUT', '/datasets/d', {'measurements': MEASUREMENTS, 'method': 'Min'})
+    assert _request(service, 'GET', '/datasets/d/ranks') == (200, {'version': 1, 'ranks': {'0': ['x'], '1': ['y']}})
+
+
+def test_connection_answers_a_bad_request():
+    async def run():
+        server = await asyncio.start_server(RankingService()._serve_connection, '127.0.0.1', 0)
+        async with server:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            body = json.dumps({'measurements': [1, 2]}).encode()
+            writer.write(b'PUT /datasets/e HTTP/1.1\r\nContent-Length: %d\r\nConnection: close\r\n\r\n' % len(body) + body)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+    head, _, payload = asyncio.run(run()).partition(b'\r\n\r\n')
+    assert head.startswith(b'HTTP/1.1 400') and 'error' in json.loads(payload)
@@ -0,0 +1,82 @@
+from statistics import NormalDist
+import numpy as np
+import pytest
+from partial_ranker import (QuantileComparer, PartialRanker, Method, IQIRelation, BootstrapCIRelation,
+                            MannWhitneyRelation, KSRelation, IntervalRelation)
+
+RELATIONS = {
+    'iqi': lambda: IQIRelation(90, 10),
+    'bootstrap': lambda: BootstrapCIRelation(n_boot=200),
+    'mann_whitney': lambda: MannWhitneyRelation(0.05),
+    'ks': lambda: KSRelation(0.05),
+}
+
+
+def matrix(measurements, **kwargs):
+    cm = QuantileComparer(measurements, **kwargs)
+    cm.compute_quantiles(75, 25)
+    cm.compare()
+    return cm, np.array([[cm.C[x][y] for y in cm.objs] for x in cm.objs])
+
+
+def mann_whitney(a, b, alpha):
+    # U counts the pairs with a < b, ties count 1/2.
+    U = (a[:, None] < b[None, :]).sum() + 0.5 * (a[:, None] == b[None, :]).sum()
+    n1, n2 = len(a), len(b)
+    z = (U - n1 * n2 / 2) / np.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+    z_crit = NormalDist().inv_cdf(1 - alpha / 2)
+    return 0 if z > z_crit else 2 if z < -z_crit else 1
+
+
+def ks(a, b, alpha):
+    points = np.concatenate([a, b])
+    Fa = np.searchsorted(np.sort(a), points, side='right') / len(a)
+    Fb = np.searchsorted(np.sort(b), points, side='right') / len(b)
+    crit = np.sqrt(-np.log(alpha / 2) / 2) * np.sqrt((len(a) + len(b)) / (len(a) * len(b)))
+    above, below = (Fa - Fb).max() > crit, (Fb - Fa).max() > crit
+    return 0 if above and not below else 2 if below and not above else 1
+
+
+@pytest.mark.parametrize('name', RELATIONS)
+def test_blocks_and_tiles_agree(measurements, name):
+    _, C = matrix(measurements, relation=RELATIONS[name](), block_size=7)
+    assert (np.diag(C) == -1).all()
+    off = ~np.eye(len(C), dtype=bool)
+    assert ((C == 0) == (C.T == 2))[off].all() and ((C == 1) == (C.T == 1))[off].all()
+    assert np.array_equal(matrix(measurements, relation=RELATIONS[name](), jobs=2, block_size=16)[1], C)
+    if isinstance(RELATIONS[name](), IntervalRelation):
+        assert np.array_equal(matrix(measurements, relation=RELATIONS[name](), lazy=True)[1], C)
+
+
+@pytest.mark.parametrize('name, reference', [('mann_whitney', mann_whitney), ('ks', ks)])
+def test_tests_match_the_pairwise_definition(measurements, name, reference):
+    cm, C = matrix(measurements, relation=RELATIONS[name](), block_size=7)
+    samples = [np.asarray(measurements[x], dtype=float) for x in cm.objs]
+    for i in range(len(samples)):
+        for j in range(len(samples)):
+            if i != j:
+                assert C[i, j] == reference(samples[i], samples[j], 0.05), (i, j)
+
+
+def test_iqi_relation_is_the_default_rule(measurements):
+    default = matrix(measurements)[1]
+    assert np.array_equal(matrix(measurements, relation=IQIRelation(75, 25))[1], default)
+    assert np.array_equal(matrix(measurements, relation=IQIRelation(75, 25), lazy=True)[1], default)
+
+
+@pytest.mark.parametrize('name', RELATIONS)
+def test_ranks_with_a_relation_match_across_modes(measurements, name):
+    def ranks(**kwargs):
+        cm, _ = matrix(measurements, relation=RELATIONS[name](), **kwargs)
+        pr = PartialRanker(cm)
+        pr.compute_ranks(Method.DFGReduced)
+        return pr.get_ranks(), pr.get_separable_arrangement()
+    expected = ranks()
+    assert ranks(jobs=1) == expected
+    if isinstance(RELATIONS[name](), IntervalRelation):
+        assert ranks(lazy=True) == expected
+
+
+def test_lazy_mode_rejects_other_relations():
+    with pytest.raises(ValueError):
+        QuantileComparer({'a': [1.0]}, lazy=True, relation=MannWhitneyRelation())
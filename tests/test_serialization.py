@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from partial_ranker import QuantileComparer, PartialRanker, Method
+from partial_ranker.relations import IQIRelation
+
+METHODS = [Method.DFG, Method.DFGReduced, Method.Min]
+
+
+def _measurements(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    return {"o{}".format(i): list(rng.normal(rng.uniform(0, 5), rng.uniform(0.05, 1), 20)) for i in range(n)}
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_round_trip_keeps_the_bounds_of_a_lazy_relation(tmp_path, method):
+    cm = QuantileComparer(_measurements(), lazy=True, relation=IQIRelation(90, 10))
+    cm.compute_quantiles(75, 25)
+    cm.compare()
+    pr = PartialRanker(cm)
+    pr.compute_ranks(method)
+    path = str(tmp_path / 'ranker.npz')
+    pr.save(path)
+
+    loaded = PartialRanker.load(path)
+    assert np.array_equal(loaded.comparer.C.t_low, cm.C.t_low)
+    assert np.array_equal(loaded.comparer.C.t_up, cm.C.t_up)
+    assert loaded.get_ranks() == pr.get_ranks()
+    loaded.compute_ranks(method)
+    assert loaded.get_ranks() == pr.get_ranks()
+    assert loaded.get_separable_arrangement() == pr.get_separable_arrangement()
+
+
+ENGINES = {'dict': dict(), 'lazy': dict(lazy=True), 'dense': dict(jobs=1), 'streamed': dict(jobs=1, memory_budget=4096),
+           'out_of_core': dict(memory_budget=4096)}
+
+
+def _state(pr):
+    a = pr.get_analysis()
+    edges = list(pr.get_dfg().get_edges())
+    if pr.method == Method.Min:
+        # The ranks of Min are sets, whose iteration order decides the order of the edges.
+        edges.sort()
+    return (pr.method, pr.get_ranks(), {obj: pr.get_rank_obj(obj) for obj in pr.comparer.objs}, pr.get_separable_arrangement(),
+            edges, a.get_depths(), {obj: sorted(a.dependencies[obj]) for obj in a.objs})
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('method', METHODS)
+@pytest.mark.parametrize('mmap', [True, False])
+def test_round_trip(tmp_path, measurements, engine, method, mmap):
+    kwargs = dict(ENGINES[engine])
+    if engine == 'out_of_core':
+        kwargs['path'] = str(tmp_path / 'C.npy')
+    cm = QuantileComparer(measurements, **kwargs)
+    cm.compute_quantiles(75, 25)
+    cm.compare()
+    pr = PartialRanker(cm)
+    pr.compute_ranks(method)
+    path = str(tmp_path / 'ranker.npz')
+    pr.save(path)
+
+    loaded = PartialRanker.load(path, mmap=mmap)
+    assert _state(loaded) == _state(pr)
+    assert loaded.comparer.t_low == cm.t_low and loaded.comparer.t_up == cm.t_up
+    # The loaded ranker computes the other methods from the stored comparisons.
+    for other in METHODS:
+        pr.compute_ranks(other)
+        loaded.compute_ranks(other)
+        assert _state(loaded) == _state(pr)
+
+
+def test_save_requires_ranks(tmp_path):
+    cm = QuantileComparer({'a': [1.0, 2.0]})
+    cm.compute_quantiles(75, 25)
+    cm.compare()
+    with pytest.raises(ValueError):
+        PartialRanker(cm).save(str(tmp_path / 'ranker.npz'))
@@ -0,0 +1,42 @@
+import copy
+import numpy as np
+import pytest
+from partial_ranker import QuantileComparer, PartialRanker, Method, MannWhitneyRelation
+
+MODES = [dict(), dict(lazy=True), dict(jobs=1), dict(relation=MannWhitneyRelation())]
+METHODS = [Method.DFG, Method.DFGReduced, Method.Min]
+
+
+def _ranker(measurements, kwargs, method):
+    cm = QuantileComparer(copy.deepcopy(measurements), **kwargs)
+    cm.compute_quantiles(75, 25)
+    cm.compare()
+    pr = PartialRanker(cm)
+    pr.compute_ranks(method)
+    return pr
+
+
+@pytest.mark.parametrize('kwargs', MODES)
+@pytest.mark.parametrize('method', METHODS)
+def test_update_moves_object_to_the_top(kwargs, method):
+    pr = _ranker({"o{}".format(i): [10*i, 10*i+1, 10*i+2] for i in range(5)}, kwargs, method)
+    pr.update('o4', [-10, -9, -8])
+    assert pr.get_rank_obj('o4') == 0
+    assert pr.get_ranks() == _ranker(pr.comparer.measurements, kwargs, method).get_ranks()
+
+
+@pytest.mark.parametrize('kwargs', MODES)
+@pytest.mark.parametrize('method', METHODS)
+def test_update_matches_compute_ranks(kwargs, method):
+    rng = np.random.default_rng(0)
+    n = 20
+    measurements = {"o{}".format(i): list(rng.normal(rng.uniform(0, 10), rng.uniform(0.01, 2), 8)) for i in range(n)}
+    pr = _ranker(measurements, kwargs, method)
+    pr.get_separable_arrangement()
+    for _ in range(20):
+        obj = "o{}".format(rng.integers(n))
+        center = rng.choice([-20, 30, rng.uniform(0, 10)])
+        pr.update(obj, list(rng.normal(center, rng.uniform(0.01, 2), 8)))
+        expected = _ranker(pr.comparer.measurements, kwargs, method)
+        assert pr.get_ranks() == expected.get_ranks()
+        assert pr.get_separable_arrangement() == expected.get_separable_arrangement()